@@ -0,0 +1,26 @@
+"""index sweets by (price, id) for keyset pagination
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_sweets_price_id', 'sweets', ['price', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sweets_price_id', table_name='sweets')
@@ -0,0 +1,60 @@
+"""indexed substring search on sweet name and category
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX ix_sweets_name_trgm ON sweets USING gin (name gin_trgm_ops)")
+        op.execute("CREATE INDEX ix_sweets_category_trgm ON sweets USING gin (category gin_trgm_ops)")
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE sweets_search USING fts5("
+            "name, category, content='sweets', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            "CREATE TRIGGER sweets_search_insert AFTER INSERT ON sweets BEGIN "
+            "INSERT INTO sweets_search(rowid, name, category) VALUES (new.id, new.name, new.category); END"
+        )
+        op.execute(
+            "CREATE TRIGGER sweets_search_delete AFTER DELETE ON sweets BEGIN "
+            "INSERT INTO sweets_search(sweets_search, rowid, name, category) "
+            "VALUES ('delete', old.id, old.name, old.category); END"
+        )
+        op.execute(
+            "CREATE TRIGGER sweets_search_update AFTER UPDATE OF name, category ON sweets BEGIN "
+            "INSERT INTO sweets_search(sweets_search, rowid, name, category) "
+            "VALUES ('delete', old.id, old.name, old.category); "
+            "INSERT INTO sweets_search(rowid, name, category) VALUES (new.id, new.name, new.category); END"
+        )
+        # Index the rows that already exist
+        op.execute("INSERT INTO sweets_search(sweets_search) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_sweets_category_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_sweets_name_trgm")
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS sweets_search_update")
+        op.execute("DROP TRIGGER IF EXISTS sweets_search_delete")
+        op.execute("DROP TRIGGER IF EXISTS sweets_search_insert")
+        op.execute("DROP TABLE IF EXISTS sweets_search")
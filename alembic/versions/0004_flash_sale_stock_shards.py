@@ -0,0 +1,41 @@
+"""split flash-sale stock into shard rows
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('sweets', sa.Column('stock_shards', sa.Integer(), server_default='0', nullable=False))
+    op.create_table(
+        'sweet_stock_shards',
+        sa.Column('sweet_id', sa.Integer(), nullable=False),
+        sa.Column('shard', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['sweet_id'], ['sweets.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('sweet_id', 'shard')
+    )
+
+
+def downgrade() -> None:
+    # Fold any sharded stock back onto the sweets before dropping the shards
+    op.execute(
+        "UPDATE sweets SET quantity = (SELECT COALESCE(SUM(quantity), 0) FROM sweet_stock_shards "
+        "WHERE sweet_stock_shards.sweet_id = sweets.id) WHERE stock_shards > 0"
+    )
+    op.drop_table('sweet_stock_shards')
+    # Plain DROP COLUMN (SQLite 3.35+); a batch rebuild would lose the search triggers
+    op.drop_column('sweets', 'stock_shards')
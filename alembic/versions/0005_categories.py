@@ -0,0 +1,89 @@
+"""normalized categories table referenced by sweets.category_id
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _slugify(name: str) -> str:
+    # Frozen copy of app.categories.slugify
+    return re.sub(r"[\W_]+", "-", name.casefold()).strip("-") or "-"
+
+
+# Frozen copy of the triggers created by 0003
+SQLITE_SEARCH_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS sweets_search_insert AFTER INSERT ON sweets BEGIN "
+    "INSERT INTO sweets_search(rowid, name, category) VALUES (new.id, new.name, new.category); END",
+    "CREATE TRIGGER IF NOT EXISTS sweets_search_delete AFTER DELETE ON sweets BEGIN "
+    "INSERT INTO sweets_search(sweets_search, rowid, name, category) "
+    "VALUES ('delete', old.id, old.name, old.category); END",
+    "CREATE TRIGGER IF NOT EXISTS sweets_search_update AFTER UPDATE OF name, category ON sweets BEGIN "
+    "INSERT INTO sweets_search(sweets_search, rowid, name, category) "
+    "VALUES ('delete', old.id, old.name, old.category); "
+    "INSERT INTO sweets_search(rowid, name, category) VALUES (new.id, new.name, new.category); END",
+]
+
+
+def upgrade() -> None:
+    categories = op.create_table(
+        'categories',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('slug', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_categories_slug', 'categories', ['slug'], unique=True)
+    if op.get_bind().dialect.name == 'sqlite':
+        # SQLite cannot add a constraint later, but takes REFERENCES inline
+        op.execute("ALTER TABLE sweets ADD COLUMN category_id INTEGER REFERENCES categories (id)")
+    else:
+        op.add_column('sweets', sa.Column('category_id', sa.Integer(), nullable=True))
+        op.create_foreign_key(None, 'sweets', 'categories', ['category_id'], ['id'])
+    op.create_index('ix_sweets_category_id_id', 'sweets', ['category_id', 'id'], unique=False)
+
+    # Backfill: one category per distinct slug, named after its first spelling
+    bind = op.get_bind()
+    names = sorted(row[0] for row in bind.execute(sa.text("SELECT DISTINCT category FROM sweets")))
+    first_names = {}
+    for name in names:
+        first_names.setdefault(_slugify(name), name)
+    if not first_names:
+        return
+    op.bulk_insert(categories, [{'name': name, 'slug': slug} for slug, name in first_names.items()])
+    ids = dict(bind.execute(sa.text("SELECT slug, id FROM categories")).all())
+    bind.execute(
+        sa.text("UPDATE sweets SET category_id = :category_id WHERE category = :category"),
+        [{'category_id': ids[_slugify(name)], 'category': name} for name in names]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sweets_category_id_id', table_name='sweets')
+    if op.get_bind().dialect.name == 'sqlite':
+        # SQLite cannot drop a column that references another table, so the
+        # table is rebuilt, which drops the search triggers; recreate them.
+        # Ids are kept, so the search index itself stays valid.
+        with op.batch_alter_table('sweets') as batch_op:
+            batch_op.drop_column('category_id')
+        for statement in SQLITE_SEARCH_TRIGGERS:
+            op.execute(statement)
+    else:
+        op.drop_constraint('sweets_category_id_fkey', 'sweets', type_='foreignkey')
+        op.drop_column('sweets', 'category_id')
+    op.drop_index('ix_categories_slug', table_name='categories')
+    op.drop_table('categories')
+
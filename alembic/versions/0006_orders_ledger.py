@@ -0,0 +1,75 @@
+"""orders ledger, partitioned by month on PostgreSQL, and daily sales rollups
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    # A partitioned table's primary key must include the partition key
+    primary_key = sa.PrimaryKeyConstraint('id', 'created_at') if postgresql else sa.PrimaryKeyConstraint('id')
+    op.create_table(
+        'orders',
+        sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=True, nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('sweet_id', sa.Integer(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=True),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('unit_price', sa.Float(), nullable=False),
+        primary_key,
+        postgresql_partition_by='RANGE (created_at)'
+    )
+    if postgresql:
+        # Month partitions are created ahead of time by the application
+        op.execute("CREATE TABLE orders_default PARTITION OF orders DEFAULT")
+
+    op.create_table(
+        'sales_daily_sweets',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('sweet_id', sa.Integer(), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.Column('units', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'sweet_id')
+    )
+    op.create_index('ix_sales_daily_sweets_sweet_id_day', 'sales_daily_sweets', ['sweet_id', 'day'], unique=False)
+    op.create_table(
+        'sales_daily_categories',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.Column('units', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'category_id')
+    )
+    state = op.create_table(
+        'sales_rollup_state',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('last_order_id', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(state, [{'id': 1, 'last_order_id': 0}])
+
+
+def downgrade() -> None:
+    op.drop_table('sales_rollup_state')
+    op.drop_table('sales_daily_categories')
+    op.drop_index('ix_sales_daily_sweets_sweet_id_day', table_name='sales_daily_sweets')
+    op.drop_table('sales_daily_sweets')
+    # Drops the partitions with it
+    op.drop_table('orders')
@@ -0,0 +1,48 @@
+"""checkout reservations holding stock until they expire
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'reservations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('sweet_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['sweet_id'], ['sweets.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_reservations_expires_at', 'reservations', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    # Hand held stock back before the holds are dropped
+    op.execute(
+        "UPDATE sweets SET quantity = quantity + (SELECT COALESCE(SUM(quantity), 0) FROM reservations "
+        "WHERE reservations.sweet_id = sweets.id) WHERE stock_shards = 0"
+    )
+    # Flash-sale stock lives in the shards; the first one takes it
+    op.execute(
+        "UPDATE sweet_stock_shards SET quantity = quantity + (SELECT COALESCE(SUM(quantity), 0) FROM reservations "
+        "WHERE reservations.sweet_id = sweet_stock_shards.sweet_id) WHERE shard = 0"
+    )
+    op.drop_index('ix_reservations_expires_at', table_name='reservations')
+    op.drop_table('reservations')
@@ -2,15 +2,26 @@ from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 import bcrypt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
 from app import models, schemas
+from app.cache import LRUCache
 from app.config import settings
-from app.database import get_db
+from app.database import get_db, get_session_factory, run_db, run_in_session
+from app.hashing import hashing_pool
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# Authenticated principals keyed by token subject (username). Entries are
+# invalidated when the user row changes in this process and expire after the
+# TTL, which bounds staleness for changes made by other workers.
+principal_cache = LRUCache(
+    max_size=settings.principal_cache_max_size,
+    ttl=settings.principal_cache_ttl_seconds
+)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash."""
     try:
@@ -24,7 +35,7 @@ def get_password_hash(password: str) -> str:
     password_bytes = password.encode('utf-8')
     if len(password_bytes) > 72:
         password_bytes = password_bytes[:72]
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=settings.bcrypt_rounds)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
@@ -47,9 +58,10 @@ def get_user_by_email(db: Session, email: str):
     """Get a user by email."""
     return db.query(models.User).filter(models.User.email == email).first()
 
-def create_user(db: Session, user: schemas.UserRegister):
+def create_user(db: Session, user: schemas.UserRegister, hashed_password: Optional[str] = None):
     """Create a new user."""
-    hashed_password = get_password_hash(user.password)
+    if hashed_password is None:
+        hashed_password = get_password_hash(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -60,42 +72,119 @@ def create_user(db: Session, user: schemas.UserRegister):
     db.refresh(db_user)
     return db_user
 
-def authenticate_user(db: Session, username: str, password: str):
-    """Authenticate a user."""
-    user = get_user_by_username(db, username)
+async def authenticate_user(db: Session, username: str, password: str):
+    """Authenticate a user, verifying the password on the hashing pool."""
+    user = await run_db(db, get_user_by_username, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await hashing_pool.run(verify_password, password, user.hashed_password):
         return False
     return user
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
-    """Get the current authenticated user."""
-    credentials_exception = HTTPException(
+def load_principal(db: Session, username: str):
+    """Load a principal from the database and cache it."""
+    user = get_user_by_username(db, username=username)
+    if user is None:
+        return None
+    principal = schemas.UserResponse.model_validate(user)
+    principal_cache.set(username, principal)
+    return principal
+
+async def get_principal(db: Session, username: str):
+    """Get the cached principal for a username, loading it on a miss.
+
+    Cache hits are served on the event loop; misses go through run_db so a
+    slow lookup never stalls other requests.
+    """
+    principal = principal_cache.get(username)
+    if principal is None:
+        principal = await run_db(db, load_principal, username)
+    return principal
+
+def _queue_principal_invalidation(mapper, connection, target):
+    """Remember the usernames of a changed user row until the commit."""
+    usernames = {target.username}
+    usernames.update(inspect(target).attrs.username.history.deleted or ())
+    session = object_session(target)
+    if session is None:
+        for username in usernames:
+            principal_cache.pop(username)
+        return
+    session.info.setdefault("stale_principals", set()).update(usernames)
+
+def _invalidate_principals(session):
+    """Drop cached principals for user rows changed in a committed session."""
+    for username in session.info.pop("stale_principals", ()):
+        principal_cache.pop(username)
+
+event.listen(models.User, "after_update", _queue_principal_invalidation)
+event.listen(models.User, "after_delete", _queue_principal_invalidation)
+event.listen(Session, "after_commit", _invalidate_principals)
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_access_token(token: str) -> dict:
+    """Decode an access token, raising 401 if it is invalid."""
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-    user = get_user_by_username(db, username=username)
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    return payload
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> schemas.UserResponse:
+    """Get the current authenticated user."""
+    payload = decode_access_token(token)
+    user = await get_principal(db, username=payload["sub"])
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
+async def get_stream_user(
+    access_token: Optional[str] = Query(None),
+    authorization: Optional[str] = Header(None),
+    session_factory=Depends(get_session_factory)
+) -> Optional[schemas.UserResponse]:
+    """Authenticate a long-lived stream, returning None for missing or bad credentials.
+
+    Browsers cannot set headers on EventSource or WebSocket connections, so
+    the token may also come as the access_token query parameter. A miss is
+    loaded in its own short session so the stream never holds a connection.
+    """
+    scheme, _, bearer = (authorization or "").partition(" ")
+    token = access_token or (bearer if scheme.lower() == "bearer" else None)
+    if not token:
+        return None
+    try:
+        username = decode_access_token(token)["sub"]
+    except HTTPException:
+        return None
+    principal = principal_cache.get(username)
+    if principal is None:
+        principal = await run_in_session(session_factory, load_principal, username)
+    return principal
+
 async def get_current_admin_user(
-    current_user: models.User = Depends(get_current_user)
-):
+    token: str = Depends(oauth2_scheme),
+    current_user: schemas.UserResponse = Depends(get_current_user)
+) -> schemas.UserResponse:
     """Get the current authenticated admin user."""
-    if not current_user.is_admin:
+    if settings.trust_admin_claim:
+        # The login endpoint signs is_admin into the token, so a demoted admin
+        # keeps access until the token expires.
+        is_admin = bool(decode_access_token(token).get("is_admin"))
+    else:
+        is_admin = current_user.is_admin
+    if not is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
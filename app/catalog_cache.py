@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import threading
+from typing import Awaitable, Callable, Optional
+from urllib.parse import urlencode
+from fastapi import HTTPException, Request, Response, status
+from app.cache import LRUCache
+from app.config import settings
+from app.database import set_statement_timeout
+from app.singleflight import SingleFlight
+
+class MemoryCacheBackend:
+    """Per-process cache backend: an LRU of bodies and a local generation.
+
+    Writes made by other worker processes are not seen here, so entries also
+    expire after a TTL. Use the shared backend when running several workers.
+    """
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        self._entries = LRUCache(max_size=max_size, ttl=ttl)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        self._entries.set(key, value)
+
+    async def generation(self) -> int:
+        return self._generation
+
+    async def bump_generation(self) -> int:
+        with self._lock:
+            self._generation += 1
+            return self._generation
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+class SharedCacheBackend:
+    """Cache backend over a shared store such as Redis (redis.asyncio).
+
+    The client needs async get, set(key, value, ex=seconds) and incr. Entries
+    expire after ttl seconds and old generations are never read again, so the
+    store's own eviction policy bounds memory.
+    """
+
+    def __init__(self, client, ttl: int, prefix: str = "sweets:catalog:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        await self.client.set(self.prefix + key, value, ex=self.ttl)
+
+    async def generation(self) -> int:
+        return int(await self.client.get(self.prefix + "generation") or 0)
+
+    async def bump_generation(self) -> int:
+        return await self.client.incr(self.prefix + "generation")
+
+    async def clear(self) -> None:
+        await self.bump_generation()
+
+class CatalogCache:
+    """Serialized catalog responses keyed by route, query and generation.
+
+    Every inventory write bumps the generation, which retires all earlier
+    entries at once. Bodies are stored with a strong ETag derived from
+    their content. Concurrent misses for the same entry share one render,
+    so a burst of identical requests costs one query; since the entry key
+    includes the generation, requests made after a write never join a
+    render that started before it. A render outlives any one request
+    waiting for it, so it runs in a session of its own.
+    """
+
+    def __init__(self, backend, render_timeout: Optional[float] = None):
+        self.backend = backend
+        self.flights = SingleFlight(render_timeout)
+
+    async def get_or_render(self, key: str, render: Callable[[], Awaitable[bytes]]):
+        """Return (body, etag) for key, rendering and storing it on a miss."""
+        generation = await self.backend.generation()
+        entry_key = f"{generation}:{key}"
+        entry = await self.backend.get(entry_key)
+        if entry is not None:
+            etag, _, body = entry.partition(b"\n")
+            return body, etag.decode()
+        return await self.flights.do(entry_key, lambda: self._render(entry_key, render))
+
+    async def _render(self, entry_key: str, render: Callable[[], Awaitable[bytes]]):
+        body = await render()
+        etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+        await self.backend.set(entry_key, etag.encode() + b"\n" + body)
+        return body, etag
+
+    async def invalidate(self) -> None:
+        """Retire every cached response after an inventory write."""
+        await self.backend.bump_generation()
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+
+def create_backend():
+    """Build the backend selected by CATALOG_CACHE_BACKEND."""
+    if settings.catalog_cache_backend == "redis":
+        # Optional dependency, only needed for the shared backend
+        import redis.asyncio
+        client = redis.asyncio.from_url(settings.catalog_cache_url)
+        return SharedCacheBackend(client, ttl=settings.catalog_cache_ttl_seconds)
+    return MemoryCacheBackend(
+        max_size=settings.catalog_cache_max_size,
+        ttl=settings.catalog_cache_ttl_seconds
+    )
+
+catalog_cache = CatalogCache(create_backend(), render_timeout=settings.catalog_render_timeout_seconds)
+
+def cache_key(request: Request) -> str:
+    """Key a request by route path and its sorted query parameters."""
+    query = urlencode(sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (tag.removeprefix("W/") for tag in candidates)
+
+async def cached_response(request: Request, route, render: Callable[..., bytes]) -> Response:
+    """Serve a cached JSON body, or 304 when the client already has it.
+
+    On a miss render(session) runs through route, a replicas.ReadRoute.
+    Replica renders may lag the primary, so they are kept apart from
+    primary ones, and users pinned to the primary after a write are only
+    served bodies the primary rendered after that write.
+    """
+    def render_bounded(db) -> bytes:
+        set_statement_timeout(db, settings.catalog_render_timeout_seconds)
+        return render(db)
+
+    key = f"{route.source}:{cache_key(request)}"
+    try:
+        body, etag = await catalog_cache.get_or_render(key, lambda: route.run(render_bounded))
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Catalog read timed out"
+        )
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,66 @@
+import re
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+class Category(NamedTuple):
+    id: int
+    name: str
+    slug: str
+
+def slugify(name: str) -> str:
+    """Normalize a category name to its slug; names with the same slug are one category."""
+    return re.sub(r"[\W_]+", "-", name.casefold()).strip("-") or "-"
+
+class CategoryLookup:
+    """In-memory copy of the categories table, by id and by slug.
+
+    Categories are few and never deleted, so every worker keeps them all.
+    It is loaded at startup, extended when a commit adds categories, and
+    reloaded on a miss, since another worker may have added the category.
+    Updates build new dicts and swap them in, so readers in other threads
+    only ever see a complete snapshot. Misses reload at most once per
+    interval, so requests for unknown categories cannot each force a
+    reload of the table.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        self.loaded = False
+        self.by_id: Dict[int, Category] = {}
+        self.by_slug: Dict[str, Category] = {}
+        self._reloaded_at = None
+
+    def claim_reload(self, interval: float) -> bool:
+        """Whether a miss may reload the table now, at most once per interval seconds."""
+        with self._lock:
+            now = time.monotonic()
+            if self.loaded and self._reloaded_at is not None and now - self._reloaded_at < interval:
+                return False
+            self._reloaded_at = now
+            return True
+
+    def add(self, category: Category) -> None:
+        self.by_id = {**self.by_id, category.id: category}
+        self.by_slug = {**self.by_slug, category.slug: category}
+
+    def replace(self, categories: List[Category]) -> None:
+        by_id = {category.id: category for category in categories}
+        by_slug = {category.slug: category for category in categories}
+        self.by_id, self.by_slug = by_id, by_slug
+        self.loaded = True
+
+    def find(self, category_id: Optional[int] = None, slug: Optional[str] = None) -> Optional[Category]:
+        """The category matching every criterion given, or None."""
+        category = self.by_id.get(category_id) if category_id is not None else self.by_slug.get(slug)
+        if category is None or (slug is not None and category.slug != slug):
+            return None
+        return category
+
+    def all(self) -> List[Category]:
+        return sorted(self.by_id.values(), key=lambda category: category.name.casefold())
+
+category_lookup = CategoryLookup()
@@ -6,9 +6,89 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
 
+    # Connection pool
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_pool_timeout: float = 30
+    database_pool_recycle: int = -1
+    database_pool_pre_ping: bool = False
+    database_pool_warmup: int = 0
+
+    # Read replicas (comma-separated URLs)
+    database_replica_urls: str = ""
+    replica_retry_seconds: float = 30
+    replica_sticky_seconds: float = 5
+
+    # Catalog pagination
+    pagination_default_limit: int = 100
+    pagination_max_limit: int = 500
+    export_batch_size: int = 1000
+    # Search facets: comma-separated upper bounds of the price buckets
+    search_price_buckets: str = "1,2.5,5,10"
+    import_batch_size: int = 1000
+
+    # Inventory change events ("memory" per process, or "redis" pub/sub)
+    events_backplane: str = "memory"
+    events_backplane_url: str = "redis://localhost:6379/0"
+    events_queue_size: int = 100
+    events_keepalive_seconds: float = 15
+
+    # Inventory stats: sweets below the threshold are listed as low stock,
+    # and the running totals are reloaded from the database this often
+    stats_low_stock_threshold: int = 10
+    stats_reconcile_seconds: float = 60
+
+    # Sales: orders are rolled up into daily totals this often, in batches
+    # of this many orders; PostgreSQL creates the ledger's month partitions
+    # this many months ahead, checking this often
+    sales_rollup_seconds: float = 5
+    sales_rollup_batch_size: int = 50000
+    orders_partition_months_ahead: int = 2
+    orders_partition_check_seconds: float = 3600
+
+    # Checkout reservations: how long a hold lasts, and how often and in
+    # what batches expired holds hand their stock back
+    reservation_ttl_seconds: float = 600
+    reservation_sweep_seconds: float = 1.0
+    reservation_sweep_batch_size: int = 1000
+
+    # Category filters: an unknown category reloads the categories table
+    # at most once per this many seconds
+    category_reload_seconds: float = 5
+
+    # Flash sales: how often shard totals are copied to sweets.quantity
+    flash_sale_sync_seconds: float = 1.0
+
+    # Catalog response cache ("memory" per process, or "redis" shared)
+    catalog_cache_backend: str = "memory"
+    catalog_cache_url: str = "redis://localhost:6379/0"
+    catalog_cache_max_size: int = 1000
+    catalog_cache_ttl_seconds: int = 30
+    # Concurrent identical misses share one render; callers stop waiting for
+    # it after this, and on PostgreSQL its queries are cancelled too
+    catalog_render_timeout_seconds: float = 10
+
+    # Authenticated principal cache
+    principal_cache_ttl_seconds: int = 60
+    principal_cache_max_size: int = 10000
+    trust_admin_claim: bool = False
+
+    # Password hashing
+    bcrypt_rounds: int = 12
+    hashing_workers: int = 4
+
+    # Login throttling
+    login_username_burst: int = 5
+    login_username_per_minute: float = 10
+    login_ip_burst: int = 20
+    login_ip_per_minute: float = 60
+    login_lockout_failures: int = 10
+    login_lockout_window_seconds: int = 300
+    login_lockout_seconds: int = 900
+    login_throttle_max_keys: int = 100000
+
     class Config:
         env_file = ".env"
         case_sensitive = False
 
 settings = Settings()
-
@@ -0,0 +1,918 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from itertools import chain
+from sqlalchemy import bindparam, case, delete, event, func, insert, inspect, select, text, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from app import ledger, models, schemas, search
+from app.categories import Category, category_lookup, slugify
+
+# The SweetResponse fields, selected as plain rows by the read endpoints
+RESPONSE_COLUMNS = (
+    models.Sweet.id,
+    models.Sweet.name,
+    models.Sweet.category,
+    models.Sweet.price,
+    models.Sweet.quantity,
+)
+
+def response_columns(fields: Sequence[str], *required: str) -> Tuple:
+    """Columns for the given fields, followed by any required ones not among them."""
+    names = list(fields) + [name for name in required if name not in fields]
+    return tuple(getattr(models.Sweet, name) for name in names)
+
+SORT_COLUMNS = {
+    "id": models.Sweet.id,
+    "name": models.Sweet.name,
+    "price": models.Sweet.price,
+}
+
+def _ordered(
+    query,
+    sort: str = "id",
+    descending: bool = False,
+    limit: Optional[int] = None,
+    after: Optional[Tuple] = None
+):
+    """Order a sweets query by (sort, id) and seek past the after position.
+
+    The seek compares the (sort, id) row value so it can use the index on
+    the sort column instead of scanning with OFFSET.
+    """
+    column = SORT_COLUMNS[sort]
+    columns = [column] if sort == "id" else [column, models.Sweet.id]
+    if after is not None:
+        value, last_id = after
+        key = tuple_(*columns) if len(columns) > 1 else column
+        position = tuple_(value, last_id) if len(columns) > 1 else last_id
+        query = query.filter(key < position if descending else key > position)
+    query = query.order_by(*(c.desc() if descending else c for c in columns))
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+def search_filters(
+    name: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    category_id: Optional[int] = None
+) -> List:
+    """Build the WHERE criteria shared by search and export."""
+    criteria = []
+
+    if category_id is not None:
+        criteria.append(models.Sweet.category_id == category_id)
+
+    if name:
+        criteria.append(search.contains(models.Sweet.name, name))
+
+    if category:
+        criteria.append(search.contains(models.Sweet.category, category))
+
+    if min_price is not None:
+        criteria.append(models.Sweet.price >= min_price)
+
+    if max_price is not None:
+        criteria.append(models.Sweet.price <= max_price)
+
+    return criteria
+
+def get_sweet(db: Session, sweet_id: int):
+    """Get a sweet by ID."""
+    return db.query(models.Sweet).filter(models.Sweet.id == sweet_id).first()
+
+def get_sweet_row(db: Session, sweet_id: int, columns: Sequence = RESPONSE_COLUMNS):
+    """Get just the given columns of a sweet, as a row."""
+    return db.query(*columns).filter(models.Sweet.id == sweet_id).first()
+
+def get_sweet_by_name(db: Session, name: str):
+    """Get a sweet by name."""
+    return db.query(models.Sweet).filter(models.Sweet.name == name).first()
+
+def get_sweets(db: Session, columns: Sequence = RESPONSE_COLUMNS, **page):
+    """Get the given columns of all sweets, optionally one keyset page of them."""
+    return _ordered(db.query(*columns), **page).all()
+
+def search_sweets(
+    db: Session,
+    name: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    category_id: Optional[int] = None,
+    columns: Sequence = RESPONSE_COLUMNS,
+    **page
+):
+    """Search sweets by name, category, or price range, returning the given columns."""
+    query = db.query(*columns).filter(*search_filters(name, category, min_price, max_price, category_id))
+    return _ordered(query, **page).all()
+
+def _price_bucket(boundaries: Sequence[float]):
+    """Index of a sweet's price bucket: bucket i holds prices below boundaries[i]."""
+    whens = [(models.Sweet.price < boundary, index) for index, boundary in enumerate(boundaries)]
+    return case(*whens, else_=len(boundaries))
+
+def search_facets(
+    db: Session,
+    boundaries: Sequence[float],
+    name: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    category_id: Optional[int] = None
+) -> schemas.SearchFacets:
+    """Count search matches per category and per price bucket.
+
+    One query groups by (category, bucket); both facets are sums over
+    that grid. boundaries must be ascending; without any, every price is
+    in one bucket and the query groups by category alone.
+    """
+    grouping = [models.Sweet.category]
+    if boundaries:
+        grouping.append(_price_bucket(boundaries).label("bucket"))
+    rows = (
+        db.query(*grouping, func.count())
+        .filter(*search_filters(name, category, min_price, max_price, category_id))
+        .group_by(*grouping)
+        .all()
+    )
+    categories = defaultdict(int)
+    buckets = [0] * (len(boundaries) + 1)
+    for row in rows:
+        category_name, count = row[0], row[-1]
+        categories[category_name] += count
+        buckets[row[1] if boundaries else 0] += count
+    edges = [None, *boundaries, None]
+    return schemas.SearchFacets(
+        total=sum(buckets),
+        categories=[
+            schemas.CategoryFacet(category=category_name, count=count)
+            for category_name, count in sorted(categories.items(), key=lambda item: (-item[1], item[0]))
+        ],
+        price_buckets=[
+            schemas.PriceBucket(min=edges[index], max=edges[index + 1], count=count)
+            for index, count in enumerate(buckets)
+        ]
+    )
+
+def load_categories(db: Session) -> None:
+    """Load every category into the in-memory lookup."""
+    rows = db.execute(select(models.Category.id, models.Category.name, models.Category.slug)).all()
+    category_lookup.replace([Category(*row) for row in rows])
+
+def ensure_categories(db: Session, names) -> Dict[str, int]:
+    """Map category names to category ids, creating the missing categories.
+
+    Names with the same slug share a category. New categories reach the
+    in-memory lookup only once the transaction commits.
+    """
+    slugs = {name: slugify(name) for name in names}
+    # One snapshot for both the check and the lookup, as a reload may swap it
+    known = category_lookup.by_slug
+    missing = {slug: name for name, slug in slugs.items() if slug not in known}
+    found = {}
+    if missing:
+        table = models.Category.__table__
+        dialect = db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            statement = dialect_insert(table).on_conflict_do_nothing(index_elements=[table.c.slug])
+            db.execute(statement, [{"name": name, "slug": slug} for slug, name in missing.items()])
+        else:
+            existing = set(db.scalars(select(table.c.slug).where(table.c.slug.in_(missing))))
+            new_rows = [{"name": name, "slug": slug} for slug, name in missing.items() if slug not in existing]
+            if new_rows:
+                db.execute(insert(table), new_rows)
+        rows = db.execute(select(table.c.id, table.c.name, table.c.slug).where(table.c.slug.in_(missing)))
+        for row in rows:
+            found[row.slug] = Category(*row)
+        db.info.setdefault("new_categories", []).extend(found.values())
+    return {
+        name: (found.get(slug) or known[slug]).id for name, slug in slugs.items()
+    }
+
+@event.listens_for(Session, "before_flush")
+def _assign_categories(session, flush_context, instances):
+    """Point new and re-categorized sweets at their categories row."""
+    sweets = [
+        obj for obj in chain(session.new, session.dirty)
+        if isinstance(obj, models.Sweet)
+        and (obj in session.new or inspect(obj).attrs.category.history.has_changes())
+    ]
+    if sweets:
+        ids = ensure_categories(session, {sweet.category for sweet in sweets})
+        for sweet in sweets:
+            sweet.category_id = ids[sweet.category]
+
+@event.listens_for(Session, "after_commit")
+def _publish_categories(session):
+    for category in session.info.pop("new_categories", []):
+        category_lookup.add(category)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_categories(session):
+    session.info.pop("new_categories", None)
+
+def create_sweet(db: Session, sweet: schemas.SweetCreate):
+    """Create a new sweet."""
+    db_sweet = models.Sweet(**sweet.dict())
+    db.add(db_sweet)
+    db.commit()
+    db.refresh(db_sweet)
+    return db_sweet
+
+def update_sweet(db: Session, db_sweet: models.Sweet, sweet_update: schemas.SweetUpdate):
+    """Apply the fields set on sweet_update to a sweet."""
+    update_data = sweet_update.dict(exclude_unset=True)
+    # Flash-sale stock lives in the shards, so spread a new quantity over them
+    quantity = update_data.pop("quantity", None) if db_sweet.stock_shards else None
+    for field, value in update_data.items():
+        setattr(db_sweet, field, value)
+    if quantity is not None:
+        _take_shards(db, db_sweet.id)
+        _fill_shards(db, db_sweet.id, quantity, db_sweet.stock_shards)
+        db_sweet.quantity = quantity
+
+    db.commit()
+    db.refresh(db_sweet)
+    return db_sweet
+
+UPSERT_FIELDS = ("category", "price", "quantity")
+
+def _upsert_values(fields: Tuple[str, ...], source) -> dict:
+    """SET clause for an upsert, leaving the stock of flash-sale sweets alone."""
+    table = models.Sweet.__table__
+    values = {field: source(field) for field in fields}
+    if "quantity" in values:
+        values["quantity"] = case((table.c.stock_shards == 0, values["quantity"]), else_=table.c.quantity)
+    return values
+
+def _upsert_rows(db: Session, fields: Tuple[str, ...], rows: List[dict], existing: set):
+    """Insert rows, overwriting fields on sweets whose name already exists."""
+    table = models.Sweet.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = dialect_insert(table)
+        if fields:
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.name],
+                set_=_upsert_values(fields, lambda field: statement.excluded[field])
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=[table.c.name])
+        db.execute(statement, rows)
+        return
+
+    new_rows = [row for row in rows if row["name"] not in existing]
+    if new_rows:
+        db.execute(insert(table), new_rows)
+    changed_rows = [
+        {f"b_{key}": value for key, value in row.items()} for row in rows if row["name"] in existing
+    ]
+    if changed_rows and fields:
+        statement = (
+            update(table)
+            .where(table.c.name == bindparam("b_name"))
+            .values(_upsert_values(fields, lambda field: bindparam(f"b_{field}")))
+        )
+        db.execute(statement, changed_rows)
+
+def upsert_sweets(db: Session, sweets: List[schemas.SweetCreate]) -> Tuple[int, int, int]:
+    """Insert or update a batch of sweets by name in one transaction.
+
+    Existing sweets only get the fields a record actually set, so a price
+    list without quantities leaves stock alone. When a name repeats, the
+    last record wins and the earlier ones are skipped. Returns (inserted,
+    updated, skipped).
+    """
+    by_name = {sweet.name: sweet for sweet in sweets}
+    existing = set(db.scalars(select(models.Sweet.name).where(models.Sweet.name.in_(by_name))))
+
+    category_ids = ensure_categories(db, {sweet.category for sweet in by_name.values()})
+
+    # One executemany per distinct set of provided fields
+    groups = defaultdict(list)
+    for sweet in by_name.values():
+        fields = tuple(field for field in UPSERT_FIELDS if field in sweet.model_fields_set)
+        if "category" in fields:
+            fields += ("category_id",)
+        groups[fields].append(dict(sweet.model_dump(), category_id=category_ids[sweet.category]))
+    for fields, rows in groups.items():
+        _upsert_rows(db, fields, rows, existing)
+
+    db.commit()
+    return len(by_name) - len(existing), len(existing), len(sweets) - len(by_name)
+
+def delete_sweet(db: Session, db_sweet: models.Sweet):
+    """Delete a sweet."""
+    db.execute(delete(models.StockShard).where(models.StockShard.sweet_id == db_sweet.id))
+    db.execute(delete(models.Reservation).where(models.Reservation.sweet_id == db_sweet.id))
+    db.delete(db_sweet)
+    db.commit()
+
+def _update_returning(db: Session, sweet_id: int, *criteria, **values) -> Optional[models.Sweet]:
+    """Conditionally update a sweet and return its new row, without committing."""
+    statement = (
+        update(models.Sweet)
+        .where(models.Sweet.id == sweet_id, *criteria)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if db.get_bind().dialect.update_returning:
+        return db.scalars(
+            statement.returning(models.Sweet).execution_options(populate_existing=True)
+        ).first()
+    # Read the row back in the same transaction, which still holds the
+    # lock taken by the UPDATE
+    return get_sweet(db, sweet_id) if db.execute(statement).rowcount else None
+
+def _shard_total(sweet_id):
+    """Scalar subquery summing a sweet's shards; sweet_id may be a column."""
+    return (
+        select(func.coalesce(func.sum(models.StockShard.quantity), 0))
+        .where(models.StockShard.sweet_id == sweet_id)
+        .scalar_subquery()
+    )
+
+def _get_sweet_with_shard_total(db: Session, sweet_id: int) -> models.Sweet:
+    """Load a flash-sale sweet with its quantity taken from its shards."""
+    db_sweet, total = db.execute(
+        select(models.Sweet, _shard_total(sweet_id))
+        .where(models.Sweet.id == sweet_id)
+        .execution_options(populate_existing=True)
+    ).one()
+    set_committed_value(db_sweet, "quantity", total)
+    return db_sweet
+
+# Ids of sweets in flash-sale mode, refreshed by sync_flash_sale_quantities.
+# Only a routing hint: purchases of these skip the UPDATE on the hot sweets
+# row, and fall back to it when the sweet turns out to have no shards.
+flash_sale_ids = set()
+
+def _update_one_shard(db: Session, sweet_id: int, delta: int, skip_locked: bool) -> bool:
+    """Add delta to one random shard that can take it."""
+    shard = (
+        select(models.StockShard.shard)
+        .where(models.StockShard.sweet_id == sweet_id, models.StockShard.quantity >= -delta)
+        .order_by(func.random())
+        .limit(1)
+    )
+    if skip_locked:
+        shard = shard.with_for_update(skip_locked=True)
+    statement = (
+        update(models.StockShard)
+        .where(
+            models.StockShard.sweet_id == sweet_id,
+            models.StockShard.shard == shard.scalar_subquery(),
+            models.StockShard.quantity >= -delta
+        )
+        .values(quantity=models.StockShard.quantity + delta)
+        .execution_options(synchronize_session=False)
+    )
+    return bool(db.execute(statement).rowcount)
+
+def _apply_shard_delta(db: Session, sweet_id: int, delta: int) -> Optional[bool]:
+    """Add delta to a flash-sale sweet's shards.
+
+    Returns True when applied, False when the shards hold too little stock,
+    and None when the sweet has no shards.
+    """
+    # Usually some shard is free: take it without waiting on the others
+    if _update_one_shard(db, sweet_id, delta, skip_locked=True):
+        return True
+
+    count, total = db.execute(
+        select(func.count(), func.coalesce(func.sum(models.StockShard.quantity), 0))
+        .where(models.StockShard.sweet_id == sweet_id)
+    ).one()
+    if not count:
+        return None
+    if total < -delta:
+        return False
+
+    # Every shard that could take it is busy: queue on one of them. In
+    # PostgreSQL a waiting UPDATE whose recheck fails keeps the row locked,
+    # so the savepoint releases it before the fallback below locks others.
+    savepoint = db.begin_nested()
+    if _update_one_shard(db, sweet_id, delta, skip_locked=False):
+        savepoint.commit()
+        return True
+    savepoint.rollback()
+
+    # No shard holds enough alone: lock them all in shard order, so
+    # concurrent buyers cannot deadlock, and spread the change over them
+    rows = (
+        db.query(models.StockShard)
+        .filter(models.StockShard.sweet_id == sweet_id)
+        .order_by(models.StockShard.shard)
+        .with_for_update()
+        .all()
+    )
+    if sum(row.quantity for row in rows) < -delta:
+        return False
+    needed = -delta
+    for row in rows:
+        taken = min(row.quantity, needed)
+        row.quantity -= taken
+        needed -= taken
+    db.flush()
+    return True
+
+def _apply_delta(db: Session, sweet_id: int, delta: int) -> Optional[models.Sweet]:
+    """Conditionally add delta to a sweet's stock without committing."""
+    if sweet_id in flash_sale_ids:
+        applied = _apply_shard_delta(db, sweet_id, delta)
+        if applied is not None:
+            return _get_sweet_with_shard_total(db, sweet_id) if applied else None
+
+    db_sweet = _update_returning(
+        db,
+        sweet_id,
+        models.Sweet.stock_shards == 0,
+        models.Sweet.quantity >= -delta,
+        quantity=models.Sweet.quantity + delta
+    )
+    if db_sweet is not None or sweet_id in flash_sale_ids:
+        return db_sweet
+
+    # The UPDATE skips flash-sale sweets, whose stock lives in shard rows
+    db_sweet = get_sweet(db, sweet_id)
+    if db_sweet is None or not db_sweet.stock_shards:
+        return None
+    return _get_sweet_with_shard_total(db, sweet_id) if _apply_shard_delta(db, sweet_id, delta) else None
+
+def adjust_quantity(db: Session, sweet_id: int, delta: int) -> Optional[models.Sweet]:
+    """Atomically add delta to a sweet's quantity unless it would drop below zero.
+
+    The stock check and the change are one conditional UPDATE, so concurrent
+    purchases cannot oversell. Returns the updated sweet, or None when the
+    sweet does not exist or has too little stock.
+    """
+    db_sweet = _apply_delta(db, sweet_id, delta)
+    if db_sweet is not None:
+        # Detach so the commit does not expire the values just returned
+        db.expunge(db_sweet)
+    db.commit()
+    return db_sweet
+
+def _utcnow() -> datetime:
+    """Naive UTC, as the DateTime columns store it."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _record_orders(db: Session, user_id: int, lines: List[Tuple[models.Sweet, int]]) -> None:
+    """Append an order per (sweet, quantity) line to the ledger, without committing.
+
+    The sweets are the rows the stock update returned, so the price and
+    category need no extra read, and all lines go in one INSERT: the ledger
+    costs a purchase one round trip.
+    """
+    created_at = _utcnow()
+    db.execute(insert(models.Order.__table__).values([
+        {
+            "created_at": created_at,
+            "user_id": user_id,
+            "sweet_id": db_sweet.id,
+            "category_id": db_sweet.category_id,
+            "quantity": quantity,
+            "unit_price": db_sweet.price,
+        }
+        for db_sweet, quantity in lines
+    ]))
+
+def purchase(db: Session, user_id: int, sweet_id: int, quantity: int) -> Optional[models.Sweet]:
+    """Buy quantity units of a sweet, recording the order in the same transaction.
+
+    Returns the updated sweet, or None, with nothing recorded, when the
+    sweet does not exist or has too little stock.
+    """
+    db_sweet = _apply_delta(db, sweet_id, -quantity)
+    if db_sweet is not None:
+        _record_orders(db, user_id, [(db_sweet, quantity)])
+        db.expunge(db_sweet)
+    db.commit()
+    return db_sweet
+
+def available_stock(db: Session, sweet_ids: List[int]) -> Dict[int, int]:
+    """Current stock of each existing sweet in sweet_ids, summing flash-sale shards."""
+    rows = (
+        db.query(models.Sweet.id, models.Sweet.quantity, models.Sweet.stock_shards)
+        .filter(models.Sweet.id.in_(sweet_ids))
+        .all()
+    )
+    sharded = [sweet_id for sweet_id, _, shards in rows if shards]
+    totals = {}
+    if sharded:
+        totals = dict(
+            db.query(models.StockShard.sweet_id, func.sum(models.StockShard.quantity))
+            .filter(models.StockShard.sweet_id.in_(sharded))
+            .group_by(models.StockShard.sweet_id)
+            .all()
+        )
+    return {
+        sweet_id: totals.get(sweet_id, 0) if shards else quantity
+        for sweet_id, quantity, shards in rows
+    }
+
+def inventory_rows(db: Session) -> List:
+    """(id, category, price, stock) of every sweet, summing flash-sale shards."""
+    stock = case((models.Sweet.stock_shards > 0, _shard_total(models.Sweet.id)), else_=models.Sweet.quantity)
+    return db.execute(select(models.Sweet.id, models.Sweet.category, models.Sweet.price, stock)).all()
+
+def sweet_names(db: Session, sweet_ids: List[int]) -> Dict[int, str]:
+    """Names of the existing sweets among sweet_ids."""
+    return dict(db.query(models.Sweet.id, models.Sweet.name).filter(models.Sweet.id.in_(sweet_ids)).all())
+
+def checkout(
+    db: Session, user_id: int, quantities: Dict[int, int]
+) -> Tuple[List[models.Sweet], Dict[int, Optional[int]]]:
+    """Buy several sweets in one transaction, all or nothing, recording the orders.
+
+    Lines are applied in ascending id order so concurrent checkouts lock
+    rows in the same order and cannot deadlock. Returns the updated sweets,
+    or, if any line failed, no sweets and a map of each failed sweet id to
+    its available quantity (None when the sweet does not exist).
+    """
+    sweets, failed = [], []
+    for sweet_id in sorted(quantities):
+        db_sweet = _apply_delta(db, sweet_id, -quantities[sweet_id])
+        if db_sweet is None:
+            failed.append(sweet_id)
+        else:
+            sweets.append(db_sweet)
+
+    if failed:
+        db.rollback()
+        available = available_stock(db, failed)
+        return [], {sweet_id: available.get(sweet_id) for sweet_id in failed}
+
+    _record_orders(db, user_id, [(db_sweet, quantities[db_sweet.id]) for db_sweet in sweets])
+    for db_sweet in sweets:
+        db.expunge(db_sweet)
+    db.commit()
+    return sweets, {}
+
+def reserve(
+    db: Session, user_id: int, sweet_id: int, quantity: int, ttl_seconds: float
+) -> Optional[Tuple[models.Reservation, models.Sweet]]:
+    """Hold quantity units of a sweet for a user for ttl_seconds.
+
+    The stock is taken with the same conditional UPDATE as a purchase, so
+    holds from every worker together can never exceed the stock. Returns
+    the reservation and the updated sweet, or None when the sweet does not
+    exist or has too little stock.
+    """
+    db_sweet = _apply_delta(db, sweet_id, -quantity)
+    if db_sweet is None:
+        db.rollback()
+        return None
+    reservation = models.Reservation(
+        user_id=user_id,
+        sweet_id=sweet_id,
+        quantity=quantity,
+        expires_at=_utcnow() + timedelta(seconds=ttl_seconds)
+    )
+    db.add(reservation)
+    db.flush()
+    db.expunge(reservation)
+    db.expunge(db_sweet)
+    db.commit()
+    return reservation, db_sweet
+
+def _take_reservations(db: Session, *criteria) -> List[Tuple[int, int]]:
+    """Delete the reservations matching criteria, returning their (sweet_id, quantity).
+
+    Deleting is what claims a reservation, so a hold that is confirmed,
+    released and swept at once is only acted on by whichever gets it first.
+    """
+    table = models.Reservation.__table__
+    statement = delete(table).where(*criteria)
+    if db.get_bind().dialect.delete_returning:
+        return db.execute(statement.returning(table.c.sweet_id, table.c.quantity)).all()
+    rows = db.execute(select(table.c.id, table.c.sweet_id, table.c.quantity).where(*criteria).with_for_update()).all()
+    if rows:
+        db.execute(delete(table).where(table.c.id.in_([row.id for row in rows])))
+    return [(row.sweet_id, row.quantity) for row in rows]
+
+def _return_stock(db: Session, held: List[Tuple[int, int]]) -> List[models.Sweet]:
+    """Give held stock back to its sweets, returning the updated sweets.
+
+    A sweep returns stock to up to a batch of sweets at once, so they are
+    locked in one ordered SELECT and updated by one UPDATE, rather than a
+    statement per sweet.
+    """
+    totals = defaultdict(int)
+    for sweet_id, quantity in held:
+        totals[sweet_id] += quantity
+    if not totals:
+        return []
+    # Ascending id order, as in checkout, so concurrent writers cannot deadlock
+    rows = db.execute(
+        select(models.Sweet.id, models.Sweet.stock_shards)
+        .where(models.Sweet.id.in_(totals))
+        .order_by(models.Sweet.id)
+        .with_for_update()
+    ).all()
+    plain = [sweet_id for sweet_id, shards in rows if not shards]
+    sweets = []
+    if plain:
+        statement = (
+            update(models.Sweet)
+            .where(models.Sweet.id.in_(plain))
+            .values(quantity=models.Sweet.quantity + case({sweet_id: totals[sweet_id] for sweet_id in plain}, value=models.Sweet.id))
+            .execution_options(synchronize_session=False)
+        )
+        if db.get_bind().dialect.update_returning:
+            sweets = list(db.scalars(statement.returning(models.Sweet).execution_options(populate_existing=True)))
+        else:
+            db.execute(statement)
+            sweets = db.query(models.Sweet).filter(models.Sweet.id.in_(plain)).populate_existing().all()
+    for sweet_id, shards in rows:
+        if shards and _apply_shard_delta(db, sweet_id, totals[sweet_id]):
+            sweets.append(_get_sweet_with_shard_total(db, sweet_id))
+    for db_sweet in sweets:
+        db.expunge(db_sweet)
+    return sweets
+
+def confirm_reservation(db: Session, user_id: int, reservation_id: int) -> Optional[models.Sweet]:
+    """Turn a user's unexpired hold into an order.
+
+    The stock was taken when the hold was made, so only the order is
+    written. Returns the sweet, or None when there is no such hold.
+    """
+    reservation = models.Reservation.__table__
+    held = _take_reservations(
+        db,
+        reservation.c.id == reservation_id,
+        reservation.c.user_id == user_id,
+        reservation.c.expires_at > _utcnow()
+    )
+    if not held:
+        db.rollback()
+        return None
+    (sweet_id, quantity), = held
+    db_sweet = get_sweet(db, sweet_id)
+    if db_sweet.stock_shards:
+        db_sweet = _get_sweet_with_shard_total(db, sweet_id)
+    _record_orders(db, user_id, [(db_sweet, quantity)])
+    db.expunge(db_sweet)
+    db.commit()
+    return db_sweet
+
+def release_reservation(db: Session, user_id: int, reservation_id: int) -> Optional[models.Sweet]:
+    """Cancel a user's hold, returning its stock. Returns the sweet, or None when there is no such hold."""
+    reservation = models.Reservation.__table__
+    held = _take_reservations(db, reservation.c.id == reservation_id, reservation.c.user_id == user_id)
+    if not held:
+        db.rollback()
+        return None
+    sweets = _return_stock(db, held)
+    db.commit()
+    return sweets[0] if sweets else None
+
+def expire_reservations(db: Session, batch_size: int) -> Tuple[int, List[models.Sweet]]:
+    """Reclaim the stock of up to batch_size expired holds, oldest first.
+
+    Reads the expires_at index rather than scanning the holds. On
+    PostgreSQL, holds another worker's sweep or a confirmation has locked
+    are skipped rather than waited for. Returns the number of holds
+    reclaimed and the sweets whose stock came back.
+    """
+    reservation = models.Reservation.__table__
+    expired = (
+        select(reservation.c.id)
+        .where(reservation.c.expires_at <= _utcnow())
+        .order_by(reservation.c.expires_at)
+        .limit(batch_size)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        expired = expired.with_for_update(skip_locked=True)
+    held = _take_reservations(db, reservation.c.id.in_(expired.scalar_subquery()))
+    sweets = _return_stock(db, held)
+    db.commit()
+    return len(held), sweets
+
+def _take_shards(db: Session, sweet_id: int) -> int:
+    """Delete a sweet's stock shards and return the stock they held."""
+    statement = delete(models.StockShard).where(models.StockShard.sweet_id == sweet_id)
+    if db.get_bind().dialect.delete_returning:
+        # Reads and removes in one statement, so no concurrent purchase is lost
+        return sum(db.scalars(statement.returning(models.StockShard.quantity)))
+    total = sum(db.scalars(
+        select(models.StockShard.quantity)
+        .where(models.StockShard.sweet_id == sweet_id)
+        .with_for_update()
+    ))
+    db.execute(statement)
+    return total
+
+def _fill_shards(db: Session, sweet_id: int, total: int, shards: int):
+    """Spread total stock as evenly as possible over new shard rows."""
+    base, extra = divmod(total, shards)
+    db.execute(insert(models.StockShard), [
+        {"sweet_id": sweet_id, "shard": shard, "quantity": base + (shard < extra)}
+        for shard in range(shards)
+    ])
+
+def set_stock_shards(db: Session, sweet_id: int, shards: int) -> Optional[models.Sweet]:
+    """Move a sweet's stock onto `shards` shard rows, or back onto the sweet when 0.
+
+    Returns the sweet, or None when it does not exist.
+    """
+    # A no-op UPDATE locks the sweet (and SQLite's database) until commit,
+    # so normal-mode purchases wait and then see the new mode
+    db_sweet = _update_returning(db, sweet_id, stock_shards=models.Sweet.stock_shards)
+    if db_sweet is None:
+        db.rollback()
+        return None
+
+    total = _take_shards(db, sweet_id) if db_sweet.stock_shards else db_sweet.quantity
+    if shards:
+        _fill_shards(db, sweet_id, total, shards)
+    db_sweet.stock_shards = shards
+    db_sweet.quantity = total
+    db.flush()
+    db.expunge(db_sweet)
+    db.commit()
+    if shards:
+        flash_sale_ids.add(sweet_id)
+    else:
+        flash_sale_ids.discard(sweet_id)
+    return db_sweet
+
+def sync_flash_sale_quantities(db: Session) -> int:
+    """Copy shard totals onto sweets.quantity so catalog reads see flash-sale stock.
+
+    Also refreshes flash_sale_ids with switches made by other workers.
+    Returns the number of sweets whose quantity changed.
+    """
+    shard_total = _shard_total(models.Sweet.id)
+    result = db.execute(
+        update(models.Sweet)
+        .where(models.Sweet.stock_shards > 0, models.Sweet.quantity != shard_total)
+        .values(quantity=shard_total)
+        .execution_options(synchronize_session=False)
+    )
+    current = set(db.scalars(select(models.Sweet.id).where(models.Sweet.stock_shards > 0)))
+    db.commit()
+    flash_sale_ids.difference_update(flash_sale_ids - current)
+    flash_sale_ids.update(current)
+    return result.rowcount
+
+# Ids are handed out before commit, so a higher order id can become visible
+# before a lower one. Rolling up everything visible would then skip the
+# lower one for good, so the rollups only advance to a settled id.
+LEDGER_LOCK_TIMEOUT = "200ms"
+
+def settled_order_id(db: Session) -> int:
+    """The highest order id at or below which every order has committed or rolled back.
+
+    On PostgreSQL a SHARE lock on the ledger waits out the transactions
+    still inserting into it and is released straight away; purchases queue
+    behind it for at most LEDGER_LOCK_TIMEOUT. SQLite commits one writer at
+    a time, in id order, so whatever is visible has settled.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(f"SET LOCAL lock_timeout = '{LEDGER_LOCK_TIMEOUT}'"))
+        db.execute(text(f"LOCK TABLE {ledger.ORDERS_TABLE} IN SHARE MODE"))
+    settled = db.scalar(select(func.max(models.Order.id))) or 0
+    db.commit()
+    return settled
+
+def _lock_rollup_state(db: Session) -> int:
+    """Lock the rollup state row until commit and return the last order id rolled up."""
+    table = models.SalesRollupState.__table__
+    # A no-op UPDATE takes the row lock (and SQLite's write lock), so
+    # concurrent aggregators queue here instead of counting a batch twice
+    locked = db.execute(
+        update(table).where(table.c.id == 1).values(last_order_id=table.c.last_order_id)
+    ).rowcount
+    if not locked:
+        db.execute(insert(table).values(id=1, last_order_id=0))
+        return 0
+    return db.scalar(select(table.c.last_order_id).where(table.c.id == 1))
+
+ROLLUP_TOTALS = ("orders", "units", "revenue")
+
+def _rollup_orders(db: Session, table, key: str, criteria) -> None:
+    """Add the daily totals of the orders matching criteria, grouped by key, to a rollup table."""
+    orders = models.Order.__table__
+    day = func.date(orders.c.created_at)
+    source = (
+        select(
+            day,
+            orders.c[key],
+            func.count(),
+            func.sum(orders.c.quantity),
+            func.sum(orders.c.quantity * orders.c.unit_price)
+        )
+        .where(*criteria, orders.c[key].is_not(None))
+        .group_by(day, orders.c[key])
+    )
+    columns = ["day", key, *ROLLUP_TOTALS]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = dialect_insert(table).from_select(columns, source)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.day, table.c[key]],
+            set_={name: table.c[name] + statement.excluded[name] for name in ROLLUP_TOTALS}
+        )
+        db.execute(statement)
+        return
+
+    rows = [dict(zip(columns, row)) for row in db.execute(source)]
+    existing = set(db.execute(
+        select(table.c.day, table.c[key]).where(tuple_(table.c.day, table.c[key]).in_(
+            [(row["day"], row[key]) for row in rows]
+        ))
+    ).all()) if rows else set()
+    new_rows = [row for row in rows if (row["day"], row[key]) not in existing]
+    if new_rows:
+        db.execute(insert(table), new_rows)
+    changed_rows = [
+        {f"b_{name}": value for name, value in row.items()} for row in rows if (row["day"], row[key]) in existing
+    ]
+    if changed_rows:
+        db.execute(
+            update(table)
+            .where(table.c.day == bindparam("b_day"), table.c[key] == bindparam(f"b_{key}"))
+            .values({name: table.c[name] + bindparam(f"b_{name}") for name in ROLLUP_TOTALS}),
+            changed_rows
+        )
+
+def aggregate_orders(db: Session, settled: int, batch_size: int) -> int:
+    """Add the next batch of orders up to id settled to the daily rollups.
+
+    The batch's totals and the new high-water mark commit together, so
+    every order is counted exactly once. Returns the number of orders added,
+    0 once the rollups are caught up.
+    """
+    last = _lock_rollup_state(db)
+    if last >= settled:
+        db.rollback()
+        return 0
+    order_id = models.Order.id
+    end = db.scalar(
+        select(order_id)
+        .where(order_id > last, order_id <= settled)
+        .order_by(order_id)
+        .offset(batch_size - 1)
+        .limit(1)
+    ) or settled
+    criteria = (order_id > last, order_id <= end)
+    count = db.scalar(select(func.count()).where(*criteria))
+    _rollup_orders(db, models.DailySweetSales.__table__, "sweet_id", criteria)
+    _rollup_orders(db, models.DailyCategorySales.__table__, "category_id", criteria)
+    table = models.SalesRollupState.__table__
+    db.execute(update(table).where(table.c.id == 1).values(last_order_id=end))
+    db.commit()
+    return count
+
+def _sales_totals(table) -> Tuple:
+    return tuple(func.sum(table.c[name]) for name in ROLLUP_TOTALS)
+
+def sales_by_day(
+    db: Session,
+    start: date,
+    end: date,
+    sweet_id: Optional[int] = None,
+    category_id: Optional[int] = None
+) -> List:
+    """(day, orders, units, revenue) for each day with sales from start to end, inclusive."""
+    if category_id is not None:
+        table = models.DailyCategorySales.__table__
+        criteria = [table.c.category_id == category_id]
+    else:
+        table = models.DailySweetSales.__table__
+        criteria = [table.c.sweet_id == sweet_id] if sweet_id is not None else []
+    return db.execute(
+        select(table.c.day, *_sales_totals(table))
+        .where(table.c.day.between(start, end), *criteria)
+        .group_by(table.c.day)
+        .order_by(table.c.day)
+    ).all()
+
+def sales_by_sweet(db: Session, start: date, end: date, limit: int) -> List:
+    """(sweet_id, orders, units, revenue) of the top-grossing sweets from start to end, inclusive."""
+    table = models.DailySweetSales.__table__
+    return db.execute(
+        select(table.c.sweet_id, *_sales_totals(table))
+        .where(table.c.day.between(start, end))
+        .group_by(table.c.sweet_id)
+        .order_by(func.sum(table.c.revenue).desc(), table.c.sweet_id)
+        .limit(limit)
+    ).all()
+
+def sales_by_category(db: Session, start: date, end: date) -> List:
+    """(category_id, orders, units, revenue) of each category with sales from start to end, inclusive."""
+    table = models.DailyCategorySales.__table__
+    return db.execute(
+        select(table.c.category_id, *_sales_totals(table))
+        .where(table.c.day.between(start, end))
+        .group_by(table.c.category_id)
+        .order_by(func.sum(table.c.revenue).desc(), table.c.category_id)
+    ).all()
@@ -1,17 +1,265 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import Optional
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
 from app.config import settings
 
-engine = create_engine(settings.database_url)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ASYNC_DRIVERS = {"asyncpg", "aiosqlite", "asyncmy", "aiomysql", "psycopg_async"}
+
+def is_async_url(url) -> bool:
+    """Return True if the database URL names an asyncio driver."""
+    return make_url(url).get_driver_name() in ASYNC_DRIVERS
+
+class PoolStats:
+    """Connection pool counters fed by pool events and checkout timing."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+
+class _InstrumentedPoolMixin:
+    """Times how long callers wait for a pooled connection."""
+
+    stats: PoolStats
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_wait(time.perf_counter() - started_at, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - started_at)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+def create_db_engine(url):
+    """Create a sync or async engine with the configured, instrumented pool."""
+    is_async = is_async_url(url)
+    db_engine = (create_async_engine if is_async else create_engine)(
+        url,
+        poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        pool_size=settings.database_pool_size,
+        max_overflow=settings.database_max_overflow,
+        pool_timeout=settings.database_pool_timeout,
+        pool_recycle=settings.database_pool_recycle,
+        pool_pre_ping=settings.database_pool_pre_ping,
+    )
+    sync_engine = db_engine.sync_engine if is_async else db_engine
+    stats = PoolStats()
+    sync_engine.pool.stats = stats
+    event.listen(sync_engine, "connect", stats.on_connect)
+    event.listen(sync_engine, "checkout", stats.on_checkout)
+    event.listen(sync_engine, "checkin", stats.on_checkin)
+    return db_engine
+
+def pool_status(db_engine) -> dict:
+    """Report live pool usage and checkout statistics for an engine."""
+    pool = getattr(db_engine, "sync_engine", db_engine).pool
+    stats = getattr(pool, "stats", None)
+    status = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+    if stats is not None:
+        status.update({
+            "connects": stats.connects,
+            "checkouts": stats.checkouts,
+            "checkins": stats.checkins,
+            "checkout_timeouts": stats.timeouts,
+            "avg_checkout_wait_ms": round(stats.wait_seconds * 1000 / stats.checkouts, 3) if stats.checkouts else 0.0,
+            "max_checkout_wait_ms": round(stats.max_wait_seconds * 1000, 3),
+        })
+    return status
+
+async_mode = is_async_url(settings.database_url)
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+# The primary engine is created on first use rather than at import, so
+# importing the app (workers, tests, scripts) never touches the database.
+_engine = None
+_sessionmaker = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Return the primary engine, creating it on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_db_engine(settings.database_url)
+    return _engine
+
+def get_sessionmaker():
+    """Return the session factory bound to the primary engine."""
+    global _sessionmaker
+    if _sessionmaker is None:
+        if async_mode:
+            _sessionmaker = async_sessionmaker(get_engine(), autoflush=False, expire_on_commit=False)
+        else:
+            _sessionmaker = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+    return _sessionmaker
+
+def __getattr__(name):
+    # Lazy access to the module-level engine and SessionLocal names
+    if name == "engine":
+        return get_engine()
+    if name == "SessionLocal":
+        return get_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+if async_mode:
+    async def get_db():
+        async with get_sessionmaker()() as db:
+            yield db
+else:
+    def get_db():
+        db = get_sessionmaker()()
+        try:
+            yield db
+        finally:
+            db.close()
+
+def get_session_factory():
+    """Return the session factory for handlers that open their own sessions.
+
+    Streaming responses outlive the request-scoped get_db session, so they
+    open a session from this factory inside the response body instead.
+    """
+    return get_sessionmaker()
+
+async def stream_rows(session_factory, statement, batch_size: int):
+    """Yield batches of rows for statement using a server-side cursor."""
+    statement = statement.execution_options(yield_per=batch_size)
+    session = session_factory()
+    if isinstance(session, AsyncSession):
+        async with session:
+            result = await session.stream(statement)
+            async for rows in result.partitions():
+                yield rows
+        return
+
     try:
-        yield db
+        result = await run_in_threadpool(session.execute, statement)
+        partitions = result.partitions()
+        while True:
+            rows = await run_in_threadpool(next, partitions, None)
+            if rows is None:
+                break
+            yield rows
     finally:
-        db.close()
+        await run_in_threadpool(session.close)
+
+async def run_in_session(session_factory, fn, *args, **kwargs):
+    """Run fn(session, *args, **kwargs) in a fresh session, for work outside a request."""
+    return await run_and_close(session_factory(), fn, *args, **kwargs)
+
+async def run_and_close(session, fn, *args, **kwargs):
+    """Run fn(session, *args, **kwargs), then close the session.
+
+    A sync session is closed by the same worker thread once fn returns, so
+    it is never closed while still in use, even if the caller is cancelled,
+    and giving its connection back never waits for a free thread.
+    """
+    if isinstance(session, AsyncSession):
+        async with session:
+            return await session.run_sync(fn, *args, **kwargs)
+
+    def run():
+        try:
+            return fn(session, *args, **kwargs)
+        finally:
+            session.close()
+
+    return await run_in_threadpool(run)
+
+async def warm_pool(size: int) -> None:
+    """Open size pooled connections up front so first requests skip connecting."""
+    db_engine = get_engine()
+    if async_mode:
+        connections = [await db_engine.connect() for _ in range(size)]
+        for connection in connections:
+            await connection.close()
+    else:
+        def open_connections():
+            connections = [db_engine.connect() for _ in range(size)]
+            for connection in connections:
+                connection.close()
+        await run_in_threadpool(open_connections)
+
+async def dispose_engine(db_engine=None) -> None:
+    """Close all pooled connections of an engine (the primary by default)."""
+    global _engine, _sessionmaker
+    if db_engine is None:
+        if _engine is None:
+            return
+        db_engine, _engine, _sessionmaker = _engine, None, None
+    if isinstance(db_engine, AsyncEngine):
+        await db_engine.dispose()
+    else:
+        await run_in_threadpool(db_engine.dispose)
+
+async def run_db(db, fn, *args, **kwargs):
+    """Run fn(session, *args, **kwargs) without blocking the event loop.
+
+    Database helpers are written once against the sync Session API. With an
+    AsyncSession they run through run_sync, so I/O goes through the asyncio
+    driver; with a sync Session they run in the threadpool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+def set_statement_timeout(db, seconds: Optional[float]) -> None:
+    """Have the database cancel statements in db's transaction after seconds.
 
+    Only PostgreSQL supports it; elsewhere statements run to completion.
+    """
+    if seconds and db.get_bind().dialect.name == "postgresql":
+        db.execute(
+            text("SELECT set_config('statement_timeout', :timeout, true)"),
+            {"timeout": f"{int(seconds * 1000)}ms"}
+        )
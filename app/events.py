@@ -0,0 +1,188 @@
+import asyncio
+import logging
+from typing import Callable, List, Optional, Set
+from app import schemas
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "sweets:inventory"
+
+class MemoryBackplane:
+    """In-process backplane.
+
+    Broadcasters that share one instance see each other's events, which is
+    all a single worker needs and stands in for a shared backplane in tests.
+    """
+
+    def __init__(self):
+        self._listeners = []
+
+    async def publish(self, message: str) -> None:
+        for deliver in list(self._listeners):
+            deliver(message)
+
+    async def start(self, deliver: Callable[[str], None]) -> None:
+        self._listeners.append(deliver)
+
+    async def stop(self, deliver: Callable[[str], None]) -> None:
+        self._listeners.remove(deliver)
+
+class RedisBackplane:
+    """Backplane over Redis pub/sub, so every worker sees every worker's events.
+
+    The client needs async publish and pubsub (redis.asyncio). It stays
+    open across stop and start, since publishing needs no subscription and
+    the broadcaster starts again lazily; stop only ends the subscription.
+    """
+
+    def __init__(self, client, channel: str = CHANNEL):
+        self.client = client
+        self.channel = channel
+        self._pubsub = None
+        self._task = None
+
+    async def publish(self, message: str) -> None:
+        await self.client.publish(self.channel, message)
+
+    async def start(self, deliver: Callable[[str], None]) -> None:
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.channel)
+        self._task = asyncio.create_task(self._listen(self._pubsub, deliver))
+
+    async def _listen(self, pubsub, deliver: Callable[[str], None]) -> None:
+        async for message in pubsub.listen():
+            deliver(message["data"].decode())
+
+    async def stop(self, deliver: Callable[[str], None]) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+class Subscription:
+    """One subscriber's bounded queue of serialized events.
+
+    A None in the queue means the subscriber fell too far behind and was
+    dropped; it should reconnect and re-read the catalog.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    async def next_event(self) -> Optional[str]:
+        return await self.queue.get()
+
+class Broadcaster:
+    """Fans inventory events out to this worker's subscribers.
+
+    Events go through the backplane, so subscribers on every worker see
+    them. A subscriber whose queue fills up is dropped rather than letting
+    it hold events in memory or slow down the others.
+    """
+
+    def __init__(self, backplane, queue_size: int):
+        self.backplane = backplane
+        self.queue_size = queue_size
+        self._subscribers: Set[Subscription] = set()
+        self._listeners: List[Callable[[str], None]] = []
+        self._started = False
+        self._lock = asyncio.Lock()
+        self.delivered = 0
+        self.dropped = 0
+
+    async def start(self) -> None:
+        async with self._lock:
+            if not self._started:
+                await self.backplane.start(self._deliver)
+                self._started = True
+
+    async def stop(self) -> None:
+        async with self._lock:
+            if self._started:
+                await self.backplane.stop(self._deliver)
+                self._started = False
+        for subscription in list(self._subscribers):
+            self._drop(subscription)
+
+    async def publish(self, *events: schemas.InventoryEvent) -> None:
+        """Publish events once their change has committed.
+
+        The change already happened, so a failing backplane is logged rather
+        than failing the request.
+        """
+        try:
+            for event in events:
+                await self.backplane.publish(event.model_dump_json(exclude_defaults=True))
+        except Exception:
+            logger.warning("Could not publish inventory events", exc_info=True)
+
+    async def subscribe(self) -> Subscription:
+        await self.start()
+        subscription = Subscription(self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        """Call listener with every event this worker receives while started.
+
+        Listeners run inline and are never dropped, so they must be quick.
+        """
+        self._listeners.append(listener)
+
+    def _deliver(self, message: str) -> None:
+        for listener in self._listeners:
+            try:
+                listener(message)
+            except Exception:
+                logger.exception("Inventory event listener failed")
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(message)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self._drop(subscription)
+
+    def _drop(self, subscription: Subscription) -> None:
+        """Remove a subscriber and tell it so."""
+        self._subscribers.discard(subscription)
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+def create_backplane():
+    """Build the backplane selected by EVENTS_BACKPLANE."""
+    if settings.events_backplane == "redis":
+        # Optional dependency, only needed for multi-worker deployments
+        import redis.asyncio
+        return RedisBackplane(redis.asyncio.from_url(settings.events_backplane_url))
+    return MemoryBackplane()
+
+inventory_events = Broadcaster(create_backplane(), settings.events_queue_size)
+
+async def sse_stream(subscription: Subscription, keepalive_seconds: float):
+    """Render a subscription as server-sent events, with keepalive comments."""
+    while True:
+        try:
+            message = await asyncio.wait_for(subscription.next_event(), keepalive_seconds)
+        except asyncio.TimeoutError:
+            yield ": keepalive\n\n"
+            continue
+        if message is None:
+            yield "event: overflow\ndata: {}\n\n"
+            return
+        yield f"event: inventory\ndata: {message}\n\n"
@@ -0,0 +1,47 @@
+import csv
+import io
+import json
+from typing import AsyncIterator, List, Literal
+from sqlalchemy import select
+from app import models
+
+ExportFormat = Literal["ndjson", "csv"]
+
+EXPORT_COLUMNS = [
+    models.Sweet.id,
+    models.Sweet.name,
+    models.Sweet.category,
+    models.Sweet.price,
+    models.Sweet.quantity,
+]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def export_statement(criteria: List):
+    """Select the exported columns as plain rows, in id order."""
+    return select(*EXPORT_COLUMNS).where(*criteria).order_by(models.Sweet.id)
+
+async def ndjson_chunks(batches: AsyncIterator) -> AsyncIterator[str]:
+    """Render each batch of rows as newline-delimited JSON."""
+    async for rows in batches:
+        yield "".join(json.dumps(dict(row._mapping), separators=(",", ":")) + "\n" for row in rows)
+
+async def csv_chunks(batches: AsyncIterator) -> AsyncIterator[str]:
+    """Render a header and then each batch of rows as CSV."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in EXPORT_COLUMNS])
+    yield buffer.getvalue()
+    async for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+RENDERERS = {
+    "ndjson": ndjson_chunks,
+    "csv": csv_chunks,
+}
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.config import settings
+
+class HashingPool:
+    """A bounded thread pool for bcrypt work.
+
+    bcrypt releases the GIL while hashing, so a dedicated thread pool keeps
+    password checks off both the event loop and Starlette's shared threadpool.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    def _call(self, submitted_at, fn, args):
+        started_at = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._wait_seconds += started_at - submitted_at
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+                self._run_seconds += time.perf_counter() - started_at
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on the pool and await its result."""
+        with self._lock:
+            self._queued += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, time.perf_counter(), fn, args)
+
+    def stats(self) -> dict:
+        """Return queue depth and latency figures for the pool."""
+        with self._lock:
+            completed = self._completed
+            return {
+                "workers": self.max_workers,
+                "queue_depth": self._queued,
+                "active": self._active,
+                "completed": completed,
+                "avg_wait_ms": round(self._wait_seconds * 1000 / completed, 3) if completed else 0.0,
+                "avg_run_ms": round(self._run_seconds * 1000 / completed, 3) if completed else 0.0,
+            }
+
+hashing_pool = HashingPool(settings.hashing_workers)
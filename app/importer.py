@@ -0,0 +1,95 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator, List, Literal, Optional
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from app import schemas
+
+ImportFormat = Literal["ndjson", "csv"]
+
+# Bounds what a single malformed record can make the server buffer
+MAX_LINE_LENGTH = 64 * 1024
+MAX_REPORTED_ERRORS = 100
+
+def _bad_request(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a UTF-8 byte stream into lines, holding at most one partial line."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    try:
+        async for chunk in chunks:
+            pending += decoder.decode(chunk)
+            *complete, pending = pending.split("\n")
+            for line in complete:
+                yield line.rstrip("\r")
+            if len(pending) > MAX_LINE_LENGTH:
+                raise _bad_request(f"Line longer than {MAX_LINE_LENGTH} characters")
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise _bad_request("Import body must be UTF-8")
+    if pending:
+        yield pending.rstrip("\r")
+
+def _parse_ndjson(line: str, header: Optional[List[str]]) -> dict:
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("Expected a JSON object")
+    return record
+
+def _parse_csv(line: str, header: List[str]) -> dict:
+    values = next(csv.reader([line]))
+    if len(values) != len(header):
+        raise ValueError(f"Expected {len(header)} fields, got {len(values)}")
+    # Empty cells mean "not given", so schema defaults apply
+    return {key: value for key, value in zip(header, values) if value != ""}
+
+PARSERS = {
+    "ndjson": _parse_ndjson,
+    "csv": _parse_csv,
+}
+
+def _describe(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+        )
+    return str(exc)
+
+async def validated_batches(
+    chunks: AsyncIterator[bytes],
+    format: ImportFormat,
+    batch_size: int,
+    summary: schemas.ImportSummary
+) -> AsyncIterator[List[schemas.SweetCreate]]:
+    """Parse and validate records, yielding them in batches of batch_size.
+
+    CSV input needs a header row and one record per line. Records that
+    fail to parse or validate are counted on summary and skipped.
+    """
+    parse = PARSERS[format]
+    header = None
+    batch = []
+    line_number = 0
+    async for line in iter_lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        if format == "csv" and header is None:
+            header = [name.strip() for name in next(csv.reader([line]))]
+            continue
+        try:
+            sweet = schemas.SweetCreate.model_validate(parse(line, header))
+        except (ValueError, csv.Error) as exc:
+            summary.rejected += 1
+            if len(summary.errors) < MAX_REPORTED_ERRORS:
+                summary.errors.append(schemas.ImportRowError(line=line_number, detail=_describe(exc)))
+            continue
+        batch.append(sweet)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
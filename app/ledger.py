@@ -0,0 +1,66 @@
+from datetime import date, datetime, timezone
+from typing import List, Optional
+from sqlalchemy import DDL, event, text
+from sqlalchemy.orm import Session
+from app import models
+
+# Orders ledger storage by dialect:
+#
+# * PostgreSQL: orders is partitioned by month of created_at, so a month
+#   of history is one table that reports can prune to and that can later be
+#   detached or dropped whole. A partitioned table's primary key must
+#   include the partition key, hence (id, created_at). Monthly partitions
+#   are created ahead of time by ensure_order_partitions; the default
+#   partition only catches orders no month partition covers.
+# * Anything else: one plain table keyed by id.
+
+ORDERS_TABLE = models.Order.__tablename__
+DEFAULT_PARTITION = f"{ORDERS_TABLE}_default"
+
+POSTGRESQL_DDL = [
+    f"ALTER TABLE {ORDERS_TABLE} ADD PRIMARY KEY (id, created_at)",
+    f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {ORDERS_TABLE} DEFAULT",
+]
+
+# Mirror the migration for schemas built with metadata.create_all (tests, dev)
+for statement in POSTGRESQL_DDL:
+    event.listen(models.Order.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"{ORDERS_TABLE}_{month:%Y_%m}"
+
+def is_order_partition(name: str) -> bool:
+    """Return True for the ledger's partitions, which the models do not declare."""
+    return name.startswith(f"{ORDERS_TABLE}_")
+
+def ensure_order_partitions(db: Session, months_ahead: int, today: Optional[date] = None) -> List[str]:
+    """Create the partitions for this month and the next months_ahead, returning the new ones.
+
+    Does nothing on databases without partitioning.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return []
+    existing = set(db.scalars(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = CAST(:parent AS regclass)"
+    ), {"parent": ORDERS_TABLE}))
+    this_month = (today or datetime.now(timezone.utc).date()).replace(day=1)
+    created = []
+    for offset in range(months_ahead + 1):
+        month = _add_months(this_month, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        # Creating a partition locks the whole ledger briefly, so only missing ones are
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {ORDERS_TABLE} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        ))
+        created.append(name)
+    db.commit()
+    return created
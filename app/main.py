@@ -1,35 +1,86 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
-from app.routers import auth, sweets
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(
-    title="Sweet Shop Management API",
-    description="A RESTful API for managing a sweet shop",
-    version="1.0.0"
-)
-
-# Configure CORS for frontend
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://localhost:5173"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include routers
-app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
-app.include_router(sweets.router, prefix="/api/sweets", tags=["sweets"])
-
-@app.get("/")
-def read_root():
-    return {"message": "Sweet Shop Management API", "version": "1.0.0"}
-
-@app.get("/health")
-def health_check():
-    return {"status": "healthy"}
+from app import crud, database, tasks
+from app.catalog_cache import catalog_cache
+from app.config import settings
+from app.events import inventory_events
+from app.hashing import hashing_pool
+from app.replicas import replica_set
+from app.routers import auth, sales, sweets
 
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm the connection pool, load the category lookup, create the orders
+    ledger's upcoming partitions and start background jobs; stop the jobs
+    and the event stream on shutdown.
+
+    The schema is managed by Alembic (``alembic upgrade head``), so startup
+    never creates tables, and a database that is briefly unavailable only
+    costs the warm-up rather than the worker.
+    """
+    if settings.database_pool_warmup:
+        try:
+            await database.warm_pool(settings.database_pool_warmup)
+        except Exception:
+            logger.warning("Could not warm the database connection pool", exc_info=True)
+    try:
+        await database.run_in_session(database.get_sessionmaker(), crud.load_categories)
+    except Exception:
+        # Loaded on first use instead
+        logger.warning("Could not load the category lookup", exc_info=True)
+    try:
+        await tasks.create_order_partitions()
+    except Exception:
+        # Orders land in the default partition until the partition job succeeds
+        logger.warning("Could not create the order partitions", exc_info=True)
+    background_jobs = tasks.start_background_jobs()
+    yield
+    await tasks.stop_background_jobs(background_jobs)
+    await inventory_events.stop()
+    await database.dispose_engine()
+    await replica_set.dispose()
+
+def create_app() -> FastAPI:
+    """Create and configure the FastAPI application."""
+    app = FastAPI(
+        title="Sweet Shop Management API",
+        description="A RESTful API for managing a sweet shop",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+
+    # Configure CORS for frontend
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:3000", "http://localhost:5173"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Include routers
+    app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
+    app.include_router(sweets.router, prefix="/api/sweets", tags=["sweets"])
+    app.include_router(sales.router, prefix="/api/sales", tags=["sales"])
+
+    @app.get("/")
+    def read_root():
+        return {"message": "Sweet Shop Management API", "version": "1.0.0"}
+
+    @app.get("/health")
+    def health_check():
+        return {
+            "status": "healthy",
+            "database": database.pool_status(database.get_engine()),
+            "hashing": hashing_pool.stats(),
+            "events": inventory_events.stats(),
+            "catalog_renders": catalog_cache.flights.stats(),
+        }
+
+    return app
+
+app = create_app()
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean
+from sqlalchemy import (
+    BigInteger, Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer, PrimaryKeyConstraint, String
+)
 from app.database import Base
 
 class User(Base):
@@ -10,12 +12,104 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     is_admin = Column(Boolean, default=False)
 
+# Normalized categories; sweets keep their category text as entered
+class Category(Base):
+    __tablename__ = "categories"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    slug = Column(String, unique=True, nullable=False, index=True)
+
 class Sweet(Base):
     __tablename__ = "sweets"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, nullable=False, index=True)
     category = Column(String, nullable=False, index=True)
+    # Set from category on every write (see crud.ensure_categories)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
     price = Column(Float, nullable=False)
     quantity = Column(Integer, default=0, nullable=False)
+    # Number of stock shards while in flash-sale mode, 0 otherwise
+    stock_shards = Column(Integer, default=0, server_default="0", nullable=False)
+
+    __table_args__ = (
+        # Supports keyset pagination ordered by price
+        Index("ix_sweets_price_id", "price", "id"),
+        # Exact category filters, paginated by id
+        Index("ix_sweets_category_id_id", "category_id", "id"),
+    )
+
+
+# One slice of a flash-sale sweet's stock, so concurrent buyers update different rows
+class StockShard(Base):
+    __tablename__ = "sweet_stock_shards"
+
+    sweet_id = Column(Integer, ForeignKey("sweets.id", ondelete="CASCADE"), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    quantity = Column(Integer, nullable=False)
+
+# Stock held for a user's checkout. It is taken from the sweet when the
+# hold is made, so catalog quantities are what remains for everyone else.
+class Reservation(Base):
+    __tablename__ = "reservations"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    sweet_id = Column(Integer, ForeignKey("sweets.id", ondelete="CASCADE"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    # UTC; the expiry sweep reads this index oldest first
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+# Append-only ledger of purchases, written in the purchase's transaction.
+# No foreign keys: orders outlive deleted sweets, and purchases skip the
+# checks. On PostgreSQL it is partitioned by month of created_at (see
+# app.ledger), so its primary key there is (id, created_at) instead.
+class Order(Base):
+    __tablename__ = "orders"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), nullable=False)
+    # UTC
+    created_at = Column(DateTime, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    sweet_id = Column(Integer, nullable=False)
+    category_id = Column(Integer, nullable=True)
+    quantity = Column(Integer, nullable=False)
+    unit_price = Column(Float, nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("id").ddl_if(callable_=lambda *args, dialect, **kw: dialect.name != "postgresql"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+# Daily sales rollups, maintained from the ledger by tasks.aggregate_sales
+class DailySweetSales(Base):
+    __tablename__ = "sales_daily_sweets"
+
+    day = Column(Date, primary_key=True)
+    sweet_id = Column(Integer, primary_key=True)
+    orders = Column(Integer, nullable=False)
+    units = Column(Integer, nullable=False)
+    revenue = Column(Float, nullable=False)
+
+    __table_args__ = (
+        # One sweet's daily series
+        Index("ix_sales_daily_sweets_sweet_id_day", "sweet_id", "day"),
+    )
+
+class DailyCategorySales(Base):
+    __tablename__ = "sales_daily_categories"
+
+    day = Column(Date, primary_key=True)
+    category_id = Column(Integer, primary_key=True)
+    orders = Column(Integer, nullable=False)
+    units = Column(Integer, nullable=False)
+    revenue = Column(Float, nullable=False)
+
+# Single row: the last order id included in the rollups
+class SalesRollupState(Base):
+    __tablename__ = "sales_rollup_state"
 
+    id = Column(Integer, primary_key=True)
+    last_order_id = Column(BigInteger, nullable=False)
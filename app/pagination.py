@@ -0,0 +1,88 @@
+import base64
+import binascii
+import json
+from typing import List, Literal, Optional, Tuple
+from fastapi import HTTPException, Query, status
+from app.config import settings
+
+SortKey = Literal["id", "name", "price"]
+SortOrder = Literal["asc", "desc"]
+
+# JSON types a cursor's sort value may have, per sort key
+SORT_VALUE_TYPES = {"id": (int,), "name": (str,), "price": (int, float)}
+
+class PageParams:
+    """Query parameters for keyset (cursor) pagination.
+
+    Without limit or cursor, list endpoints keep returning a plain array.
+    """
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, le=settings.pagination_max_limit),
+        cursor: Optional[str] = Query(None),
+        sort: SortKey = Query("id"),
+        order: SortOrder = Query("asc")
+    ):
+        self.paginated = limit is not None or cursor is not None
+        self.limit = limit or settings.pagination_default_limit
+        self.sort = sort
+        self.descending = order == "desc"
+        self.after = decode_cursor(cursor, sort, order) if cursor else None
+
+    def query_args(self) -> dict:
+        """Keyword arguments for the crud list functions."""
+        if not self.paginated:
+            return {"sort": self.sort, "descending": self.descending}
+        return {
+            "sort": self.sort,
+            "descending": self.descending,
+            # Fetch one extra row to learn whether another page exists
+            "limit": self.limit + 1,
+            "after": self.after,
+        }
+
+    def page(self, rows: List) -> Tuple[List, Optional[str]]:
+        """Split the rows fetched with query_args() into a page and the next cursor."""
+        next_cursor = None
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(
+                self.sort,
+                "desc" if self.descending else "asc",
+                getattr(last, self.sort),
+                last.id
+            )
+        return rows, next_cursor
+
+def encode_cursor(sort: str, order: str, value, last_id: int) -> str:
+    """Encode the position after a row as an opaque cursor."""
+    payload = json.dumps([sort, order, value, last_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str, order: str):
+    """Decode a cursor into (sort value, id), rejecting malformed or mismatched ones."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, cursor_order, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    if cursor_sort != sort or cursor_order != order:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor does not match the requested sort order"
+        )
+    if not _is_sort_value(last_id, "id") or not _is_sort_value(value, sort):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return value, last_id
+
+def _is_sort_value(value, sort: str) -> bool:
+    # bool is an int subclass, but never a sort value
+    return isinstance(value, SORT_VALUE_TYPES[sort]) and not isinstance(value, bool)
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import deque
+from typing import Optional
+from app.cache import LRUCache
+from app.config import settings
+
+class TokenBuckets:
+    """Per-key token buckets held in a bounded LRU map.
+
+    An idle bucket refills completely after capacity / rate seconds, so
+    entries expire at that point instead of being kept forever.
+    """
+
+    def __init__(self, capacity: int, per_minute: float, max_keys: int):
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self._buckets = LRUCache(max_size=max_keys, ttl=capacity / self.rate)
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> float:
+        """Take one token for key; return 0 if allowed, else seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated_at) * self.rate)
+            if tokens < 1:
+                self._buckets.set(key, (tokens, now))
+                return (1 - tokens) / self.rate
+            self._buckets.set(key, (tokens - 1, now))
+            return 0.0
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+class LoginThrottle:
+    """Rejects login floods before any password is verified.
+
+    Attempts are rate limited per username and per client address, and a
+    username is locked out for a while after too many failures within a
+    sliding window.
+    """
+
+    def __init__(
+        self,
+        username_burst: int,
+        username_per_minute: float,
+        ip_burst: int,
+        ip_per_minute: float,
+        lockout_failures: int,
+        lockout_window_seconds: float,
+        lockout_seconds: float,
+        max_keys: int
+    ):
+        self.usernames = TokenBuckets(username_burst, username_per_minute, max_keys)
+        self.addresses = TokenBuckets(ip_burst, ip_per_minute, max_keys)
+        self.lockout_failures = lockout_failures
+        self.lockout_window_seconds = lockout_window_seconds
+        self.lockout_seconds = lockout_seconds
+        self._failures = LRUCache(max_size=max_keys, ttl=max(lockout_window_seconds, lockout_seconds))
+        self._lock = threading.Lock()
+
+    def _locked_for(self, username: str, now: float) -> float:
+        failures = self._failures.get(username)
+        if not failures or len(failures) < self.lockout_failures:
+            return 0.0
+        if failures[0] < now - self.lockout_window_seconds:
+            return 0.0
+        return max(0.0, failures[-1] + self.lockout_seconds - now)
+
+    def check(self, username: str, client_ip: Optional[str]) -> float:
+        """Return 0 if the attempt may proceed, else seconds until retry."""
+        with self._lock:
+            locked_for = self._locked_for(username, time.monotonic())
+        if locked_for:
+            return locked_for
+        if client_ip:
+            wait = self.addresses.take(client_ip)
+            if wait:
+                return wait
+        return self.usernames.take(username)
+
+    def record_failure(self, username: str) -> None:
+        """Record a failed attempt in the username's sliding window."""
+        with self._lock:
+            failures = self._failures.get(username)
+            if failures is None:
+                failures = deque(maxlen=self.lockout_failures)
+            failures.append(time.monotonic())
+            self._failures.set(username, failures)
+
+    def record_success(self, username: str) -> None:
+        """Forget previous failures after a successful login."""
+        self._failures.pop(username)
+
+    def clear(self) -> None:
+        self.usernames.clear()
+        self.addresses.clear()
+        self._failures.clear()
+
+login_throttle = LoginThrottle(
+    username_burst=settings.login_username_burst,
+    username_per_minute=settings.login_username_per_minute,
+    ip_burst=settings.login_ip_burst,
+    ip_per_minute=settings.login_ip_per_minute,
+    lockout_failures=settings.login_lockout_failures,
+    lockout_window_seconds=settings.login_lockout_window_seconds,
+    lockout_seconds=settings.login_lockout_seconds,
+    max_keys=settings.login_throttle_max_keys
+)
@@ -0,0 +1,189 @@
+import itertools
+import threading
+import time
+from typing import List, Optional
+from fastapi import Depends
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from app import auth, schemas
+from app.cache import LRUCache
+from app.config import settings
+from app.database import (
+    create_db_engine, dispose_engine, get_db, get_session_factory, is_async_url, run_and_close, run_in_session
+)
+
+class Replica:
+    """A read replica engine and its health state."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = None
+        self._sessionmaker = None
+        self.ejected_until = 0.0
+
+    def session(self):
+        """Open a session on the replica, creating its engine on first use."""
+        if self._sessionmaker is None:
+            self.engine = create_db_engine(self.url)
+            if is_async_url(self.url):
+                self._sessionmaker = async_sessionmaker(self.engine, autoflush=False, expire_on_commit=False)
+            else:
+                self._sessionmaker = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        return self._sessionmaker()
+
+    @property
+    def healthy(self) -> bool:
+        return self.ejected_until <= time.monotonic()
+
+class ReplicaSet:
+    """Round-robin routing over read replicas with automatic ejection.
+
+    A replica that fails to connect or raises a connection error is ejected
+    for retry_seconds and then tried again. Users who wrote recently are
+    pinned to the primary for sticky_seconds so they read their own writes.
+    """
+
+    def __init__(self, urls: List[str], retry_seconds: float = 30, sticky_seconds: float = 5):
+        self.replicas = [Replica(url) for url in urls]
+        self.retry_seconds = retry_seconds
+        self._cycle = itertools.cycle(self.replicas)
+        self._lock = threading.Lock()
+        self._recent_writers = LRUCache(max_size=10000, ttl=sticky_seconds) if sticky_seconds else None
+
+    def choose(self) -> Optional[Replica]:
+        """Return the next healthy replica, or None to use the primary."""
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = next(self._cycle)
+                if replica.healthy:
+                    return replica
+        return None
+
+    def eject(self, replica: Replica) -> None:
+        replica.ejected_until = time.monotonic() + self.retry_seconds
+
+    async def dispose(self) -> None:
+        """Close the pooled connections of every replica."""
+        for replica in self.replicas:
+            if replica.engine is not None:
+                await dispose_engine(replica.engine)
+
+    def mark_write(self, key: str) -> None:
+        if self._recent_writers is not None:
+            self._recent_writers.set(key, True)
+
+    def recently_wrote(self, key: str) -> bool:
+        return self._recent_writers is not None and key in self._recent_writers
+
+def _is_connection_error(error: Exception) -> bool:
+    return isinstance(error, (exc.OperationalError, exc.InterfaceError)) or (
+        isinstance(error, exc.DBAPIError) and error.connection_invalidated
+    )
+
+def _parse_urls(value: str) -> List[str]:
+    return [url.strip() for url in value.split(",") if url.strip()]
+
+replica_set = ReplicaSet(
+    _parse_urls(settings.database_replica_urls),
+    retry_seconds=settings.replica_retry_seconds,
+    sticky_seconds=settings.replica_sticky_seconds
+)
+
+async def pin_to_primary(current_user: schemas.UserResponse = Depends(auth.get_current_user)):
+    """Route the current user's reads to the primary for a while after a write."""
+    replica_set.mark_write(current_user.username)
+
+async def get_read_db(
+    db: Session = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(auth.get_current_user)
+):
+    """Yield a session for read-only handlers, preferring a healthy replica.
+
+    Falls back to the primary session when no replica is configured or
+    healthy, when the chosen replica cannot be reached, or when the user
+    wrote recently.
+    """
+    replica = None
+    if not replica_set.recently_wrote(current_user.username):
+        replica = replica_set.choose()
+    if replica is None:
+        yield db
+        return
+
+    session = replica.session()
+    try:
+        # Check out a connection up front so an unreachable replica falls
+        # back to the primary instead of failing the request.
+        await _check_out(session)
+    except exc.DBAPIError:
+        replica_set.eject(replica)
+        await _close(session)
+        yield db
+        return
+
+    try:
+        yield session
+    except Exception as error:
+        if _is_connection_error(error):
+            replica_set.eject(replica)
+        raise
+    finally:
+        await _close(session)
+
+class ReadRoute:
+    """Where one user's reads run, for work that opens its own sessions.
+
+    source is "replica" when the read may go to a replica and "primary"
+    when the user wrote recently or no replica is configured. Each run
+    opens and closes its own session, so work shared between requests,
+    such as a catalog render, never uses a request's session.
+    """
+
+    def __init__(self, session_factory, use_replicas: bool):
+        self.session_factory = session_factory
+        self.use_replicas = use_replicas
+
+    @property
+    def source(self) -> str:
+        return "replica" if self.use_replicas else "primary"
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(session, *args, **kwargs) on a healthy replica, falling back to the primary."""
+        replica = replica_set.choose() if self.use_replicas else None
+        if replica is not None:
+            session = replica.session()
+            try:
+                await _check_out(session)
+            except exc.DBAPIError:
+                replica_set.eject(replica)
+                await _close(session)
+            else:
+                try:
+                    return await run_and_close(session, fn, *args, **kwargs)
+                except Exception as error:
+                    if _is_connection_error(error):
+                        replica_set.eject(replica)
+                    raise
+        return await run_in_session(self.session_factory, fn, *args, **kwargs)
+
+async def get_read_route(
+    session_factory=Depends(get_session_factory),
+    current_user: schemas.UserResponse = Depends(auth.get_current_user)
+) -> ReadRoute:
+    """Route the current user's reads like get_read_db, for handlers that open their own sessions."""
+    use_replicas = bool(replica_set.replicas) and not replica_set.recently_wrote(current_user.username)
+    return ReadRoute(session_factory, use_replicas)
+
+async def _check_out(session):
+    if isinstance(session, AsyncSession):
+        await session.connection()
+    else:
+        await run_in_threadpool(session.connection)
+
+async def _close(session):
+    if isinstance(session, AsyncSession):
+        await session.close()
+    else:
+        await run_in_threadpool(session.close)
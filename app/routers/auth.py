@@ -1,18 +1,20 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from app import models, schemas, auth
-from app.database import get_db
+from app import schemas, auth
+from app.database import get_db, run_db
 from app.config import settings
+from app.hashing import hashing_pool
+from app.ratelimit import login_throttle
 
 router = APIRouter()
 
 @router.post("/register", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user: schemas.UserRegister, db: Session = Depends(get_db)):
+async def register(user: schemas.UserRegister, db: Session = Depends(get_db)):
     """Register a new user."""
     # Check if username already exists
-    db_user = auth.get_user_by_username(db, username=user.username)
+    db_user = await run_db(db, auth.get_user_by_username, username=user.username)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -20,27 +22,43 @@ def register(user: schemas.UserRegister, db: Session = Depends(get_db)):
         )
     
     # Check if email already exists
-    db_user = auth.get_user_by_email(db, email=user.email)
+    db_user = await run_db(db, auth.get_user_by_email, email=user.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    # Create new user
-    db_user = auth.create_user(db, user)
+    # Create new user, hashing the password off the request threadpool
+    hashed_password = await hashing_pool.run(auth.get_password_hash, user.password)
+    db_user = await run_db(db, auth.create_user, user, hashed_password)
     return db_user
 
 @router.post("/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(get_db)
+):
     """Login and get access token."""
-    user = auth.authenticate_user(db, form_data.username, form_data.password)
+    client_ip = request.client.host if request.client else None
+    retry_after = login_throttle.check(form_data.username, client_ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+
+    user = await auth.authenticate_user(db, form_data.username, form_data.password)
     if not user:
+        login_throttle.record_failure(form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    login_throttle.record_success(form_data.username)
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = auth.create_access_token(
         data={"sub": user.username, "is_admin": user.is_admin},
@@ -49,7 +67,7 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=schemas.UserResponse)
-def get_current_user_info(current_user: models.User = Depends(auth.get_current_user)):
+def get_current_user_info(current_user: schemas.UserResponse = Depends(auth.get_current_user)):
     """Get current user information."""
     return current_user
 
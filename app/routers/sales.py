@@ -0,0 +1,96 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from app import crud, schemas, auth
+from app.categories import category_lookup
+from app.database import get_session_factory, run_db, run_in_session
+from app.replicas import get_read_db
+
+router = APIRouter()
+
+MAX_SALES_DAYS = 366
+
+# Sales reports read only the daily rollups, never the orders ledger. The
+# rollups trail the ledger by up to SALES_ROLLUP_SECONDS, and days are UTC.
+def _date_range(
+    start: Optional[date] = Query(None, description="First day, inclusive. Defaults to 29 days before end."),
+    end: Optional[date] = Query(None, description="Last day, inclusive. Defaults to today (UTC).")
+) -> Tuple[date, date]:
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
+    if (end - start).days >= MAX_SALES_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Date range is limited to {MAX_SALES_DAYS} days"
+        )
+    return start, end
+
+@router.get("/daily", response_model=List[schemas.DailySales])
+async def get_daily_sales(
+    period: Tuple[date, date] = Depends(_date_range),
+    sweet_id: Optional[int] = Query(None),
+    category_id: Optional[int] = Query(None),
+    db: Session = Depends(get_read_db),
+    current_user: schemas.UserResponse = Depends(auth.get_current_admin_user)
+):
+    """Get orders, units and revenue per day, for one sweet or category if given (Admin only)."""
+    if sweet_id is not None and category_id is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Filter by sweet_id or category_id, not both"
+        )
+    rows = await run_db(db, crud.sales_by_day, *period, sweet_id=sweet_id, category_id=category_id)
+    return [
+        schemas.DailySales(day=day, orders=orders, units=units, revenue=round(revenue, 2))
+        for day, orders, units, revenue in rows
+    ]
+
+@router.get("/sweets", response_model=List[schemas.SweetSales])
+async def get_sweet_sales(
+    period: Tuple[date, date] = Depends(_date_range),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    current_user: schemas.UserResponse = Depends(auth.get_current_admin_user)
+):
+    """Get the top-grossing sweets over a period (Admin only)."""
+    rows = await run_db(db, crud.sales_by_sweet, *period, limit)
+    names = await run_db(db, crud.sweet_names, [row[0] for row in rows]) if rows else {}
+    return [
+        schemas.SweetSales(
+            sweet_id=sweet_id,
+            name=names.get(sweet_id),
+            orders=orders,
+            units=units,
+            revenue=round(revenue, 2)
+        )
+        for sweet_id, orders, units, revenue in rows
+    ]
+
+@router.get("/categories", response_model=List[schemas.CategorySales])
+async def get_category_sales(
+    period: Tuple[date, date] = Depends(_date_range),
+    db: Session = Depends(get_read_db),
+    session_factory=Depends(get_session_factory),
+    current_user: schemas.UserResponse = Depends(auth.get_current_admin_user)
+):
+    """Get orders, units and revenue per category over a period (Admin only)."""
+    rows = await run_db(db, crud.sales_by_category, *period)
+    if not category_lookup.loaded or any(row[0] not in category_lookup.by_id for row in rows):
+        await run_in_session(session_factory, crud.load_categories)
+    return [
+        schemas.CategorySales(
+            category_id=category_id,
+            name=category_lookup.by_id[category_id].name,
+            slug=category_lookup.by_id[category_id].slug,
+            orders=orders,
+            units=units,
+            revenue=round(revenue, 2)
+        )
+        for category_id, orders, units, revenue in rows
+    ]
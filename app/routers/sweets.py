@@ -1,93 +1,361 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import asyncio
+import math
+from datetime import timezone
+from typing import List, Optional, Tuple, Union
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
-from app import models, schemas, auth
-from app.database import get_db
+from app import crud, export, importer, schemas, serialization, auth
+from app.catalog_cache import cached_response, catalog_cache
+from app.categories import category_lookup, slugify
+from app.config import settings
+from app.database import get_db, get_session_factory, run_db, run_in_session, stream_rows
+from app.events import inventory_events, sse_stream
+from app.pagination import PageParams
+from app.replicas import ReadRoute, get_read_route, pin_to_primary
+from app.stats import inventory_stats
 
 router = APIRouter()
 
-@router.post("", response_model=schemas.SweetResponse, status_code=status.HTTP_201_CREATED)
-def create_sweet(
+MAX_PRICE_BUCKETS = 50
+
+# Catalog reads are served from the catalog cache as serialized JSON with an
+# ETag; every inventory write below invalidates it once it has committed.
+def _list_columns(fields: Tuple[str, ...], page: PageParams) -> Tuple:
+    """Select only the requested fields, plus what a page's cursor is built from."""
+    required = (page.sort, "id") if page.paginated else ()
+    return crud.response_columns(fields, *required)
+
+def _render_sweets(rows: List, page: PageParams, fields: Tuple[str, ...]) -> bytes:
+    """Serialize a list endpoint's rows as a page or a plain array."""
+    if page.paginated:
+        return serialization.dump_sweet_page(*page.page(rows), fields)
+    return serialization.dump_sweets(rows, fields)
+
+async def _after_write(*events: schemas.InventoryEvent) -> None:
+    """Invalidate cached reads and notify stream subscribers of a committed write."""
+    await catalog_cache.invalidate()
+    await inventory_events.publish(*events)
+
+async def _load_categories(session_factory) -> None:
+    await run_in_session(session_factory, crud.load_categories)
+
+async def _category_filter(
+    category_id: Optional[int] = Query(None, description="Exact category, by id"),
+    category_slug: Optional[str] = Query(None, description="Exact category, by slug"),
+    session_factory=Depends(get_session_factory)
+) -> Optional[int]:
+    """Resolve an exact category filter to a category id."""
+    if category_id is None and category_slug is None:
+        return None
+    slug = slugify(category_slug) if category_slug is not None else None
+    category = category_lookup.find(category_id, slug) if category_lookup.loaded else None
+    if category is None and category_lookup.claim_reload(settings.category_reload_seconds):
+        # Another worker may have added it since the lookup was loaded
+        await _load_categories(session_factory)
+        category = category_lookup.find(category_id, slug)
+    if category is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Category not found"
+        )
+    return category.id
+
+@router.post("", response_model=schemas.SweetResponse, status_code=status.HTTP_201_CREATED, dependencies=[Depends(pin_to_primary)])
+async def create_sweet(
     sweet: schemas.SweetCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_admin_user)
+    current_user: schemas.UserResponse = Depends(auth.get_current_admin_user)
 ):
     """Create a new sweet (Admin only)."""
     # Check if sweet name already exists
-    db_sweet = db.query(models.Sweet).filter(models.Sweet.name == sweet.name).first()
+    db_sweet = await run_db(db, crud.get_sweet_by_name, sweet.name)
     if db_sweet:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Sweet with this name already exists"
         )
     
-    db_sweet = models.Sweet(**sweet.dict())
-    db.add(db_sweet)
-    db.commit()
-    db.refresh(db_sweet)
+    db_sweet = await run_db(db, crud.create_sweet, sweet)
+    await _after_write(schemas.InventoryEvent.for_sweet(db_sweet))
     return db_sweet
 
-@router.get("", response_model=List[schemas.SweetResponse])
-def get_sweets(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+@router.get("", response_model=Union[List[schemas.SweetResponse], schemas.SweetPage])
+async def get_sweets(
+    request: Request,
+    page: PageParams = Depends(),
+    fields: Tuple[str, ...] = Depends(serialization.requested_fields),
+    route: ReadRoute = Depends(get_read_route),
+    current_user: schemas.UserResponse = Depends(auth.get_current_user)
+):
+    """Get all sweets, or one page of them when limit or cursor is given."""
+    def render(db):
+        rows = crud.get_sweets(db, _list_columns(fields, page), **page.query_args())
+        return _render_sweets(rows, page, fields)
+
+    return await cached_response(request, route, render)
+
+@router.get("/search", response_model=Union[List[schemas.SweetResponse], schemas.SweetPage])
+async def search_sweets(
+    request: Request,
+    name: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    min_price: Optional[float] = Query(None),
+    max_price: Optional[float] = Query(None),
+    category_id: Optional[int] = Depends(_category_filter),
+    page: PageParams = Depends(),
+    fields: Tuple[str, ...] = Depends(serialization.requested_fields),
+    route: ReadRoute = Depends(get_read_route),
+    current_user: schemas.UserResponse = Depends(auth.get_current_user)
 ):
-    """Get all sweets."""
-    sweets = db.query(models.Sweet).all()
-    return sweets
+    """Search sweets by name, category, or price range.
 
-@router.get("/search", response_model=List[schemas.SweetResponse])
-def search_sweets(
+    category matches any part of the category text; category_id and
+    category_slug select one category exactly, using its index.
+    """
+    def render(db):
+        rows = crud.search_sweets(
+            db,
+            name=name,
+            category=category,
+            min_price=min_price,
+            max_price=max_price,
+            category_id=category_id,
+            columns=_list_columns(fields, page),
+            **page.query_args()
+        )
+        return _render_sweets(rows, page, fields)
+
+    return await cached_response(request, route, render)
+
+def _price_boundaries(
+    buckets: Optional[str] = Query(
+        None,
+        description="Comma-separated ascending upper bounds of the price buckets, e.g. 1,2.5,5"
+    )
+) -> List[float]:
+    """Parse the price bucket bounds, defaulting to SEARCH_PRICE_BUCKETS."""
+    text = settings.search_price_buckets if buckets is None else buckets
+    try:
+        boundaries = [float(bound) for bound in text.split(",") if bound.strip()]
+    except ValueError:
+        boundaries = None
+    if (
+        boundaries is None
+        or len(boundaries) > MAX_PRICE_BUCKETS
+        or not all(math.isfinite(bound) for bound in boundaries)
+        or boundaries != sorted(set(boundaries))
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"buckets must be at most {MAX_PRICE_BUCKETS} ascending numbers"
+        )
+    return boundaries
+
+@router.get("/search/facets", response_model=schemas.SearchFacets)
+async def search_facets(
+    request: Request,
     name: Optional[str] = Query(None),
     category: Optional[str] = Query(None),
     min_price: Optional[float] = Query(None),
     max_price: Optional[float] = Query(None),
+    category_id: Optional[int] = Depends(_category_filter),
+    boundaries: List[float] = Depends(_price_boundaries),
+    route: ReadRoute = Depends(get_read_route),
+    current_user: schemas.UserResponse = Depends(auth.get_current_user)
+):
+    """Count the sweets a search matches per category and per price bucket.
+
+    Takes the same filters as /search. Results are cached like other
+    catalog reads, so identical filter sets are served from the catalog
+    cache until the next inventory write.
+    """
+    def render(db):
+        facets = crud.search_facets(
+            db,
+            boundaries,
+            name=name,
+            category=category,
+            min_price=min_price,
+            max_price=max_price,
+            category_id=category_id
+        )
+        return facets.model_dump_json().encode()
+
+    return await cached_response(request, route, render)
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_sweets(
+    format: export.ExportFormat = Query("ndjson"),
+    name: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    min_price: Optional[float] = Query(None),
+    max_price: Optional[float] = Query(None),
+    category_id: Optional[int] = Depends(_category_filter),
+    session_factory=Depends(get_session_factory),
+    current_user: schemas.UserResponse = Depends(auth.get_current_admin_user)
+):
+    """Stream the catalog as NDJSON or CSV (Admin only).
+
+    Rows are read through a server-side cursor in batches and written out
+    as they arrive, so memory use does not grow with the catalog.
+    """
+    statement = export.export_statement(crud.search_filters(name, category, min_price, max_price, category_id))
+    batches = stream_rows(session_factory, statement, settings.export_batch_size)
+    return StreamingResponse(
+        export.RENDERERS[format](batches),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="sweets.{format}"'}
+    )
+
+@router.post("/import", response_model=schemas.ImportSummary, dependencies=[Depends(pin_to_primary)])
+async def import_sweets(
+    request: Request,
+    format: importer.ImportFormat = Query("ndjson"),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: schemas.UserResponse = Depends(auth.get_current_admin_user)
 ):
-    """Search sweets by name, category, or price range."""
-    query = db.query(models.Sweet)
-    
-    if name:
-        query = query.filter(models.Sweet.name.ilike(f"%{name}%"))
-    
-    if category:
-        query = query.filter(models.Sweet.category.ilike(f"%{category}%"))
-    
-    if min_price is not None:
-        query = query.filter(models.Sweet.price >= min_price)
-    
-    if max_price is not None:
-        query = query.filter(models.Sweet.price <= max_price)
-    
-    sweets = query.all()
-    return sweets
+    """Insert or update sweets by name from a streamed CSV or NDJSON body (Admin only).
+
+    Records are validated like POST /api/sweets and upserted in committed
+    batches as the body arrives, so memory use does not grow with the file.
+    Rejected records are reported by line number and do not stop the import.
+    """
+    summary = schemas.ImportSummary()
+    batches = importer.validated_batches(request.stream(), format, settings.import_batch_size, summary)
+    try:
+        async for batch in batches:
+            inserted, updated, skipped = await run_db(db, crud.upsert_sweets, batch)
+            summary.inserted += inserted
+            summary.updated += updated
+            summary.skipped += skipped
+    finally:
+        # Batches committed before a malformed record stay committed, so
+        # cached reads are retired even when the import fails part way.
+        # Imports can touch many thousands of rows, so they are not
+        # published as events; stream clients see them on their next read.
+        if summary.inserted or summary.updated:
+            await catalog_cache.invalidate()
+    return summary
+
+@router.get("/categories", response_model=List[schemas.CategoryResponse])
+async def get_categories(
+    session_factory=Depends(get_session_factory),
+    current_user: schemas.UserResponse = Depends(auth.get_current_user)
+):
+    """List the categories, for exact filtering by category_id or category_slug."""
+    if not category_lookup.loaded:
+        await _load_categories(session_factory)
+    return category_lookup.all()
+
+@router.get("/stats", response_model=schemas.InventoryStats)
+async def get_inventory_stats(
+    session_factory=Depends(get_session_factory),
+    current_user: schemas.UserResponse = Depends(auth.get_current_admin_user)
+):
+    """Get item counts, units and stock value per category, and low-stock sweets (Admin only).
+
+    Totals are kept up to date from inventory events rather than computed
+    per request, and reloaded every STATS_RECONCILE_SECONDS to correct
+    drift, such as from bulk imports.
+    """
+    if not inventory_stats.loaded:
+        await inventory_stats.reconcile(session_factory)
+    names = await run_in_session(session_factory, crud.sweet_names, inventory_stats.low_stock_ids())
+    return inventory_stats.summary(names)
+
+@router.get("/events", response_class=StreamingResponse)
+async def stream_events(current_user: Optional[schemas.UserResponse] = Depends(auth.get_stream_user)):
+    """Stream inventory changes as server-sent events.
+
+    Each change is an `inventory` event carrying the sweet's id and new
+    quantity and price, or `deleted`. A client that falls behind gets an
+    `overflow` event and the stream ends; it should re-read the catalog
+    and reconnect.
+    """
+    if current_user is None:
+        raise auth._credentials_exception()
+    subscription = await inventory_events.subscribe()
+
+    async def events():
+        try:
+            async for message in sse_stream(subscription, settings.events_keepalive_seconds):
+                yield message
+        finally:
+            inventory_events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/events")
+async def websocket_events(
+    websocket: WebSocket,
+    current_user: Optional[schemas.UserResponse] = Depends(auth.get_stream_user)
+):
+    """Send inventory changes over a WebSocket, one JSON event per message.
+
+    A client that falls behind is closed with code 1013 (try again later)
+    and should re-read the catalog before reconnecting.
+    """
+    if current_user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    subscription = await inventory_events.subscribe()
+    # Clients only listen, but receiving is how a disconnect is noticed
+    receiver = asyncio.create_task(websocket.receive())
+    next_event = asyncio.create_task(subscription.next_event())
+    try:
+        while True:
+            await asyncio.wait({receiver, next_event}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver.done():
+                if receiver.result()["type"] == "websocket.disconnect":
+                    break
+                receiver = asyncio.create_task(websocket.receive())
+            if next_event.done():
+                message = next_event.result()
+                if message is None:
+                    await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                    break
+                await websocket.send_text(message)
+                next_event = asyncio.create_task(subscription.next_event())
+    finally:
+        receiver.cancel()
+        next_event.cancel()
+        inventory_events.unsubscribe(subscription)
 
 @router.get("/{sweet_id}", response_model=schemas.SweetResponse)
-def get_sweet(
+async def get_sweet(
+    request: Request,
     sweet_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    fields: Tuple[str, ...] = Depends(serialization.requested_fields),
+    route: ReadRoute = Depends(get_read_route),
+    current_user: schemas.UserResponse = Depends(auth.get_current_user)
 ):
     """Get a sweet by ID."""
-    db_sweet = db.query(models.Sweet).filter(models.Sweet.id == sweet_id).first()
-    if not db_sweet:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Sweet not found"
-        )
-    return db_sweet
+    def render(db):
+        row = crud.get_sweet_row(db, sweet_id, crud.response_columns(fields))
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Sweet not found"
+            )
+        return serialization.dump_sweet(row, fields)
 
-@router.put("/{sweet_id}", response_model=schemas.SweetResponse)
-def update_sweet(
+    return await cached_response(request, route, render)
+
+@router.put("/{sweet_id}", response_model=schemas.SweetResponse, dependencies=[Depends(pin_to_primary)])
+async def update_sweet(
     sweet_id: int,
     sweet_update: schemas.SweetUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_admin_user)
+    current_user: schemas.UserResponse = Depends(auth.get_current_admin_user)
 ):
     """Update a sweet (Admin only)."""
-    db_sweet = db.query(models.Sweet).filter(models.Sweet.id == sweet_id).first()
+    db_sweet = await run_db(db, crud.get_sweet, sweet_id)
     if not db_sweet:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -96,7 +364,7 @@ def update_sweet(
     
     # Check if new name already exists (if name is being updated)
     if sweet_update.name and sweet_update.name != db_sweet.name:
-        existing_sweet = db.query(models.Sweet).filter(models.Sweet.name == sweet_update.name).first()
+        existing_sweet = await run_db(db, crud.get_sweet_by_name, sweet_update.name)
         if existing_sweet:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -104,81 +372,218 @@ def update_sweet(
             )
     
     # Update sweet
-    update_data = sweet_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_sweet, field, value)
-    
-    db.commit()
-    db.refresh(db_sweet)
+    db_sweet = await run_db(db, crud.update_sweet, db_sweet, sweet_update)
+    await _after_write(schemas.InventoryEvent.for_sweet(db_sweet))
     return db_sweet
 
-@router.delete("/{sweet_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_sweet(
+@router.delete("/{sweet_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(pin_to_primary)])
+async def delete_sweet(
     sweet_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_admin_user)
+    current_user: schemas.UserResponse = Depends(auth.get_current_admin_user)
 ):
     """Delete a sweet (Admin only)."""
-    db_sweet = db.query(models.Sweet).filter(models.Sweet.id == sweet_id).first()
+    db_sweet = await run_db(db, crud.get_sweet, sweet_id)
     if not db_sweet:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Sweet not found"
         )
     
-    db.delete(db_sweet)
-    db.commit()
+    await run_db(db, crud.delete_sweet, db_sweet)
+    await _after_write(schemas.InventoryEvent(id=sweet_id, deleted=True))
     return None
 
-@router.post("/{sweet_id}/purchase", response_model=schemas.SweetResponse)
-def purchase_sweet(
+@router.post("/checkout", response_model=schemas.CheckoutResponse, dependencies=[Depends(pin_to_primary)])
+async def checkout(
+    cart: schemas.CheckoutRequest,
+    db: Session = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(auth.get_current_user)
+):
+    """Purchase several sweets in one transaction; either every line succeeds or none do."""
+    quantities = {}
+    for line in cart.items:
+        quantities[line.sweet_id] = quantities.get(line.sweet_id, 0) + line.quantity
+
+    sweets, failed = await run_db(db, crud.checkout, current_user.id, quantities)
+    if failed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=[
+                {
+                    "sweet_id": sweet_id,
+                    "detail": "Sweet not found" if available is None else
+                    f"Insufficient quantity. Available: {available}, Requested: {quantities[sweet_id]}"
+                }
+                for sweet_id, available in failed.items()
+            ]
+        )
+    
+    await _after_write(*(schemas.InventoryEvent.for_sweet(sweet) for sweet in sweets))
+    return {"items": sweets}
+
+@router.post("/{sweet_id}/purchase", response_model=schemas.SweetResponse, dependencies=[Depends(pin_to_primary)])
+async def purchase_sweet(
     sweet_id: int,
     purchase: schemas.PurchaseRequest,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: schemas.UserResponse = Depends(auth.get_current_user)
 ):
-    """Purchase a sweet, decreasing its quantity."""
-    db_sweet = db.query(models.Sweet).filter(models.Sweet.id == sweet_id).first()
+    """Purchase a sweet, decreasing its quantity and recording the order."""
+    db_sweet = await run_db(db, crud.purchase, current_user.id, sweet_id, purchase.quantity)
     if not db_sweet:
+        # The conditional update matched nothing; find out why
+        available = await run_db(db, crud.available_stock, [sweet_id])
+        if sweet_id not in available:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Sweet not found"
+            )
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Sweet not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Insufficient quantity. Available: {available[sweet_id]}, Requested: {purchase.quantity}"
         )
     
-    if db_sweet.quantity < purchase.quantity:
+    await _after_write(schemas.InventoryEvent.for_sweet(db_sweet))
+    return db_sweet
+
+@router.post(
+    "/{sweet_id}/reservations",
+    response_model=schemas.ReservationResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(pin_to_primary)]
+)
+async def reserve_sweet(
+    sweet_id: int,
+    reservation: schemas.ReservationRequest,
+    db: Session = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(auth.get_current_user)
+):
+    """Hold stock of a sweet for checkout, for RESERVATION_TTL_SECONDS.
+
+    The held quantity leaves the catalog's stock at once. Confirm the
+    reservation to buy it, or release it; otherwise it expires and the
+    stock comes back.
+    """
+    reserved = await run_db(
+        db, crud.reserve, current_user.id, sweet_id, reservation.quantity, settings.reservation_ttl_seconds
+    )
+    if not reserved:
+        available = await run_db(db, crud.available_stock, [sweet_id])
+        if sweet_id not in available:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Sweet not found"
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Insufficient quantity. Available: {db_sweet.quantity}, Requested: {purchase.quantity}"
+            detail=f"Insufficient quantity. Available: {available[sweet_id]}, Requested: {reservation.quantity}"
         )
-    
-    db_sweet.quantity -= purchase.quantity
-    db.commit()
-    db.refresh(db_sweet)
+
+    db_reservation, db_sweet = reserved
+    await _after_write(schemas.InventoryEvent.for_sweet(db_sweet))
+    return schemas.ReservationResponse(
+        id=db_reservation.id,
+        sweet_id=sweet_id,
+        quantity=db_reservation.quantity,
+        expires_at=db_reservation.expires_at.replace(tzinfo=timezone.utc)
+    )
+
+@router.post("/reservations/{reservation_id}/confirm", response_model=schemas.SweetResponse, dependencies=[Depends(pin_to_primary)])
+async def confirm_reservation(
+    reservation_id: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(auth.get_current_user)
+):
+    """Buy the stock held by one of your unexpired reservations."""
+    db_sweet = await run_db(db, crud.confirm_reservation, current_user.id, reservation_id)
+    if not db_sweet:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reservation not found or expired"
+        )
+    # The stock already left the catalog when it was reserved
     return db_sweet
 
-@router.post("/{sweet_id}/restock", response_model=schemas.SweetResponse)
-def restock_sweet(
+@router.delete("/reservations/{reservation_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(pin_to_primary)])
+async def release_reservation(
+    reservation_id: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(auth.get_current_user)
+):
+    """Release one of your reservations, returning its stock."""
+    db_sweet = await run_db(db, crud.release_reservation, current_user.id, reservation_id)
+    if not db_sweet:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reservation not found"
+        )
+    await _after_write(schemas.InventoryEvent.for_sweet(db_sweet))
+    return None
+
+@router.post("/{sweet_id}/restock", response_model=schemas.SweetResponse, dependencies=[Depends(pin_to_primary)])
+async def restock_sweet(
     sweet_id: int,
     restock: schemas.RestockRequest,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_admin_user)
+    current_user: schemas.UserResponse = Depends(auth.get_current_admin_user)
 ):
     """Restock a sweet, increasing its quantity (Admin only)."""
-    db_sweet = db.query(models.Sweet).filter(models.Sweet.id == sweet_id).first()
+    if restock.quantity <= 0:
+        if not await run_db(db, crud.get_sweet, sweet_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Sweet not found"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Restock quantity must be greater than 0"
+        )
+    
+    db_sweet = await run_db(db, crud.adjust_quantity, sweet_id, restock.quantity)
     if not db_sweet:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Sweet not found"
         )
     
-    if restock.quantity <= 0:
+    await _after_write(schemas.InventoryEvent.for_sweet(db_sweet))
+    return db_sweet
+
+@router.put("/{sweet_id}/flash-sale", response_model=schemas.FlashSaleStatus, dependencies=[Depends(pin_to_primary)])
+async def start_flash_sale(
+    sweet_id: int,
+    flash_sale: schemas.FlashSaleRequest,
+    db: Session = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(auth.get_current_admin_user)
+):
+    """Split a sweet's stock over shard rows for a flash sale (Admin only).
+
+    Concurrent purchases then update different rows instead of queueing on
+    one. The quantity shown by catalog reads is refreshed from the shards
+    every FLASH_SALE_SYNC_SECONDS.
+    """
+    db_sweet = await run_db(db, crud.set_stock_shards, sweet_id, flash_sale.shards)
+    if not db_sweet:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Restock quantity must be greater than 0"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sweet not found"
         )
-    
-    db_sweet.quantity += restock.quantity
-    db.commit()
-    db.refresh(db_sweet)
+    await _after_write(schemas.InventoryEvent.for_sweet(db_sweet))
     return db_sweet
 
+@router.delete("/{sweet_id}/flash-sale", response_model=schemas.FlashSaleStatus, dependencies=[Depends(pin_to_primary)])
+async def end_flash_sale(
+    sweet_id: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(auth.get_current_admin_user)
+):
+    """Fold a sweet's shards back into its quantity (Admin only)."""
+    db_sweet = await run_db(db, crud.set_stock_shards, sweet_id, 0)
+    if not db_sweet:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sweet not found"
+        )
+    await _after_write(schemas.InventoryEvent.for_sweet(db_sweet))
+    return db_sweet
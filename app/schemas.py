@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from datetime import date, datetime
+from typing import List, Optional
 
 # Auth schemas
 class UserRegister(BaseModel):
@@ -47,10 +48,139 @@ class SweetResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class SweetPage(BaseModel):
+    items: List[SweetResponse]
+    next_cursor: Optional[str] = None
+
+class CategoryResponse(BaseModel):
+    id: int
+    name: str
+    slug: str
+
+    class Config:
+        from_attributes = True
+
+class CategoryFacet(BaseModel):
+    category: str
+    count: int
+
+class PriceBucket(BaseModel):
+    # Prices from min (inclusive) up to max (exclusive); None is unbounded
+    min: Optional[float] = None
+    max: Optional[float] = None
+    count: int
+
+class SearchFacets(BaseModel):
+    total: int
+    categories: List[CategoryFacet]
+    price_buckets: List[PriceBucket]
+
 # Inventory schemas
 class PurchaseRequest(BaseModel):
-    quantity: int = 1
+    quantity: int = Field(1, gt=0)
 
 class RestockRequest(BaseModel):
     quantity: int
 
+class CartLine(BaseModel):
+    sweet_id: int
+    quantity: int = Field(1, gt=0)
+
+class CheckoutRequest(BaseModel):
+    items: List[CartLine] = Field(..., min_length=1)
+
+class CheckoutResponse(BaseModel):
+    items: List[SweetResponse]
+
+class ReservationRequest(BaseModel):
+    quantity: int = Field(1, gt=0)
+
+class ReservationResponse(BaseModel):
+    id: int
+    sweet_id: int
+    quantity: int
+    expires_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class FlashSaleRequest(BaseModel):
+    shards: int = Field(8, ge=1, le=64)
+
+class FlashSaleStatus(BaseModel):
+    id: int
+    name: str
+    quantity: int
+    stock_shards: int
+
+    class Config:
+        from_attributes = True
+
+# Event schemas
+class InventoryEvent(BaseModel):
+    id: int
+    quantity: Optional[int] = None
+    price: Optional[float] = None
+    category: Optional[str] = None
+    deleted: bool = False
+
+    @classmethod
+    def for_sweet(cls, sweet) -> "InventoryEvent":
+        return cls(id=sweet.id, quantity=sweet.quantity, price=sweet.price, category=sweet.category)
+
+# Stats schemas
+class CategoryStats(BaseModel):
+    category: str
+    items: int
+    units: int
+    value: float
+
+class LowStockSweet(BaseModel):
+    id: int
+    name: str
+    category: str
+    quantity: int
+
+class InventoryStats(BaseModel):
+    items: int
+    units: int
+    value: float
+    categories: List[CategoryStats]
+    low_stock_threshold: int
+    low_stock: List[LowStockSweet]
+
+# Sales schemas
+class DailySales(BaseModel):
+    day: date
+    orders: int
+    units: int
+    revenue: float
+
+class SweetSales(BaseModel):
+    sweet_id: int
+    # None once the sweet has been deleted
+    name: Optional[str] = None
+    orders: int
+    units: int
+    revenue: float
+
+class CategorySales(BaseModel):
+    category_id: int
+    name: str
+    slug: str
+    orders: int
+    units: int
+    revenue: float
+
+# Import schemas
+class ImportRowError(BaseModel):
+    line: int
+    detail: str
+
+class ImportSummary(BaseModel):
+    inserted: int = 0
+    updated: int = 0
+    # Records overridden by a later one with the same name in the same batch
+    skipped: int = 0
+    rejected: int = 0
+    errors: List[ImportRowError] = []
@@ -0,0 +1,90 @@
+from sqlalchemy import DDL, bindparam, event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.sql.sqltypes import NullType
+from sqlalchemy.sql.visitors import InternalTraversal
+from app import models
+
+# Substring search backends by dialect:
+#
+# * PostgreSQL: pg_trgm GIN indexes on name and category, which the planner
+#   uses for the plain ``ILIKE '%term%'`` filter.
+# * SQLite: an external-content FTS5 table with the trigram tokenizer, kept
+#   in sync by triggers. Its LIKE operator is answered from the trigram index.
+#
+# Both keep the case-insensitive substring semantics of ILIKE. Trigram
+# indexes need at least three characters, so shorter terms use ILIKE.
+
+FTS_TABLE = "sweets_search"
+MIN_INDEXED_LENGTH = 3
+
+class SubstringMatch(ColumnElement):
+    """Case-insensitive ``column LIKE '%term%'`` using the dialect's text index."""
+
+    inherit_cache = True
+    type = NullType()
+    _traverse_internals = [
+        ("column", InternalTraversal.dp_clauseelement),
+        ("pattern", InternalTraversal.dp_clauseelement),
+        ("indexed", InternalTraversal.dp_boolean),
+    ]
+
+    def __init__(self, column, term: str):
+        self.column = column
+        self.pattern = bindparam(None, f"%{term}%", unique=True)
+        self.indexed = len(term) >= MIN_INDEXED_LENGTH
+
+def contains(column, term: str) -> SubstringMatch:
+    """Match rows whose column contains term, ignoring case."""
+    return SubstringMatch(column, term)
+
+@compiles(SubstringMatch)
+def _compile_ilike(element, compiler, **kw):
+    return compiler.process(element.column.ilike(element.pattern), **kw)
+
+@compiles(SubstringMatch, "sqlite")
+def _compile_sqlite_fts(element, compiler, **kw):
+    if not element.indexed:
+        return _compile_ilike(element, compiler, **kw)
+    return "%s IN (SELECT rowid FROM %s WHERE %s.%s LIKE %s)" % (
+        compiler.process(models.Sweet.id, **kw),
+        FTS_TABLE,
+        FTS_TABLE,
+        element.column.key,
+        compiler.process(element.pattern, **kw),
+    )
+
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "name, category, content='sweets', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS sweets_search_insert AFTER INSERT ON sweets BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, category) VALUES (new.id, new.name, new.category); END",
+    f"CREATE TRIGGER IF NOT EXISTS sweets_search_delete AFTER DELETE ON sweets BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, category) "
+    f"VALUES ('delete', old.id, old.name, old.category); END",
+    f"CREATE TRIGGER IF NOT EXISTS sweets_search_update AFTER UPDATE OF name, category ON sweets BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, category) "
+    f"VALUES ('delete', old.id, old.name, old.category); "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, category) VALUES (new.id, new.name, new.category); END",
+]
+
+POSTGRESQL_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_sweets_name_trgm ON sweets USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_sweets_category_trgm ON sweets USING gin (category gin_trgm_ops)",
+]
+
+# Mirror the migration for schemas built with metadata.create_all (tests, dev)
+for statement in SQLITE_DDL:
+    event.listen(models.Sweet.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in POSTGRESQL_DDL:
+    event.listen(models.Sweet.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+event.listen(
+    models.Sweet.__table__,
+    "after_drop",
+    DDL(f"DROP TABLE IF EXISTS {FTS_TABLE}").execute_if(dialect="sqlite")
+)
+
+def is_search_index(name: str) -> bool:
+    """Return True for schema objects owned by the search backend, not the models."""
+    return name.startswith(FTS_TABLE) or name.endswith("_trgm")
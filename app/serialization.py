@@ -0,0 +1,56 @@
+from typing import Iterable, List, Optional, Tuple
+import orjson
+from fastapi import HTTPException, Query, status
+from app import schemas
+
+# Read endpoints encode column rows straight to JSON rather than building
+# ORM objects and validating each through SweetResponse. The output matches
+# what SweetResponse and SweetPage would produce, and they stay the declared
+# response models; a ?fields= selection only leaves out the other keys.
+
+SWEET_FIELDS: Tuple[str, ...] = tuple(schemas.SweetResponse.model_fields)
+
+def requested_fields(
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated sweet fields to return, e.g. id,name,price. Defaults to all of them."
+    )
+) -> Tuple[str, ...]:
+    """Parse the fields query parameter into SweetResponse field names, in model order."""
+    if fields is None:
+        return SWEET_FIELDS
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names.difference(SWEET_FIELDS)
+    if unknown or not names:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid fields: {', '.join(sorted(unknown)) or '(none)'}. Allowed: {', '.join(SWEET_FIELDS)}"
+        )
+    return tuple(name for name in SWEET_FIELDS if name in names)
+
+def sweet_dicts(rows: Iterable, fields: Tuple[str, ...] = SWEET_FIELDS) -> List[dict]:
+    """Map rows selected as fields, plus any trailing extra columns, to dicts of fields."""
+    if fields == SWEET_FIELDS:
+        return [
+            # float() because SQLite may hand back an integral REAL as an int
+            {"id": id, "name": name, "category": category, "price": float(price), "quantity": quantity}
+            for id, name, category, price, quantity in rows
+        ]
+    # zip stops at the requested fields, dropping columns selected for cursors
+    sweets = [dict(zip(fields, row)) for row in rows]
+    if "price" in fields:
+        for sweet in sweets:
+            sweet["price"] = float(sweet["price"])
+    return sweets
+
+def dump_sweet(row, fields: Tuple[str, ...] = SWEET_FIELDS) -> bytes:
+    """Encode one row as a sweet."""
+    return orjson.dumps(sweet_dicts([row], fields)[0])
+
+def dump_sweets(rows: Iterable, fields: Tuple[str, ...] = SWEET_FIELDS) -> bytes:
+    """Encode rows as a JSON array of sweets."""
+    return orjson.dumps(sweet_dicts(rows, fields))
+
+def dump_sweet_page(rows: Iterable, next_cursor: Optional[str], fields: Tuple[str, ...] = SWEET_FIELDS) -> bytes:
+    """Encode rows and a cursor as a SweetPage."""
+    return orjson.dumps({"items": sweet_dicts(rows, fields), "next_cursor": next_cursor})
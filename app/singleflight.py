@@ -0,0 +1,51 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one execution.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs wait for the same task and get its result or exception.
+    The timeout bounds how long each caller waits, not the work: a caller
+    that times out gets TimeoutError while the work carries on, and callers
+    arriving meanwhile join it rather than starting another. Bound the work
+    itself where it runs, such as with a statement timeout. A waiter that
+    is cancelled does not cancel the work for the others.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self._flights: Dict[str, asyncio.Task] = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        # Every waiter may have timed out; mark the error as seen
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "in_flight": len(self._flights),
+        }
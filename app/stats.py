@@ -0,0 +1,141 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+from app import crud, schemas
+from app.config import settings
+from app.database import run_in_session
+from app.events import inventory_events
+
+logger = logging.getLogger(__name__)
+
+class StatsAggregate:
+    """Catalog totals kept current from inventory events instead of per-request scans.
+
+    Each sweet's (category, price, quantity) is held so that an event, which
+    carries new absolute values, can be applied as a change to the category
+    totals and the low-stock set. Events arrive through the backplane, so
+    writes on other workers count too. reconcile() reloads everything from
+    the database, correcting drift from writes that publish no events, such
+    as bulk imports.
+    """
+
+    def __init__(self, low_stock_threshold: int):
+        self.low_stock_threshold = low_stock_threshold
+        self._lock = asyncio.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        self.loaded = False
+        self._sweets: Dict[int, Tuple[str, float, int]] = {}
+        # category -> [items, units, value]
+        self._categories: Dict[str, list] = {}
+        self._low_stock = set()
+        # Events received while a reload is reading the database
+        self._pending: Optional[List[schemas.InventoryEvent]] = None
+        self.corrections = 0
+
+    def _add(self, sweet_id: int, category: str, price: float, quantity: int) -> None:
+        self._sweets[sweet_id] = (category, price, quantity)
+        totals = self._categories.setdefault(category, [0, 0, 0.0])
+        totals[0] += 1
+        totals[1] += quantity
+        totals[2] += price * quantity
+        if quantity < self.low_stock_threshold:
+            self._low_stock.add(sweet_id)
+
+    def _remove(self, sweet_id: int) -> Optional[Tuple[str, float, int]]:
+        sweet = self._sweets.pop(sweet_id, None)
+        if sweet is None:
+            return None
+        category, price, quantity = sweet
+        totals = self._categories[category]
+        totals[0] -= 1
+        totals[1] -= quantity
+        totals[2] -= price * quantity
+        if not totals[0]:
+            del self._categories[category]
+        self._low_stock.discard(sweet_id)
+        return sweet
+
+    def apply(self, event: schemas.InventoryEvent) -> None:
+        """Apply one committed change."""
+        if self._pending is not None:
+            self._pending.append(event)
+        if not self.loaded:
+            return
+        old = self._remove(event.id)
+        if event.deleted:
+            return
+        category, price, quantity = old or (None, None, None)
+        category = event.category if event.category is not None else category
+        price = event.price if event.price is not None else price
+        quantity = event.quantity if event.quantity is not None else quantity
+        if None in (category, price, quantity):
+            # Not enough to place the sweet; the next reconcile adds it
+            return
+        self._add(event.id, category, price, quantity)
+
+    def on_message(self, message: str) -> None:
+        self.apply(schemas.InventoryEvent.model_validate_json(message))
+
+    async def reconcile(self, session_factory) -> int:
+        """Reload from the database, returning how many sweets had drifted."""
+        async with self._lock:
+            # Only events from here on are guaranteed to reach us
+            await inventory_events.start()
+            self._pending = []
+            try:
+                rows = await run_in_session(session_factory, crud.inventory_rows)
+            finally:
+                pending, self._pending = self._pending, None
+            snapshot = {sweet_id: (category, price, quantity) for sweet_id, category, price, quantity in rows}
+            drifted = 0
+            if self.loaded:
+                drifted = sum(
+                    1 for sweet_id in snapshot.keys() | self._sweets.keys()
+                    if snapshot.get(sweet_id) != self._sweets.get(sweet_id)
+                )
+            self._sweets, self._categories, self._low_stock = {}, {}, set()
+            for sweet_id, sweet in snapshot.items():
+                self._add(sweet_id, *sweet)
+            self.loaded = True
+            # Events carry absolute values, so replaying ones the reload already saw is harmless
+            for event in pending:
+                self.apply(event)
+        if drifted:
+            self.corrections += drifted
+            logger.info("Inventory stats corrected %d drifted sweets", drifted)
+        return drifted
+
+    def low_stock_ids(self) -> List[int]:
+        return list(self._low_stock)
+
+    def summary(self, names: Dict[int, str]) -> schemas.InventoryStats:
+        """Build the stats response; names maps low-stock sweet ids to names."""
+        categories = [
+            schemas.CategoryStats(category=category, items=items, units=units, value=round(value, 2))
+            for category, (items, units, value) in sorted(self._categories.items())
+        ]
+        low_stock = sorted(
+            (
+                schemas.LowStockSweet(
+                    id=sweet_id,
+                    name=names[sweet_id],
+                    category=self._sweets[sweet_id][0],
+                    quantity=self._sweets[sweet_id][2]
+                )
+                for sweet_id in self._low_stock if sweet_id in names
+            ),
+            key=lambda sweet: (sweet.quantity, sweet.id)
+        )
+        return schemas.InventoryStats(
+            items=sum(category.items for category in categories),
+            units=sum(category.units for category in categories),
+            value=round(sum(totals[2] for totals in self._categories.values()), 2),
+            categories=categories,
+            low_stock_threshold=self.low_stock_threshold,
+            low_stock=low_stock
+        )
+
+inventory_stats = StatsAggregate(settings.stats_low_stock_threshold)
+inventory_events.add_listener(inventory_stats.on_message)
@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List
+from app import crud, ledger, schemas
+from app.catalog_cache import catalog_cache
+from app.config import settings
+from app.database import get_sessionmaker, run_in_session
+from app.events import inventory_events
+from app.stats import inventory_stats
+
+logger = logging.getLogger(__name__)
+
+async def run_periodically(interval: float, job: Callable[[], Awaitable]) -> None:
+    """Await job() every interval seconds until cancelled, logging failures."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await job()
+        except Exception:
+            logger.exception("Background job %s failed", job.__name__)
+
+async def sync_flash_sale_quantities() -> None:
+    """Refresh the quantity catalog reads show for flash-sale sweets."""
+    if await run_in_session(get_sessionmaker(), crud.sync_flash_sale_quantities):
+        await catalog_cache.invalidate()
+
+async def reconcile_inventory_stats() -> None:
+    """Reload the inventory stats from the database to correct any drift."""
+    # Loaded on first use, so workers nobody asks for stats never scan
+    if inventory_stats.loaded:
+        await inventory_stats.reconcile(get_sessionmaker())
+
+async def expire_reservations() -> None:
+    """Hand the stock of expired reservations back, a batch per transaction."""
+    session_factory = get_sessionmaker()
+    while True:
+        count, sweets = await run_in_session(
+            session_factory, crud.expire_reservations, settings.reservation_sweep_batch_size
+        )
+        if sweets:
+            await catalog_cache.invalidate()
+            await inventory_events.publish(*(schemas.InventoryEvent.for_sweet(sweet) for sweet in sweets))
+        if count < settings.reservation_sweep_batch_size:
+            return
+
+async def aggregate_sales() -> None:
+    """Roll the orders settled since the last run into the daily sales rollups."""
+    session_factory = get_sessionmaker()
+    settled = await run_in_session(session_factory, crud.settled_order_id)
+    while await run_in_session(session_factory, crud.aggregate_orders, settled, settings.sales_rollup_batch_size):
+        pass
+
+async def create_order_partitions() -> None:
+    """Create the orders ledger's upcoming month partitions, where the database has them."""
+    created = await run_in_session(
+        get_sessionmaker(), ledger.ensure_order_partitions, settings.orders_partition_months_ahead
+    )
+    if created:
+        logger.info("Created order partitions %s", ", ".join(created))
+
+def start_background_jobs() -> List[asyncio.Task]:
+    """Start the periodic jobs; an interval of 0 disables a job."""
+    schedule = [
+        (settings.flash_sale_sync_seconds, sync_flash_sale_quantities),
+        (settings.stats_reconcile_seconds, reconcile_inventory_stats),
+        (settings.reservation_sweep_seconds, expire_reservations),
+        (settings.sales_rollup_seconds, aggregate_sales),
+        (settings.orders_partition_check_seconds, create_order_partitions),
+    ]
+    return [
+        asyncio.create_task(run_periodically(interval, job)) for interval, job in schedule if interval > 0
+    ]
+
+async def stop_background_jobs(tasks: List[asyncio.Task]) -> None:
+    """Cancel background jobs and wait for them to finish."""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,85 @@
+"""
+Compare purchases of one hot sweet: single stock row vs flash-sale shards.
+Usage: python -m benchmarks.flash_sale [purchases] [threads] [shards] [rtt_ms] [database_url]
+
+Defaults to 20,000 purchases from 32 threads with 16 shards. Row-level
+contention needs a server database; SQLite locks the whole file for every
+write, so both modes serialize there and show no difference.
+
+A single stock row hurts most when its lock is held across network round
+trips and commit flushes. rtt_ms adds that much client-side delay before
+every statement and commit, to model an application server that is not on
+the database host.
+"""
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app import crud, models
+from app.database import Base
+
+def add_round_trip_delay(engine, rtt_ms: float):
+    def delay(*args):
+        time.sleep(rtt_ms / 1000)
+
+    event.listen(engine, "before_cursor_execute", delay)
+    event.listen(engine, "commit", delay)
+
+def run(session_factory, sweet_id: int, purchases: int, threads: int):
+    def purchase(_):
+        started = time.perf_counter()
+        with session_factory() as db:
+            sold = crud.adjust_quantity(db, sweet_id, -1) is not None
+        return sold, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(purchase, range(purchases)))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(latency * 1000 for _, latency in results)
+    return sum(sold for sold, _ in results), elapsed, latencies
+
+def main():
+    purchases = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    shards = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    rtt_ms = float(sys.argv[4]) if len(sys.argv) > 4 else 0
+    url = sys.argv[5] if len(sys.argv) > 5 else "sqlite:////tmp/sweets_flash_sale.db"
+    connect_args = {"check_same_thread": False, "timeout": 60} if url.startswith("sqlite") else {}
+    engine = create_engine(url, connect_args=connect_args, pool_size=threads)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    # More buyers than stock, so the sale also sells out under load
+    stock = purchases * 9 // 10
+    if rtt_ms:
+        add_round_trip_delay(engine, rtt_ms)
+
+    print(
+        f"{engine.dialect.name}, {purchases} purchases from {threads} threads, "
+        f"stock {stock}, {rtt_ms:g} ms simulated round trip"
+    )
+    for label, shard_count in [("single row", 0), (f"{shards} shards", shards)]:
+        with session_factory() as db:
+            db.query(models.StockShard).delete()
+            db.query(models.Sweet).delete()
+            sweet = models.Sweet(name="Gobstopper", category="Candy", price=1.0, quantity=stock)
+            db.add(sweet)
+            db.commit()
+            sweet_id = sweet.id
+            if shard_count:
+                crud.set_stock_shards(db, sweet_id, shard_count)
+        sold, elapsed, latencies = run(session_factory, sweet_id, purchases, threads)
+        with session_factory() as db:
+            remaining = crud.available_stock(db, [sweet_id])[sweet_id]
+        assert sold + remaining == stock and sold <= stock
+        print(
+            f"  {label:11} {purchases / elapsed:8.0f} purchases/s  "
+            f"p50 {statistics.median(latencies):6.1f} ms  p99 {latencies[int(len(latencies) * 0.99)]:6.1f} ms  "
+            f"sold {sold}  remaining {remaining}"
+        )
+
+if __name__ == "__main__":
+    main()
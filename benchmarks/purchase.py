@@ -0,0 +1,66 @@
+"""
+Compare purchase throughput: read-modify-write vs one conditional UPDATE.
+Usage: python -m benchmarks.purchase [purchases] [threads] [database_url]
+
+Defaults to 5,000 single-unit purchases of one sweet from 8 threads
+against a SQLite file under /tmp. Stock starts at half the purchase count,
+so a correct implementation sells exactly that many and then refuses.
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import crud, models
+from app.database import Base
+
+def read_modify_write(db, sweet_id: int, delta: int):
+    """The previous purchase path: SELECT, check in Python, UPDATE, refresh."""
+    db_sweet = crud.get_sweet(db, sweet_id)
+    if db_sweet is None or db_sweet.quantity + delta < 0:
+        return None
+    db_sweet.quantity += delta
+    db.commit()
+    db.refresh(db_sweet)
+    return db_sweet
+
+def run(session_factory, sweet_id: int, adjust, purchases: int, threads: int):
+    def purchase(_):
+        with session_factory() as db:
+            return adjust(db, sweet_id, -1) is not None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        sold = sum(pool.map(purchase, range(purchases)))
+    return sold, time.perf_counter() - started
+
+def main():
+    purchases = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    url = sys.argv[3] if len(sys.argv) > 3 else "sqlite:////tmp/sweets_purchase.db"
+    connect_args = {"check_same_thread": False, "timeout": 60} if url.startswith("sqlite") else {}
+    engine = create_engine(url, connect_args=connect_args, pool_size=threads)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    stock = purchases // 2
+
+    print(f"{engine.dialect.name}, {purchases} purchases from {threads} threads, stock {stock}")
+    for label, adjust in [("read-modify-write", read_modify_write), ("conditional UPDATE", crud.adjust_quantity)]:
+        with session_factory() as db:
+            db.query(models.Sweet).delete()
+            sweet = models.Sweet(name="Gobstopper", category="Candy", price=1.0, quantity=stock)
+            db.add(sweet)
+            db.commit()
+            sweet_id = sweet.id
+        sold, elapsed = run(session_factory, sweet_id, adjust, purchases, threads)
+        with session_factory() as db:
+            remaining = crud.get_sweet(db, sweet_id).quantity
+        print(
+            f"  {label:19} {purchases / elapsed:8.0f} req/s  sold {sold:>6}  "
+            f"remaining {remaining:>6}  oversold {max(0, sold - stock):>6}  "
+            f"unaccounted {sold + remaining - stock:>6}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Reservation holds at scale: making them, and sweeping expired ones through
+the expires_at index vs scanning every hold.
+Usage: python -m benchmarks.reservations [holds] [threads] [database_url]
+
+Defaults to 50,000 live holds made from 8 threads over 1,000 sweets,
+against a SQLite file under /tmp, then 5,000 expired holds swept in
+batches of RESERVATION_SWEEP_BATCH_SIZE.
+"""
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import sessionmaker
+from app import crud, models
+from app.config import settings
+from app.database import Base
+
+SWEETS = 1000
+STOCK = 1000
+EXPIRED = 5000
+IDLE_SWEEPS = 20
+
+def hold(session_factory, count: int, threads: int, ttl_seconds: float) -> float:
+    """Make count one-unit holds round-robin over the sweets, returning the elapsed time."""
+    def reserve(index):
+        with session_factory() as db:
+            assert crud.reserve(db, 1, index % SWEETS + 1, 1, ttl_seconds) is not None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(reserve, range(count)))
+    return time.perf_counter() - started
+
+def sweep(session_factory) -> tuple:
+    """What tasks.expire_reservations does: (holds reclaimed, batch timings)."""
+    batch_size = settings.reservation_sweep_batch_size
+    reclaimed, timings = 0, []
+    while True:
+        with session_factory() as db:
+            started = time.perf_counter()
+            count, _ = crud.expire_reservations(db, batch_size)
+            timings.append(time.perf_counter() - started)
+        reclaimed += count
+        if count < batch_size:
+            return reclaimed, timings
+
+def idle_sweep(session_factory) -> float:
+    """Median time of a sweep that finds nothing expired."""
+    timings = []
+    for _ in range(IDLE_SWEEPS):
+        timings.append(sum(sweep(session_factory)[1]))
+    return statistics.median(timings)
+
+def stock(session_factory) -> int:
+    with session_factory() as db:
+        return db.scalar(select(func.sum(models.Sweet.quantity)))
+
+def main():
+    holds = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    url = sys.argv[3] if len(sys.argv) > 3 else "sqlite:////tmp/sweets_reservations.db"
+    connect_args = {"check_same_thread": False, "timeout": 60} if url.startswith("sqlite") else {}
+    engine = create_engine(url, connect_args=connect_args, pool_size=threads)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    with session_factory() as db:
+        db.add(models.User(username="buyer", email="buyer@example.com", hashed_password="-"))
+        db.add_all(
+            models.Sweet(name=f"Sweet {index:04}", category="Candy", price=1.0, quantity=STOCK)
+            for index in range(SWEETS)
+        )
+        db.commit()
+
+    print(f"{engine.dialect.name}, {holds:,} live holds over {SWEETS} sweets from {threads} threads")
+    elapsed = hold(session_factory, holds, threads, settings.reservation_ttl_seconds)
+    print(f"  make live holds           {elapsed:7.1f} s  {holds / elapsed:8,.0f} holds/s")
+    assert stock(session_factory) == SWEETS * STOCK - holds
+
+    for label, indexed in [("expires_at index", True), ("full scan", False)]:
+        if not indexed:
+            with engine.begin() as connection:
+                connection.execute(text("DROP INDEX ix_reservations_expires_at"))
+        hold(session_factory, EXPIRED, threads, -1)
+        reclaimed, timings = sweep(session_factory)
+        assert reclaimed == EXPIRED and stock(session_factory) == SWEETS * STOCK - holds
+        print(
+            f"  sweep {EXPIRED:,} expired, {label:16} {sum(timings) * 1000:7.0f} ms  "
+            f"{statistics.median(timings) * 1000:6.1f} ms per batch of {settings.reservation_sweep_batch_size:,}  "
+            f"idle sweep {idle_sweep(session_factory) * 1000:6.2f} ms"
+        )
+
+if __name__ == "__main__":
+    main()
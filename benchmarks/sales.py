@@ -0,0 +1,186 @@
+"""
+Sales reporting over a large orders ledger: rollups vs scanning the ledger,
+and what the ledger costs a purchase.
+Usage: python -m benchmarks.sales [orders] [database_url]
+
+Defaults to 10,000,000 synthetic orders over the past year for 1,000
+sweets in 20 categories, in a SQLite file under /tmp. On PostgreSQL the
+ledger gets a partition per month.
+"""
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import create_engine, event, func, select, text
+from sqlalchemy.orm import sessionmaker
+from app import crud, ledger, models
+from app.config import settings
+from app.database import Base
+
+SWEETS = 1000
+CATEGORIES = 20
+DAYS = 365
+PURCHASES = 2000
+
+# Synthetic orders in id order, evenly spread over DAYS days from :start,
+# each for a sweet picked by a multiplicative hash of its position
+GENERATE_ORDERS = {
+    "sqlite": (
+        "WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i + 1 < :count) "
+        "INSERT INTO orders (created_at, user_id, sweet_id, category_id, quantity, unit_price) "
+        "SELECT datetime(:start, '+' || (i * :seconds / :count) || ' seconds'), i % 5000 + 1, "
+        "sweets.id, sweets.category_id, i % 3 + 1, sweets.price "
+        "FROM n JOIN sweets ON sweets.id = (i * 7919) % :sweets + 1"
+    ),
+    "postgresql": (
+        "INSERT INTO orders (created_at, user_id, sweet_id, category_id, quantity, unit_price) "
+        "SELECT CAST(:start AS timestamp) + make_interval(secs => i * :seconds / :count), i % 5000 + 1, "
+        "sweets.id, sweets.category_id, i % 3 + 1, sweets.price "
+        "FROM generate_series(CAST(0 AS bigint), :count - 1) AS i JOIN sweets ON sweets.id = (i * 7919) % :sweets + 1"
+    ),
+}
+
+def seed(session_factory, count: int, start: date) -> None:
+    with session_factory() as db:
+        db.add_all(
+            models.Sweet(
+                name=f"Sweet {index:04}",
+                category=f"Category {index % CATEGORIES:02}",
+                price=round(0.5 + index % 40 * 0.25, 2),
+                quantity=1_000_000
+            )
+            for index in range(SWEETS)
+        )
+        db.commit()
+        # Months from start to the current one, plus the default ahead
+        months = (date.today().year - start.year) * 12 + date.today().month - start.month + 2
+        ledger.ensure_order_partitions(db, months, today=start)
+        db.execute(text(GENERATE_ORDERS[db.get_bind().dialect.name]), {
+            "count": count,
+            "start": datetime.combine(start, datetime.min.time()),
+            "seconds": DAYS * 86400,
+            "sweets": SWEETS,
+        })
+        db.commit()
+
+def catch_up(session_factory, batch_size: int) -> int:
+    """What tasks.aggregate_sales does, synchronously."""
+    with session_factory() as db:
+        settled = crud.settled_order_id(db)
+    total = 0
+    while True:
+        with session_factory() as db:
+            count = crud.aggregate_orders(db, settled, batch_size)
+        if not count:
+            return total
+        total += count
+
+# The same reports computed from the ledger instead of the rollups
+def scan_by_day(db, start, end, **_):
+    orders = models.Order.__table__
+    day = func.date(orders.c.created_at)
+    return db.execute(
+        select(day, func.count(), func.sum(orders.c.quantity), func.sum(orders.c.quantity * orders.c.unit_price))
+        .where(orders.c.created_at >= start, orders.c.created_at < end + timedelta(days=1))
+        .group_by(day)
+        .order_by(day)
+    ).all()
+
+def scan_by_sweet(db, start, end, limit):
+    orders = models.Order.__table__
+    revenue = func.sum(orders.c.quantity * orders.c.unit_price)
+    return db.execute(
+        select(orders.c.sweet_id, func.count(), func.sum(orders.c.quantity), revenue)
+        .where(orders.c.created_at >= start, orders.c.created_at < end + timedelta(days=1))
+        .group_by(orders.c.sweet_id)
+        .order_by(revenue.desc(), orders.c.sweet_id)
+        .limit(limit)
+    ).all()
+
+def scan_by_category(db, start, end):
+    orders = models.Order.__table__
+    revenue = func.sum(orders.c.quantity * orders.c.unit_price)
+    return db.execute(
+        select(orders.c.category_id, func.count(), func.sum(orders.c.quantity), revenue)
+        .where(orders.c.created_at >= start, orders.c.created_at < end + timedelta(days=1))
+        .group_by(orders.c.category_id)
+        .order_by(revenue.desc(), orders.c.category_id)
+    ).all()
+
+def timed(session_factory, report, *args, repeat: int = 3):
+    timings = []
+    for _ in range(repeat):
+        with session_factory() as db:
+            started = time.perf_counter()
+            rows = report(db, *args)
+            timings.append(time.perf_counter() - started)
+    return rows, statistics.median(timings)
+
+def units(rows):
+    return sum(row[2] for row in rows)
+
+def purchases(engine, session_factory, buy) -> tuple:
+    """Median latency and statements per purchase, round-robin over the sweets."""
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    event.listen(engine, "before_cursor_execute", count)
+    timings = []
+    for index in range(PURCHASES):
+        with session_factory() as db:
+            started = time.perf_counter()
+            assert buy(db, index % SWEETS + 1) is not None
+            timings.append(time.perf_counter() - started)
+    event.remove(engine, "before_cursor_execute", count)
+    return statistics.median(timings), len(statements) / PURCHASES
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    url = sys.argv[2] if len(sys.argv) > 2 else "sqlite:////tmp/sweets_sales.db"
+    engine = create_engine(url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    today = datetime.now(timezone.utc).date()
+    first_day = today - timedelta(days=DAYS - 1)
+
+    print(f"{engine.dialect.name}, {count:,} orders over {DAYS} days, {SWEETS} sweets in {CATEGORIES} categories")
+    started = time.perf_counter()
+    seed(session_factory, count, first_day)
+    print(f"  generate ledger        {time.perf_counter() - started:8.1f} s")
+
+    started = time.perf_counter()
+    rolled_up = catch_up(session_factory, settings.sales_rollup_batch_size)
+    elapsed = time.perf_counter() - started
+    print(
+        f"  initial rollup         {elapsed:8.1f} s  {rolled_up / elapsed:9,.0f} orders/s  "
+        f"(batches of {settings.sales_rollup_batch_size:,})"
+    )
+
+    print("  report                           ledger scan      rollups")
+    for label, period in [("last 30 days", (today - timedelta(days=29), today)), ("last 365 days", (first_day, today))]:
+        for name, scan, rollup, extra in [
+            ("by day", scan_by_day, crud.sales_by_day, ()),
+            ("top 10 sweets", scan_by_sweet, crud.sales_by_sweet, (10,)),
+            ("by category", scan_by_category, crud.sales_by_category, ()),
+        ]:
+            scanned, scan_time = timed(session_factory, scan, *period, *extra, repeat=1)
+            rolled, rollup_time = timed(session_factory, rollup, *period, *extra)
+            assert units(scanned) == units(rolled), (name, units(scanned), units(rolled))
+            print(f"    {label + ', ' + name:28} {scan_time * 1000:10.0f} ms {rollup_time * 1000:9.1f} ms")
+
+    for label, buy in [
+        ("purchase without ledger", lambda db, sweet_id: crud.adjust_quantity(db, sweet_id, -1)),
+        ("purchase with ledger", lambda db, sweet_id: crud.purchase(db, 1, sweet_id, 1)),
+    ]:
+        latency, statements = purchases(engine, session_factory, buy)
+        print(f"  {label:24} {latency * 1e6:8.0f} us median  {statements:.1f} statements")
+
+    started = time.perf_counter()
+    rolled_up = catch_up(session_factory, settings.sales_rollup_batch_size)
+    print(f"  incremental rollup     {(time.perf_counter() - started) * 1000:8.1f} ms for {rolled_up:,} new orders")
+
+if __name__ == "__main__":
+    main()
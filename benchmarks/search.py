@@ -0,0 +1,72 @@
+"""
+Compare substring search latency: plain ILIKE scan vs the indexed backend.
+Usage: python -m benchmarks.search [rows] [database_url]
+
+Defaults to 1,000,000 rows in a SQLite file under /tmp. Pass a PostgreSQL
+URL to measure the pg_trgm backend instead. The catalog is generated once
+and reused by later runs against the same database.
+"""
+import random
+import statistics
+import sys
+import time
+from sqlalchemy import create_engine, func, insert, select
+from app import models, search
+from app.database import Base
+
+ADJECTIVES = ["Dark", "Milk", "White", "Salted", "Spiced", "Sour", "Crunchy", "Chewy", "Roasted", "Frozen"]
+FLAVOURS = ["Chocolate", "Caramel", "Toffee", "Mint", "Cherry", "Lemon", "Hazelnut", "Coconut", "Ginger", "Vanilla"]
+SHAPES = ["Bar", "Drops", "Bites", "Twist", "Truffle", "Fudge", "Brittle", "Lolly", "Button", "Swirl"]
+CATEGORIES = ["Chocolate", "Candy", "Toffee", "Gummies", "Hard Candy", "Licorice", "Marshmallow", "Nougat"]
+
+TERMS = {
+    "rare (one row)": "#0424242",
+    "selective (~1%)": "roasted ginger",
+    "common (~10%)": "caramel",
+}
+
+def populate(engine, rows: int, batch: int = 50000):
+    rng = random.Random(42)
+    with engine.begin() as connection:
+        for start in range(0, rows, batch):
+            connection.execute(insert(models.Sweet), [
+                {
+                    "name": f"{rng.choice(ADJECTIVES)} {rng.choice(FLAVOURS)} {rng.choice(SHAPES)} #{i:07d}",
+                    "category": rng.choice(CATEGORIES),
+                    "price": round(rng.uniform(0.5, 20), 2),
+                    "quantity": rng.randint(0, 500),
+                }
+                for i in range(start, min(start + batch, rows))
+            ])
+
+def timed(engine, criterion, repeats: int = 5):
+    statement = select(func.count()).select_from(models.Sweet).where(criterion)
+    samples = []
+    with engine.connect() as connection:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            count = connection.execute(statement).scalar()
+            samples.append((time.perf_counter() - started) * 1000)
+    return count, statistics.median(samples)
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    url = sys.argv[2] if len(sys.argv) > 2 else f"sqlite:////tmp/sweets_search_{rows}.db"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        existing = connection.execute(select(func.count()).select_from(models.Sweet)).scalar()
+    if existing == 0:
+        started = time.perf_counter()
+        populate(engine, rows)
+        print(f"generated {rows} rows in {time.perf_counter() - started:.1f}s")
+
+    print(f"{engine.dialect.name}, {rows} rows, median of 5 runs")
+    for label, term in TERMS.items():
+        count, scan_ms = timed(engine, models.Sweet.name.ilike(f"%{term}%"))
+        indexed_count, indexed_ms = timed(engine, search.contains(models.Sweet.name, term))
+        assert count == indexed_count
+        print(f"  {label:18} {count:>7} matches  ilike scan {scan_ms:8.1f} ms  indexed {indexed_ms:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
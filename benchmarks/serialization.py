@@ -0,0 +1,76 @@
+"""
+Compare list serialization: response_model vs TypeAdapter vs orjson rows.
+Usage: python -m benchmarks.serialization [database_url]
+
+Times GET /api/sweets' work for 1k, 10k and 100k sweets, query included:
+- "response_model": FastAPI's own path, which validates ORM objects through
+  SweetResponse, then runs jsonable_encoder and json.dumps.
+- "TypeAdapter": the same ORM objects dumped by a compiled pydantic-core
+  serializer, as the catalog cache did before.
+- "orjson rows": plain column rows encoded by app.serialization.
+"""
+import asyncio
+import sys
+import time
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from app import crud, models, schemas, serialization
+from app.database import Base
+
+SIZES = [1000, 10000, 100000]
+
+response_field = create_response_field(name="response", type_=List[schemas.SweetResponse])
+sweet_list_adapter = TypeAdapter(List[schemas.SweetResponse])
+
+def response_model(db, limit: int) -> bytes:
+    sweets = db.query(models.Sweet).order_by(models.Sweet.id).limit(limit).all()
+    content = asyncio.run(serialize_response(field=response_field, response_content=sweets))
+    return JSONResponse(content).body
+
+def type_adapter(db, limit: int) -> bytes:
+    sweets = db.query(models.Sweet).order_by(models.Sweet.id).limit(limit).all()
+    return sweet_list_adapter.dump_json(sweet_list_adapter.validate_python(sweets, from_attributes=True))
+
+def orjson_rows(db, limit: int) -> bytes:
+    return serialization.dump_sweets(crud.get_sweets(db, limit=limit))
+
+def best_of(session_factory, render, limit: int, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        with session_factory() as db:
+            started = time.perf_counter()
+            render(db, limit)
+            timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else "sqlite:////tmp/sweets_serialization.db"
+    engine = create_engine(url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    with session_factory() as db:
+        db.execute(insert(models.Sweet), [
+            {"name": f"Sweet {i:06d}", "category": f"Category {i % 50}", "price": i % 400 / 4, "quantity": i % 1000}
+            for i in range(max(SIZES))
+        ])
+        db.commit()
+        # Every path must produce the same bytes
+        assert response_model(db, 1000) == type_adapter(db, 1000) == orjson_rows(db, 1000)
+
+    paths = [("response_model", response_model), ("TypeAdapter", type_adapter), ("orjson rows", orjson_rows)]
+    print(f"{engine.dialect.name}, best of 5 (3 at 100k), query included")
+    for size in SIZES:
+        repeat = 3 if size >= 100000 else 5
+        timings = [best_of(session_factory, render, size, repeat) for _, render in paths]
+        print(f"  {size:>6} rows  " + "  ".join(
+            f"{label} {timing * 1000:8.1f} ms" for (label, _), timing in zip(paths, timings)
+        ) + f"  speedup {timings[0] / timings[-1]:4.1f}x")
+
+if __name__ == "__main__":
+    main()
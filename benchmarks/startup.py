@@ -0,0 +1,44 @@
+"""
+Measure API cold start: module import time and time to first response.
+Usage: DATABASE_URL=... python -m benchmarks.startup [runs]
+
+Each run starts a fresh interpreter so nothing is cached between runs.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import json, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    client.get("/")
+answered = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_response_ms": (answered - started) * 1000,
+}))
+"""
+
+def measure(runs: int):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=root, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print("startup failed:", result.stderr.strip().splitlines()[-1])
+            return
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    for key in ["import_ms", "first_response_ms"]:
+        values = [sample[key] for sample in samples]
+        print(f"{key}: median {statistics.median(values):.1f} ms, min {min(values):.1f} ms")
+
+if __name__ == "__main__":
+    measure(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
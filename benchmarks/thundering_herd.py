@@ -0,0 +1,107 @@
+"""
+Thundering herd on hot catalog reads, with and without single-flight.
+Usage: python -m benchmarks.thundering_herd [requests] [query_ms] [database_url]
+
+Fires bursts of identical concurrent requests at the app in process, for
+one sweet, one search and one page, right after the cache was emptied (as
+after an inventory write). Each catalog query is slowed by query_ms to
+stand in for a loaded database. Defaults to 500 requests per burst and
+20 ms per query, with the app's default connection pool and render
+timeout; requests that fail (pool or render timeouts) are counted.
+"""
+import asyncio
+import statistics
+import sys
+import time
+import httpx
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+from app import auth, models
+from app.catalog_cache import catalog_cache
+from app.config import settings
+from app.database import Base, get_db, get_session_factory
+from app.main import app
+from app.singleflight import SingleFlight
+
+class NoCoalescing(SingleFlight):
+    """Runs every call, as before single-flight."""
+
+    async def do(self, key, fn):
+        self.executed += 1
+        try:
+            return await asyncio.wait_for(fn(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+async def burst(client, url: str, requests: int, headers: dict):
+    async def get():
+        started = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        return response.status_code, time.perf_counter() - started
+
+    await catalog_cache.clear()
+    started = time.perf_counter()
+    results = await asyncio.gather(*(get() for _ in range(requests)))
+    failed = sum(status_code != 200 for status_code, _ in results)
+    return time.perf_counter() - started, sorted(latency for _, latency in results), failed
+
+async def run(requests: int, queries: list, headers: dict):
+    urls = ["/api/sweets/42", "/api/sweets/search?name=Sweet 01", "/api/sweets?limit=50"]
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        # Warm the principal cache so only catalog queries differ between runs
+        await client.get("/", headers=headers)
+        await client.get(urls[0], headers=headers)
+        for label, flights in [("no coalescing", NoCoalescing), ("single-flight", SingleFlight)]:
+            catalog_cache.flights = flights(timeout=settings.catalog_render_timeout_seconds)
+            for url in urls:
+                queries.clear()
+                elapsed, latencies, failed = await burst(client, url, requests, headers)
+                print(
+                    f"  {label:13} {url:34} {len(queries):5} queries  {failed:4} failed  {elapsed * 1000:7.0f} ms  "
+                    f"p50 {statistics.median(latencies) * 1000:6.0f} ms  "
+                    f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:6.0f} ms"
+                )
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    query_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    url = sys.argv[3] if len(sys.argv) > 3 else "sqlite:////tmp/sweets_herd.db"
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    engine = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=settings.database_pool_size,
+        max_overflow=settings.database_max_overflow
+    )
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    with session_factory() as db:
+        db.add(models.User(username="buyer", email="buyer@example.com", hashed_password="-"))
+        db.execute(insert(models.Sweet), [
+            {"name": f"Sweet {i:04d}", "category": "Candy", "price": 1.0, "quantity": 10} for i in range(1000)
+        ])
+        db.commit()
+
+    def override_get_db():
+        with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: session_factory
+    queries = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def slow_catalog_query(conn, cursor, statement, parameters, context, executemany):
+        if "FROM sweets" in statement:
+            queries.append(statement)
+            time.sleep(query_ms / 1000)
+
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': 'buyer'})}"}
+    print(f"{engine.dialect.name}, bursts of {requests} identical requests, {query_ms:g} ms per catalog query")
+    asyncio.run(run(requests, queries, headers))
+
+if __name__ == "__main__":
+    main()
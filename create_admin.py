@@ -1,14 +1,13 @@
 """
 Script to create an admin user in the database.
 Usage: python create_admin.py
+
+Run `alembic upgrade head` first to create the schema.
 """
-from app.database import SessionLocal, engine, Base
+from app.database import SessionLocal
 from app.models import User
 from app.auth import get_password_hash
 
-# Create tables if they don't exist
-Base.metadata.create_all(bind=engine)
-
 def create_admin():
     db = SessionLocal()
     try:
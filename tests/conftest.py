@@ -1,27 +1,66 @@
+import asyncio
+import os
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from app.database import Base, get_db
+from app.database import Base, get_db, get_session_factory, is_async_url
 from app.main import app
 from app import models
 
-# Use in-memory SQLite for testing
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+# Use a SQLite file for testing. Set TEST_DATABASE_URL to an async URL such
+# as sqlite+aiosqlite:///./test.db to run the suite against AsyncSession.
+SQLALCHEMY_DATABASE_URL = os.environ.get("TEST_DATABASE_URL", "sqlite:///./test.db")
+ASYNC_MODE = is_async_url(SQLALCHEMY_DATABASE_URL)
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Fixtures seed data through a sync engine on the same database
+sync_url = make_url(SQLALCHEMY_DATABASE_URL)
+sync_url = sync_url.set(drivername=sync_url.get_backend_name())
+connect_args = {"check_same_thread": False} if sync_url.get_backend_name() == "sqlite" else {}
+engine = create_engine(sync_url, connect_args=connect_args)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
+if ASYNC_MODE:
+    async_engine = create_async_engine(SQLALCHEMY_DATABASE_URL)
+    TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+else:
+    def override_get_db():
+        try:
+            db = TestingSessionLocal()
+            yield db
+        finally:
+            db.close()
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_session_factory] = (
+    lambda: TestingAsyncSessionLocal if ASYNC_MODE else TestingSessionLocal
+)
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    from app import auth, crud
+    from app.catalog_cache import catalog_cache
+    from app.categories import category_lookup
+    from app.events import inventory_events
+    from app.ratelimit import login_throttle
+    from app.stats import inventory_stats
+    auth.principal_cache.clear()
+    login_throttle.clear()
+    asyncio.run(catalog_cache.clear())
+    crud.flash_sale_ids.clear()
+    inventory_stats.clear()
+    category_lookup.clear()
+    yield
+    auth.principal_cache.clear()
+    login_throttle.clear()
+    asyncio.run(catalog_cache.clear())
+    asyncio.run(inventory_events.stop())
 
 @pytest.fixture(scope="function")
 def db():
@@ -69,3 +108,20 @@ def admin_user(db):
     db.refresh(user)
     return user
 
+@pytest.fixture
+def auth_token(client, test_user):
+    """Get authentication token."""
+    response = client.post("/api/auth/login", data={
+        "username": "testuser",
+        "password": "testpass123"
+    })
+    return response.json()["access_token"]
+
+@pytest.fixture
+def admin_token(client, admin_user):
+    """Get admin authentication token."""
+    response = client.post("/api/auth/login", data={
+        "username": "admin",
+        "password": "adminpass123"
+    })
+    return response.json()["access_token"]
@@ -82,3 +82,174 @@ def test_get_current_user_no_token(client):
     response = client.get("/api/auth/me")
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
+
+def _login(client, username, password):
+    response = client.post("/api/auth/login", data={
+        "username": username,
+        "password": password
+    })
+    return response.json()["access_token"]
+
+def test_current_user_is_cached(client, test_user, monkeypatch):
+    """Test that repeated requests reuse the cached principal."""
+    from app import auth
+    token = _login(client, "testuser", "testpass123")
+    lookups = []
+    original = auth.get_user_by_username
+
+    def counting_lookup(db, username):
+        lookups.append(username)
+        return original(db, username)
+
+    monkeypatch.setattr(auth, "get_user_by_username", counting_lookup)
+
+    for _ in range(3):
+        response = client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == status.HTTP_200_OK
+    assert lookups == ["testuser"]
+
+def test_principal_cache_invalidated_on_user_update(client, db, test_user):
+    """Test that changing a user row drops its cached principal."""
+    user, _ = test_user
+    token = _login(client, "testuser", "testpass123")
+    response = client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.json()["email"] == "test@example.com"
+
+    user.email = "changed@example.com"
+    db.commit()
+
+    response = client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.json()["email"] == "changed@example.com"
+
+def test_admin_check_uses_token_claim(client, db, admin_user, monkeypatch):
+    """Test that the is_admin claim is honoured when trusted."""
+    from app.config import settings
+    token = _login(client, "admin", "adminpass123")
+    admin_user.is_admin = False
+    db.commit()
+
+    headers = {"Authorization": f"Bearer {token}"}
+    sweet = {"name": "Toffee", "category": "Candy", "price": 1.0, "quantity": 1}
+    response = client.post("/api/sweets", json=sweet, headers=headers)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    monkeypatch.setattr(settings, "trust_admin_claim", True)
+    response = client.post("/api/sweets", json=sweet, headers=headers)
+    assert response.status_code == status.HTTP_201_CREATED
+
+def test_password_hash_uses_configured_rounds(monkeypatch):
+    """Test that the bcrypt cost factor comes from settings."""
+    from app import auth
+    from app.config import settings
+    monkeypatch.setattr(settings, "bcrypt_rounds", 5)
+    hashed = auth.get_password_hash("secret")
+    assert hashed.startswith("$2b$05$")
+    assert auth.verify_password("secret", hashed)
+
+def test_login_reports_hashing_stats(client, test_user):
+    """Test that logins run on the hashing pool and are reported by /health."""
+    before = client.get("/health").json()["hashing"]["completed"]
+    _login(client, "testuser", "testpass123")
+    stats = client.get("/health").json()["hashing"]
+    assert stats["completed"] == before + 1
+    assert stats["queue_depth"] == 0
+    assert stats["avg_run_ms"] > 0
+
+async def test_slow_user_lookup_does_not_block_other_requests(db, monkeypatch):
+    """Test that concurrent authenticated requests are not serialized behind a slow lookup."""
+    import asyncio
+    import time
+    import httpx
+    from sqlalchemy.util.concurrency import await_only, in_greenlet
+    from app import auth, models
+    from app.main import app
+
+    usernames = [f"user{i}" for i in range(4)]
+    for username in usernames:
+        db.add(models.User(username=username, email=f"{username}@example.com", hashed_password="x"))
+    db.commit()
+
+    delay = 0.5
+    original = auth.get_user_by_username
+
+    def slow_lookup(db, username):
+        if in_greenlet():
+            # Under AsyncSession.run_sync, simulate a slow query on the driver
+            await_only(asyncio.sleep(delay))
+        else:
+            time.sleep(delay)
+        return original(db, username)
+
+    monkeypatch.setattr(auth, "get_user_by_username", slow_lookup)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.get(
+                "/api/auth/me",
+                headers={"Authorization": f"Bearer {auth.create_access_token({'sub': username})}"}
+            )
+            for username in usernames
+        ])
+        elapsed = time.perf_counter() - started
+
+    assert [response.json()["username"] for response in responses] == usernames
+    assert elapsed < delay * 2
+
+def test_login_flood_rejected_before_password_check(client, test_user, monkeypatch):
+    """Test that repeated logins for one username are throttled before bcrypt runs."""
+    from app import auth
+    from app.config import settings
+    checks = []
+
+    def rejecting_verify(plain_password, hashed_password):
+        checks.append(plain_password)
+        return False
+
+    monkeypatch.setattr(auth, "verify_password", rejecting_verify)
+
+    for _ in range(settings.login_username_burst):
+        response = client.post("/api/auth/login", data={"username": "testuser", "password": "wrong"})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = client.post("/api/auth/login", data={"username": "testuser", "password": "wrong"})
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(response.headers["Retry-After"]) >= 1
+    assert len(checks) == settings.login_username_burst
+
+def test_login_throttle_lockout_after_failures():
+    """Test the sliding-window lockout and per-address buckets."""
+    from app.ratelimit import LoginThrottle
+    throttle = LoginThrottle(
+        username_burst=100,
+        username_per_minute=100,
+        ip_burst=3,
+        ip_per_minute=1,
+        lockout_failures=3,
+        lockout_window_seconds=60,
+        lockout_seconds=120,
+        max_keys=10
+    )
+    for _ in range(3):
+        assert throttle.check("alice", None) == 0
+        throttle.record_failure("alice")
+    assert throttle.check("alice", None) > 60
+    assert throttle.check("bob", None) == 0
+
+    throttle.record_success("alice")
+    assert throttle.check("alice", None) == 0
+
+    for _ in range(3):
+        assert throttle.check("carol", "10.0.0.1") == 0
+    assert throttle.check("dave", "10.0.0.1") > 0
+    assert throttle.check("dave", "10.0.0.2") == 0
+
+def test_login_throttle_memory_is_bounded():
+    """Test that buckets for old keys are evicted."""
+    from app.ratelimit import TokenBuckets
+    buckets = TokenBuckets(capacity=1, per_minute=1, max_keys=2)
+    for key in ["a", "b", "c"]:
+        buckets.take(key)
+    assert len(buckets._buckets) == 2
+    assert buckets.take("a") == 0
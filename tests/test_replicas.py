@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from fastapi import status
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import models, replicas
+from app.catalog_cache import catalog_cache
+from app.categories import category_lookup
+from app.database import Base
+
+@pytest.fixture
+def replica_url(tmp_path):
+    """Create a replica database holding one sweet the primary does not have."""
+    url = f"sqlite:///{tmp_path}/replica.db"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as session:
+        session.add(models.Sweet(name="Replica Only", category="Candy", price=1.0, quantity=1))
+        session.commit()
+    engine.dispose()
+    # Category ids from this other database must not reach the process-wide lookup
+    category_lookup.clear()
+    return url
+
+def _names(response):
+    return [sweet["name"] for sweet in response.json()]
+
+def _uncached_get(client, headers):
+    # Each read must reach a database rather than the catalog cache
+    asyncio.run(catalog_cache.clear())
+    return client.get("/api/sweets", headers=headers)
+
+def test_reads_are_routed_to_replica(client, auth_token, replica_url, monkeypatch):
+    """Test that catalog reads go to a configured replica."""
+    monkeypatch.setattr(replicas, "replica_set", replicas.ReplicaSet([replica_url]))
+    response = client.get("/api/sweets", headers={"Authorization": f"Bearer {auth_token}"})
+    assert response.status_code == status.HTTP_200_OK
+    assert _names(response) == ["Replica Only"]
+
+def test_reads_after_write_stay_on_primary(client, admin_token, replica_url, monkeypatch):
+    """Test that a user who just wrote reads from the primary."""
+    monkeypatch.setattr(replicas, "replica_set", replicas.ReplicaSet([replica_url]))
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    client.post(
+        "/api/sweets",
+        json={"name": "Fudge", "category": "Candy", "price": 2.0, "quantity": 5},
+        headers=headers
+    )
+    response = client.get("/api/sweets", headers=headers)
+    assert _names(response) == ["Fudge"]
+
+def test_cached_replica_reads_are_not_served_to_a_recent_writer(client, admin_token, auth_token, replica_url, monkeypatch):
+    """Test that a lagging replica's render cached after a write does not hide the write from its writer."""
+    monkeypatch.setattr(replicas, "replica_set", replicas.ReplicaSet([replica_url]))
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    client.post(
+        "/api/sweets",
+        json={"name": "Fudge", "category": "Candy", "price": 2.0, "quantity": 5},
+        headers=admin_headers
+    )
+    # Another user's read after the write comes from the replica, which has not caught up
+    user_headers = {"Authorization": f"Bearer {auth_token}"}
+    assert _names(client.get("/api/sweets", headers=user_headers)) == ["Replica Only"]
+
+    assert _names(client.get("/api/sweets", headers=admin_headers)) == ["Fudge"]
+    assert _names(client.get("/api/sweets", headers=user_headers)) == ["Replica Only"]
+
+def test_unreachable_replica_is_ejected_and_primary_used(client, auth_token, tmp_path, replica_url, monkeypatch):
+    """Test that a failing replica is ejected and reads fall back to the primary."""
+    broken_url = f"sqlite:///{tmp_path}/missing/replica.db"
+    replica_set = replicas.ReplicaSet([broken_url, replica_url])
+    monkeypatch.setattr(replicas, "replica_set", replica_set)
+    headers = {"Authorization": f"Bearer {auth_token}"}
+
+    response = client.get("/api/sweets", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert _names(response) == []
+    assert not replica_set.replicas[0].healthy
+
+    for _ in range(3):
+        assert _names(_uncached_get(client, headers)) == ["Replica Only"]
+
+    replica_set.eject(replica_set.replicas[1])
+    assert _names(_uncached_get(client, headers)) == []
@@ -0,0 +1,180 @@
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from fastapi import status
+from sqlalchemy import insert, select
+from app import crud, ledger, models
+
+def _orders(db):
+    return db.execute(
+        select(models.Order.sweet_id, models.Order.user_id, models.Order.quantity, models.Order.unit_price)
+        .order_by(models.Order.id)
+    ).all()
+
+@pytest.fixture
+def shop_sweets(client, admin_token):
+    """Create three sweets in two categories."""
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    return [
+        client.post(
+            "/api/sweets",
+            json={"name": name, "category": category, "price": price, "quantity": 10},
+            headers=headers
+        ).json()
+        for name, category, price in [("Fudge", "Toffee", 2.0), ("Brittle", "Toffee", 1.5), ("Truffle", "Chocolate", 3.0)]
+    ]
+
+def test_purchases_and_checkouts_are_recorded_in_the_ledger(client, db, auth_token, test_user, shop_sweets):
+    """Test that successful purchases write one order per line and failed ones write none."""
+    fudge, brittle, truffle = shop_sweets
+    user_id = test_user[0].id
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    client.post(f"/api/sweets/{fudge['id']}/purchase", json={"quantity": 2}, headers=headers)
+    client.post(f"/api/sweets/{fudge['id']}/purchase", json={"quantity": 50}, headers=headers)
+    client.post("/api/sweets/checkout", json={"items": [
+        {"sweet_id": truffle["id"], "quantity": 1},
+        {"sweet_id": brittle["id"], "quantity": 3},
+    ]}, headers=headers)
+    client.post("/api/sweets/checkout", json={"items": [
+        {"sweet_id": brittle["id"], "quantity": 1},
+        {"sweet_id": truffle["id"], "quantity": 50},
+    ]}, headers=headers)
+
+    assert _orders(db) == [
+        (fudge["id"], user_id, 2, 2.0),
+        (brittle["id"], user_id, 3, 1.5),
+        (truffle["id"], user_id, 1, 3.0),
+    ]
+    category_ids = set(db.scalars(select(models.Order.category_id)))
+    assert category_ids == set(db.scalars(select(models.Sweet.category_id)))
+
+def test_purchase_rejects_non_positive_quantities(client, db, auth_token, shop_sweets):
+    """Test that a purchase cannot add stock or record an empty order."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    for quantity in (0, -5):
+        response = client.post(f"/api/sweets/{shop_sweets[0]['id']}/purchase", json={"quantity": quantity}, headers=headers)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert _orders(db) == []
+
+@pytest.fixture
+def ledger_orders(db):
+    """Insert orders over two days for two sweets in one category and one without a category."""
+    today = datetime.now(timezone.utc).replace(tzinfo=None, hour=12)
+    yesterday = today - timedelta(days=1)
+    rows = [
+        (yesterday, 1, 10, 2, 2.0),
+        (yesterday, 1, 10, 1, 2.0),
+        (yesterday, 2, 10, 4, 1.5),
+        (today, 1, 10, 3, 2.0),
+        (today, 3, None, 1, 5.0),
+    ]
+    db.execute(insert(models.Order.__table__), [
+        {"created_at": created_at, "user_id": 1, "sweet_id": sweet_id, "category_id": category_id,
+         "quantity": quantity, "unit_price": unit_price}
+        for created_at, sweet_id, category_id, quantity, unit_price in rows
+    ])
+    db.commit()
+    return yesterday.date(), today.date()
+
+def _rollups(db, table):
+    return sorted(tuple(row) for row in db.execute(select(table.__table__)).all())
+
+def test_sales_rollups_aggregate_each_order_once_in_batches(db, ledger_orders):
+    """Test that the aggregator adds settled orders in batches and never counts one twice."""
+    yesterday, today = ledger_orders
+    settled = crud.settled_order_id(db)
+    assert settled == db.scalar(select(models.Order.id).order_by(models.Order.id.desc()).limit(1))
+    batches = []
+    while count := crud.aggregate_orders(db, settled, batch_size=2):
+        batches.append(count)
+    assert batches == [2, 2, 1]
+    assert crud.aggregate_orders(db, settled, batch_size=2) == 0
+
+    assert _rollups(db, models.DailySweetSales) == [
+        (yesterday, 1, 2, 3, 6.0),
+        (yesterday, 2, 1, 4, 6.0),
+        (today, 1, 1, 3, 6.0),
+        (today, 3, 1, 1, 5.0),
+    ]
+    assert _rollups(db, models.DailyCategorySales) == [
+        (yesterday, 10, 3, 7, 12.0),
+        (today, 10, 1, 3, 6.0),
+    ]
+
+    # Later orders are added to the existing totals
+    db.execute(insert(models.Order.__table__).values(
+        created_at=datetime.combine(today, datetime.min.time()), user_id=2, sweet_id=1,
+        category_id=10, quantity=1, unit_price=2.5
+    ))
+    db.commit()
+    assert crud.aggregate_orders(db, crud.settled_order_id(db), batch_size=100) == 1
+    assert (today, 1, 2, 4, 8.5) in _rollups(db, models.DailySweetSales)
+    assert (today, 10, 2, 4, 8.5) in _rollups(db, models.DailyCategorySales)
+
+def test_sales_aggregator_stops_at_the_settled_id(db, ledger_orders):
+    """Test that orders past the settled id wait for a later run."""
+    first_id = db.scalar(select(models.Order.id).order_by(models.Order.id).limit(1))
+    assert crud.aggregate_orders(db, first_id, batch_size=100) == 1
+    assert _rollups(db, models.DailySweetSales) == [(ledger_orders[0], 1, 1, 2, 4.0)]
+
+def test_sales_reports_read_the_rollups(client, db, admin_token, auth_token, shop_sweets):
+    """Test the daily, per-sweet and per-category sales reports."""
+    fudge, brittle, truffle = shop_sweets
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    client.post(f"/api/sweets/{fudge['id']}/purchase", json={"quantity": 3}, headers=headers)
+    client.post("/api/sweets/checkout", json={"items": [
+        {"sweet_id": fudge["id"], "quantity": 1},
+        {"sweet_id": brittle["id"], "quantity": 4},
+        {"sweet_id": truffle["id"], "quantity": 1},
+    ]}, headers=headers)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    client.delete(f"/api/sweets/{truffle['id']}", headers=headers)
+    toffee_id = db.scalar(select(models.Sweet.category_id).where(models.Sweet.id == fudge["id"]))
+    today = datetime.now(timezone.utc).date().isoformat()
+
+    # Nothing is reported until the orders are rolled up
+    assert client.get("/api/sales/daily", headers=headers).json() == []
+    crud.aggregate_orders(db, crud.settled_order_id(db), batch_size=100)
+
+    response = client.get("/api/sales/daily", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [{"day": today, "orders": 4, "units": 9, "revenue": 17.0}]
+    response = client.get("/api/sales/daily", params={"sweet_id": fudge["id"]}, headers=headers)
+    assert response.json() == [{"day": today, "orders": 2, "units": 4, "revenue": 8.0}]
+    response = client.get("/api/sales/daily", params={"category_id": toffee_id, "end": "2020-01-01"}, headers=headers)
+    assert response.json() == []
+
+    response = client.get("/api/sales/sweets", params={"limit": 2}, headers=headers)
+    assert response.json() == [
+        {"sweet_id": fudge["id"], "name": "Fudge", "orders": 2, "units": 4, "revenue": 8.0},
+        {"sweet_id": brittle["id"], "name": "Brittle", "orders": 1, "units": 4, "revenue": 6.0},
+    ]
+    response = client.get("/api/sales/sweets", headers=headers)
+    assert response.json()[2] == {"sweet_id": truffle["id"], "name": None, "orders": 1, "units": 1, "revenue": 3.0}
+
+    response = client.get("/api/sales/categories", headers=headers)
+    assert [(category["slug"], category["units"], category["revenue"]) for category in response.json()] == [
+        ("toffee", 8, 14.0),
+        ("chocolate", 1, 3.0),
+    ]
+
+def test_sales_reports_validate_the_request(client, auth_token, admin_token):
+    """Test that sales reports are admin only and reject bad ranges and filters."""
+    assert client.get(
+        "/api/sales/daily", headers={"Authorization": f"Bearer {auth_token}"}
+    ).status_code == status.HTTP_403_FORBIDDEN
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    for params in [
+        {"start": "2026-02-01", "end": "2026-01-01"},
+        {"start": "2024-01-01", "end": "2026-01-01"},
+        {"sweet_id": 1, "category_id": 1},
+    ]:
+        assert client.get("/api/sales/daily", params=params, headers=headers).status_code == status.HTTP_400_BAD_REQUEST
+
+def test_order_partitions_cover_the_coming_months(db):
+    """Test that month partitions are created ahead, once, where the database partitions."""
+    created = ledger.ensure_order_partitions(db, 2, today=date(2026, 11, 15))
+    if db.get_bind().dialect.name != "postgresql":
+        assert created == []
+        return
+    assert created == ["orders_2026_11", "orders_2026_12", "orders_2027_01"]
+    assert ledger.ensure_order_partitions(db, 1, today=date(2026, 12, 1)) == []
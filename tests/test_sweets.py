@@ -1,24 +1,7 @@
+import asyncio
 import pytest
 from fastapi import status
 
-@pytest.fixture
-def auth_token(client, test_user):
-    """Get authentication token."""
-    response = client.post("/api/auth/login", data={
-        "username": "testuser",
-        "password": "testpass123"
-    })
-    return response.json()["access_token"]
-
-@pytest.fixture
-def admin_token(client, admin_user):
-    """Get admin authentication token."""
-    response = client.post("/api/auth/login", data={
-        "username": "admin",
-        "password": "adminpass123"
-    })
-    return response.json()["access_token"]
-
 @pytest.fixture
 def test_sweet(client, admin_token):
     """Create a test sweet."""
@@ -228,3 +211,1040 @@ def test_access_protected_endpoint_without_token(client):
     response = client.get("/api/sweets")
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
+
+@pytest.fixture
+def many_sweets(db):
+    """Insert a small catalog with repeated prices."""
+    from app import models
+    sweets = [
+        models.Sweet(name=f"Sweet {i:02d}", category="Candy" if i % 2 else "Toffee", price=float(i % 4), quantity=i)
+        for i in range(11)
+    ]
+    db.add_all(sweets)
+    db.commit()
+    return sweets
+
+def _walk_pages(client, url, token, **params):
+    pages = []
+    cursor = None
+    while True:
+        query = dict(params, limit=3)
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get(url, params=query, headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        pages.append(data["items"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            return pages
+
+@pytest.mark.parametrize("sort,order", [("id", "asc"), ("name", "desc"), ("price", "asc"), ("price", "desc")])
+def test_get_sweets_keyset_pagination(client, auth_token, many_sweets, sort, order):
+    """Test walking the catalog page by page in each sort order."""
+    pages = _walk_pages(client, "/api/sweets", auth_token, sort=sort, order=order)
+    items = [sweet for page in pages for sweet in page]
+    assert [len(page) for page in pages] == [3, 3, 3, 2]
+
+    expected = sorted(many_sweets, key=lambda sweet: (getattr(sweet, sort), sweet.id), reverse=order == "desc")
+    assert [sweet["id"] for sweet in items] == [sweet.id for sweet in expected]
+
+def test_search_sweets_keyset_pagination(client, auth_token, many_sweets):
+    """Test that search results can be paginated with filters applied."""
+    pages = _walk_pages(client, "/api/sweets/search", auth_token, category="Candy", sort="price")
+    items = [sweet for page in pages for sweet in page]
+    assert len(items) == 5
+    assert all(sweet["category"] == "Candy" for sweet in items)
+    assert [sweet["price"] for sweet in items] == sorted(sweet["price"] for sweet in items)
+
+def test_get_sweets_without_pagination_returns_list(client, auth_token, many_sweets):
+    """Test that clients not asking for pages still get the full array."""
+    response = client.get("/api/sweets", headers={"Authorization": f"Bearer {auth_token}"})
+    assert isinstance(response.json(), list)
+    assert len(response.json()) == 11
+
+def test_pagination_rejects_bad_cursors_and_limits(client, auth_token, many_sweets):
+    """Test validation of cursor and limit parameters."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = client.get("/api/sweets", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    cursor = client.get("/api/sweets", params={"limit": 2, "sort": "price"}, headers=headers).json()["next_cursor"]
+    response = client.get("/api/sweets", params={"cursor": cursor, "sort": "name"}, headers=headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    # Well-formed cursors whose values cannot be a position in the sort order
+    from app.pagination import encode_cursor
+    for sort, value, last_id in [
+        ("price", {"a": 1}, 1),
+        ("price", "1.5", 1),
+        ("name", 3, 1),
+        ("id", True, 1),
+        ("price", 1.5, "1"),
+    ]:
+        cursor = encode_cursor(sort, "asc", value, last_id)
+        response = client.get("/api/sweets", params={"cursor": cursor, "sort": sort}, headers=headers)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = client.get("/api/sweets", params={"limit": 100000}, headers=headers)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+def test_list_endpoints_serialize_like_the_response_models(client, auth_token, many_sweets):
+    """Test that the row fast path produces the bytes SweetResponse and SweetPage would."""
+    from typing import List
+    from pydantic import TypeAdapter
+    from app import schemas
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    # Prices like 0.0 and 3.0 may come back from SQLite as ints
+    expected = sorted(many_sweets, key=lambda sweet: sweet.id)
+
+    response = client.get("/api/sweets", headers=headers)
+    adapter = TypeAdapter(List[schemas.SweetResponse])
+    assert response.content == adapter.dump_json(adapter.validate_python(expected, from_attributes=True))
+
+    response = client.get("/api/sweets/search", params={"limit": 3}, headers=headers)
+    page = schemas.SweetPage(items=expected[:3], next_cursor=response.json()["next_cursor"])
+    assert response.content == page.model_dump_json().encode()
+
+def test_sparse_fieldsets_return_only_requested_fields(client, auth_token, many_sweets):
+    """Test that ?fields= limits every read endpoint to the named fields, in model order."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = client.get("/api/sweets", params={"fields": "price, name,id"}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()[1] == {"id": many_sweets[1].id, "name": "Sweet 01", "price": 1.0}
+
+    response = client.get("/api/sweets/search", params={"category": "Toffee", "fields": "name"}, headers=headers)
+    assert all(list(sweet) == ["name"] for sweet in response.json())
+
+    response = client.get(f"/api/sweets/{many_sweets[3].id}", params={"fields": "quantity"}, headers=headers)
+    assert response.json() == {"quantity": 3}
+
+def test_sparse_fieldsets_keep_pagination_working(client, auth_token, many_sweets):
+    """Test that cursors still work when the sort key is not among the requested fields."""
+    pages = _walk_pages(client, "/api/sweets", auth_token, sort="price", order="desc", fields="name")
+    items = [sweet for page in pages for sweet in page]
+    expected = sorted(many_sweets, key=lambda sweet: (sweet.price, sweet.id), reverse=True)
+    assert items == [{"name": sweet.name} for sweet in expected]
+
+def test_sparse_fieldsets_reject_unknown_fields(client, auth_token, test_sweet):
+    """Test that fields are validated against the response model."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    for fields in ["name,hashed_password", "", " , "]:
+        response = client.get("/api/sweets", params={"fields": fields}, headers=headers)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "hashed_password" in client.get(
+        f"/api/sweets/{test_sweet['id']}", params={"fields": "hashed_password"}, headers=headers
+    ).json()["detail"]
+
+def test_sparse_fieldsets_select_only_needed_columns(db, many_sweets):
+    """Test that the projection is pushed into the SELECT."""
+    from app import crud
+    rows = crud.get_sweets(db, crud.response_columns(("name",)))
+    assert rows[0]._fields == ("name",)
+    rows = crud.get_sweets(db, crud.response_columns(("name",), "price", "id"), sort="price", limit=2)
+    assert rows[0]._fields == ("name", "price", "id")
+
+def test_search_facets_count_categories_and_price_buckets(client, auth_token, many_sweets):
+    """Test facet counts for the whole catalog and for a filtered search."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = client.get("/api/sweets/search/facets", params={"buckets": "1,2"}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "total": 11,
+        "categories": [{"category": "Toffee", "count": 6}, {"category": "Candy", "count": 5}],
+        "price_buckets": [
+            {"min": None, "max": 1.0, "count": 3},
+            {"min": 1.0, "max": 2.0, "count": 3},
+            {"min": 2.0, "max": None, "count": 5},
+        ],
+    }
+
+    response = client.get(
+        "/api/sweets/search/facets", params={"category": "Candy", "buckets": "1,2"}, headers=headers
+    )
+    assert response.json()["categories"] == [{"category": "Candy", "count": 5}]
+    assert [bucket["count"] for bucket in response.json()["price_buckets"]] == [0, 3, 2]
+
+    response = client.get("/api/sweets/search/facets", headers=headers)
+    assert [bucket["max"] for bucket in response.json()["price_buckets"]] == [1.0, 2.5, 5.0, 10.0, None]
+
+    # No bounds: one bucket for every price
+    response = client.get("/api/sweets/search/facets", params={"buckets": ""}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["price_buckets"] == [{"min": None, "max": None, "count": 11}]
+    assert response.json()["categories"] == [{"category": "Toffee", "count": 6}, {"category": "Candy", "count": 5}]
+
+def test_search_facets_are_cached_until_a_write(client, auth_token, admin_token, many_sweets):
+    """Test that identical filter sets hit the cache and writes invalidate it."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    first = client.get("/api/sweets/search/facets", params={"name": "Sweet"}, headers=headers)
+    cached = client.get(
+        "/api/sweets/search/facets",
+        params={"name": "Sweet"},
+        headers={**headers, "If-None-Match": first.headers["ETag"]}
+    )
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+
+    client.post(
+        "/api/sweets",
+        json={"name": "Sweet 99", "category": "Candy", "price": 9.0, "quantity": 1},
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    response = client.get("/api/sweets/search/facets", params={"name": "Sweet"}, headers=headers)
+    assert response.json()["total"] == 12
+
+def test_search_facets_reject_bad_buckets(client, auth_token):
+    """Test that bucket bounds must be ascending numbers."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    for buckets in ["2,1", "1,1", "cheap", "1,inf", ",".join(str(n) for n in range(60))]:
+        response = client.get("/api/sweets/search/facets", params={"buckets": buckets}, headers=headers)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_export_sweets_ndjson(client, admin_token, many_sweets, monkeypatch):
+    """Test streaming the filtered catalog as NDJSON in small batches."""
+    import json
+    from app.config import settings
+    monkeypatch.setattr(settings, "export_batch_size", 2)
+    response = client.get(
+        "/api/sweets/export",
+        params={"category": "Toffee", "min_price": 1},
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    expected = [sweet for sweet in many_sweets if sweet.category == "Toffee" and sweet.price >= 1]
+    assert [row["id"] for row in rows] == [sweet.id for sweet in expected]
+    assert set(rows[0]) == {"id", "name", "category", "price", "quantity"}
+
+def test_export_sweets_csv(client, admin_token, many_sweets):
+    """Test streaming the catalog as CSV with a header row."""
+    import csv
+    import io
+    response = client.get(
+        "/api/sweets/export",
+        params={"format": "csv"},
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == len(many_sweets)
+    assert rows[0]["name"] == "Sweet 00"
+
+def test_export_sweets_non_admin(client, auth_token):
+    """Test that exporting requires admin rights."""
+    response = client.get("/api/sweets/export", headers={"Authorization": f"Bearer {auth_token}"})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+def test_search_index_follows_updates_and_deletes(client, admin_token, auth_token, test_sweet):
+    """Test that indexed search sees renamed and deleted sweets."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+
+    def search(**params):
+        response = client.get("/api/sweets/search", params=params, headers=headers)
+        return [sweet["name"] for sweet in response.json()]
+
+    assert search(name="COLATE") == ["Chocolate Bar"]
+    assert search(name="co", category="late") == ["Chocolate Bar"]
+
+    client.put(f"/api/sweets/{test_sweet['id']}", json={"name": "Caramel Bar"}, headers=admin_headers)
+    assert search(name="chocolate") == []
+    assert search(name="caramel", max_price=3) == ["Caramel Bar"]
+    assert search(name="caramel", min_price=3) == []
+
+    client.delete(f"/api/sweets/{test_sweet['id']}", headers=admin_headers)
+    assert search(name="caramel") == []
+
+def test_catalog_responses_carry_etag_and_honour_if_none_match(client, auth_token, test_sweet):
+    """Test that catalog reads return a strong ETag and 304 when it still matches."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    for url in ["/api/sweets", f"/api/sweets/{test_sweet['id']}", "/api/sweets/search?name=choc"]:
+        response = client.get(url, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        etag = response.headers["etag"]
+        assert etag.startswith('"')
+
+        response = client.get(url, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.headers["etag"] == etag
+        assert response.content == b""
+
+def test_catalog_cache_is_invalidated_by_writes(client, auth_token, admin_token, test_sweet):
+    """Test that every inventory write retires cached catalog responses."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    url = f"/api/sweets/{test_sweet['id']}"
+    writes = [
+        lambda: client.post(f"{url}/purchase", json={"quantity": 1}, headers=headers),
+        lambda: client.post(f"{url}/restock", json={"quantity": 5}, headers=admin),
+        lambda: client.put(url, json={"price": 3.0}, headers=admin),
+    ]
+
+    etag = client.get(url, headers=headers).headers["etag"]
+    for write in writes:
+        write()
+        response = client.get(url, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == status.HTTP_200_OK
+        etag = response.headers["etag"]
+    assert response.json()["quantity"] == 104
+    assert response.json()["price"] == 3.0
+
+    listed = client.get("/api/sweets", headers=headers).json()
+    client.post("/api/sweets", json={"name": "Toffee", "category": "Candy", "price": 1.0}, headers=admin)
+    assert len(client.get("/api/sweets", headers=headers).json()) == len(listed) + 1
+    client.delete(url, headers=admin)
+    assert client.get(url, headers=headers).status_code == status.HTTP_404_NOT_FOUND
+
+class FakeSharedStore:
+    """In-process stand-in for a Redis client shared by several workers."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+async def test_shared_cache_backend_invalidates_across_workers():
+    """Test that a write on one worker retires entries cached by another."""
+    from app.catalog_cache import CatalogCache, SharedCacheBackend
+    store = FakeSharedStore()
+    worker_a = CatalogCache(SharedCacheBackend(store, ttl=30))
+    worker_b = CatalogCache(SharedCacheBackend(store, ttl=30))
+    renders = []
+
+    async def render():
+        renders.append(1)
+        return b'[{"name":"Fudge"}]'
+
+    body, etag = await worker_a.get_or_render("/api/sweets?", render)
+    assert await worker_b.get_or_render("/api/sweets?", render) == (body, etag)
+    assert len(renders) == 1
+
+    await worker_b.invalidate()
+    await worker_a.get_or_render("/api/sweets?", render)
+    assert len(renders) == 2
+
+async def test_singleflight_coalesces_concurrent_identical_calls():
+    """Test that concurrent calls for one key share one execution and its result."""
+    from app.singleflight import SingleFlight
+    flights = SingleFlight(timeout=5)
+    release = asyncio.Event()
+    calls = []
+
+    async def query():
+        calls.append(1)
+        await release.wait()
+        return b"[]"
+
+    waiters = [asyncio.create_task(flights.do("/api/sweets/1", query)) for _ in range(10)]
+    other = asyncio.create_task(flights.do("/api/sweets/2", query))
+    await asyncio.sleep(0)
+    # A waiter giving up does not cancel the query for the rest
+    waiters.pop().cancel()
+    release.set()
+    assert await asyncio.gather(*waiters, other) == [b"[]"] * 10
+    assert len(calls) == 2
+    assert flights.stats() == {"executed": 2, "coalesced": 9, "timeouts": 0, "in_flight": 0}
+
+    await flights.do("/api/sweets/1", query)
+    assert len(calls) == 3
+
+async def test_singleflight_shares_errors_and_timeouts():
+    """Test that every waiter sees the execution's error, and a timeout stops waiting but not the work."""
+    from app.singleflight import SingleFlight
+    flights = SingleFlight(timeout=0.05)
+    release = asyncio.Event()
+    calls = []
+
+    async def failing():
+        await asyncio.sleep(0)
+        raise ValueError("database went away")
+
+    async def slow():
+        calls.append(1)
+        await release.wait()
+        return b"[]"
+
+    results = await asyncio.gather(*(flights.do("key", failing) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+
+    results = await asyncio.gather(*(flights.do("key", slow) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+    # The work is still running, so the next caller joins it instead of starting another
+    late = asyncio.create_task(flights.do("key", slow))
+    await asyncio.sleep(0)
+    release.set()
+    assert await late == b"[]"
+    assert len(calls) == 1
+    assert flights.stats() == {"executed": 2, "coalesced": 5, "timeouts": 3, "in_flight": 0}
+
+async def test_timed_out_catalog_render_finishes_in_its_own_session(db):
+    """Test that a caller timing out leaves the render running in its own session, to be joined and cached."""
+    import time
+    from sqlalchemy import func, select
+    from app import models
+    from app.catalog_cache import CatalogCache, MemoryCacheBackend
+    from app.replicas import ReadRoute
+    from tests.conftest import TestingSessionLocal
+    db.add(models.Sweet(name="Fudge", category="Toffee", price=2.0, quantity=5))
+    db.commit()
+    cache = CatalogCache(MemoryCacheBackend(max_size=10), render_timeout=0.05)
+    route = ReadRoute(TestingSessionLocal, use_replicas=False)
+    sessions = []
+
+    def slow_render(session):
+        sessions.append(session)
+        time.sleep(0.3)
+        return str(session.scalar(select(func.count(models.Sweet.id)))).encode()
+
+    def render():
+        return route.run(slow_render)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await cache.get_or_render("primary:/api/sweets?", render)
+    assert cache.flights.stats()["in_flight"] == 1
+
+    # A later caller waits on the query still running rather than starting another
+    cache.flights.timeout = 5
+    body, etag = await cache.get_or_render("primary:/api/sweets?", render)
+    assert body == b"1"
+    assert await cache.get_or_render("primary:/api/sweets?", render) == (body, etag)
+    assert len(sessions) == 1 and sessions[0] is not db
+    assert not sessions[0].in_transaction()
+
+async def test_catalog_cache_renders_a_burst_of_misses_once():
+    """Test that a thundering herd on one entry costs one render, but a write starts a new one."""
+    from app.catalog_cache import CatalogCache, MemoryCacheBackend
+    cache = CatalogCache(MemoryCacheBackend(max_size=10))
+    renders = []
+
+    async def render():
+        renders.append(1)
+        await asyncio.sleep(0.01)
+        return b'[{"id":1}]'
+
+    results = await asyncio.gather(*(cache.get_or_render("/api/sweets?", render) for _ in range(50)))
+    assert len(set(results)) == 1 and len(renders) == 1
+
+    first = asyncio.create_task(cache.get_or_render("/api/sweets?x=1", render))
+    await asyncio.sleep(0)
+    await cache.invalidate()
+    await asyncio.gather(first, cache.get_or_render("/api/sweets?x=1", render))
+    assert len(renders) == 3
+
+@pytest.mark.parametrize("returning,shards", [(True, 0), (False, 0), (True, 4)])
+def test_concurrent_purchases_never_oversell(db, returning, shards, monkeypatch):
+    """Test that purchases racing from many threads neither oversell nor lose stock."""
+    from concurrent.futures import ThreadPoolExecutor
+    from app import crud, models
+    from tests.conftest import TestingSessionLocal, engine
+    monkeypatch.setattr(engine.dialect, "update_returning", returning)
+    sweet = models.Sweet(name="Gobstopper", category="Candy", price=1.0, quantity=50)
+    db.add(sweet)
+    db.commit()
+    if shards:
+        crud.set_stock_shards(db, sweet.id, shards)
+
+    def attempt(i):
+        with TestingSessionLocal() as session:
+            # Every fifth request restocks two, the rest buy one each
+            delta = 2 if i % 5 == 0 else -1
+            return delta, crud.adjust_quantity(session, sweet.id, delta)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(attempt, range(200)))
+
+    applied = sum(delta for delta, updated in results if updated is not None)
+    assert crud.available_stock(db, [sweet.id]) == {sweet.id: 50 + applied}
+    assert all(updated.quantity >= 0 for _, updated in results if updated is not None)
+
+@pytest.fixture
+def cart_sweets(client, admin_token):
+    """Create three sweets to check out."""
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    return [
+        client.post(
+            "/api/sweets",
+            json={"name": name, "category": "Candy", "price": 1.0, "quantity": quantity},
+            headers=headers
+        ).json()
+        for name, quantity in [("Fudge", 10), ("Toffee", 5), ("Nougat", 1)]
+    ]
+
+def test_checkout_buys_every_line(client, auth_token, cart_sweets):
+    """Test that a checkout decrements every line in one request."""
+    fudge, toffee, nougat = cart_sweets
+    response = client.post(
+        "/api/sweets/checkout",
+        json={"items": [
+            {"sweet_id": toffee["id"], "quantity": 2},
+            {"sweet_id": fudge["id"], "quantity": 3},
+            {"sweet_id": toffee["id"], "quantity": 1},
+        ]},
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    quantities = {item["name"]: item["quantity"] for item in response.json()["items"]}
+    assert quantities == {"Fudge": 7, "Toffee": 2}
+
+def test_checkout_fails_atomically_with_line_errors(client, auth_token, cart_sweets):
+    """Test that one bad line rolls back the whole checkout and every failure is reported."""
+    fudge, toffee, nougat = cart_sweets
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = client.post(
+        "/api/sweets/checkout",
+        json={"items": [
+            {"sweet_id": fudge["id"], "quantity": 3},
+            {"sweet_id": nougat["id"], "quantity": 2},
+            {"sweet_id": 9999, "quantity": 1},
+        ]},
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == [
+        {"sweet_id": nougat["id"], "detail": "Insufficient quantity. Available: 1, Requested: 2"},
+        {"sweet_id": 9999, "detail": "Sweet not found"},
+    ]
+    assert client.get(f"/api/sweets/{fudge['id']}", headers=headers).json()["quantity"] == 10
+
+def test_checkout_rejects_empty_carts_and_non_positive_quantities(client, auth_token, cart_sweets):
+    """Test checkout request validation."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    for cart in [{"items": []}, {"items": [{"sweet_id": cart_sweets[0]["id"], "quantity": 0}]}]:
+        response = client.post("/api/sweets/checkout", json=cart, headers=headers)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+def test_import_sweets_csv_upserts_by_name(client, admin_token, auth_token, test_sweet, monkeypatch):
+    """Test that a CSV import inserts new sweets, updates existing ones and reports bad rows."""
+    from app.config import settings
+    monkeypatch.setattr(settings, "import_batch_size", 2)
+    body = (
+        "name,category,price,quantity\r\n"
+        "Chocolate Bar,Chocolate,3.25,\r\n"
+        "Fudge,Fudge,1.50,20\r\n"
+        "Toffee,Toffee,not-a-price,5\r\n"
+        "Nougat,Nougat,2.00\r\n"
+        "\r\n"
+        "Liquorice,Candy,0.75,40\r\n"
+        "Fudge,Fudge,1.75,30\r\n"
+    )
+    response = client.post(
+        "/api/sweets/import?format=csv",
+        content=body.encode(),
+        headers={"Authorization": f"Bearer {admin_token}", "Content-Type": "text/csv"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    summary = response.json()
+    assert (summary["inserted"], summary["updated"], summary["rejected"]) == (2, 2, 2)
+    assert [error["line"] for error in summary["errors"]] == [4, 5]
+    assert summary["errors"][0]["detail"].startswith("price:")
+
+    sweets = {
+        sweet["name"]: sweet
+        for sweet in client.get("/api/sweets", headers={"Authorization": f"Bearer {auth_token}"}).json()
+    }
+    # Omitted quantity leaves stock alone on update
+    assert (sweets["Chocolate Bar"]["price"], sweets["Chocolate Bar"]["quantity"]) == (3.25, 100)
+    assert (sweets["Fudge"]["price"], sweets["Fudge"]["quantity"]) == (1.75, 30)
+    assert sweets["Liquorice"]["quantity"] == 40
+    assert "Toffee" not in sweets and "Nougat" not in sweets
+
+def test_import_sweets_ndjson(client, admin_token, auth_token):
+    """Test an NDJSON import and that the search index sees imported sweets."""
+    body = b'{"name": "Sour Worms", "category": "Gummies", "price": 1.2}\n[1, 2]\n{"name": "Mint Humbug", "category": "Hard Candy", "price": 0.8, "quantity": 9}'
+    response = client.post(
+        "/api/sweets/import",
+        content=body,
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.json() == {
+        "inserted": 2,
+        "updated": 0,
+        "skipped": 0,
+        "rejected": 1,
+        "errors": [{"line": 2, "detail": "Expected a JSON object"}],
+    }
+    response = client.get("/api/sweets/search?name=humbug", headers={"Authorization": f"Bearer {auth_token}"})
+    assert [sweet["quantity"] for sweet in response.json()] == [9]
+
+def test_import_counts_names_repeated_in_a_batch_as_skipped(client, admin_token, auth_token):
+    """Test that a name repeated within one batch is inserted once, not also reported as updated."""
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    body = b'{"name": "Gobstopper", "category": "Candy", "price": 1.0}\n{"name": "Gobstopper", "category": "Candy", "price": 1.5}'
+    summary = client.post("/api/sweets/import", content=body, headers=headers).json()
+    assert (summary["inserted"], summary["updated"], summary["skipped"]) == (1, 0, 1)
+    response = client.get("/api/sweets/search?name=gobstopper", headers={"Authorization": f"Bearer {auth_token}"})
+    assert [sweet["price"] for sweet in response.json()] == [1.5]
+
+    summary = client.post("/api/sweets/import", content=body, headers=headers).json()
+    assert (summary["inserted"], summary["updated"], summary["skipped"]) == (0, 1, 1)
+
+def test_import_sweets_non_admin(client, auth_token):
+    """Test that importing requires an admin."""
+    response = client.post(
+        "/api/sweets/import",
+        content=b'{"name": "Fudge", "category": "Fudge", "price": 1.0}\n',
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+def test_flash_sale_shards_stock_and_folds_it_back(client, admin_token, auth_token, test_sweet):
+    """Test switching a sweet to sharded flash-sale stock and back."""
+    from app import crud
+    from tests.conftest import TestingSessionLocal
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    url = f"/api/sweets/{test_sweet['id']}"
+
+    response = client.put(f"{url}/flash-sale", json={"shards": 4}, headers=admin)
+    assert response.status_code == status.HTTP_200_OK
+    assert (response.json()["stock_shards"], response.json()["quantity"]) == (4, 100)
+
+    # 100 over 4 shards holds 25 each, so buying 60 has to drain several
+    response = client.post(f"{url}/purchase", json={"quantity": 60}, headers=headers)
+    assert response.json()["quantity"] == 40
+    assert client.post(f"{url}/restock", json={"quantity": 5}, headers=admin).json()["quantity"] == 45
+    response = client.post(f"{url}/purchase", json={"quantity": 50}, headers=headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "Insufficient quantity. Available: 45, Requested: 50"
+
+    # Catalog reads see shard totals once they are synced
+    with TestingSessionLocal() as session:
+        assert crud.sync_flash_sale_quantities(session) == 1
+    assert client.get(url, headers=headers).json()["quantity"] == 45
+
+    client.put(url, json={"quantity": 30}, headers=admin)
+    response = client.delete(f"{url}/flash-sale", headers=admin)
+    assert (response.json()["stock_shards"], response.json()["quantity"]) == (0, 30)
+    assert client.post(f"{url}/purchase", json={"quantity": 1}, headers=headers).json()["quantity"] == 29
+
+def test_flash_sale_requires_admin_and_existing_sweet(client, admin_token, auth_token, test_sweet):
+    """Test flash-sale switching permissions and missing sweets."""
+    response = client.put(
+        f"/api/sweets/{test_sweet['id']}/flash-sale",
+        json={"shards": 4},
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    response = client.put(
+        "/api/sweets/9999/flash-sale",
+        json={"shards": 4},
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_websocket_streams_inventory_changes(admin_token, auth_token, test_sweet, monkeypatch):
+    """Test that purchases and deletes reach WebSocket subscribers as compact events."""
+    from fastapi.testclient import TestClient
+    from app.config import settings
+    from app.main import app
+    monkeypatch.setattr(settings, "flash_sale_sync_seconds", 0)
+    sweet_id = test_sweet["id"]
+
+    # One portal, so the stream and the writes share an event loop as they would under uvicorn
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/api/sweets/events?access_token={auth_token}") as websocket:
+            client.post(
+                f"/api/sweets/{sweet_id}/purchase",
+                json={"quantity": 3},
+                headers={"Authorization": f"Bearer {auth_token}"}
+            )
+            assert websocket.receive_json() == {"id": sweet_id, "quantity": 97, "price": 2.5, "category": "Chocolate"}
+
+            client.delete(f"/api/sweets/{sweet_id}", headers={"Authorization": f"Bearer {admin_token}"})
+            assert websocket.receive_json() == {"id": sweet_id, "deleted": True}
+
+def test_event_streams_require_authentication(client):
+    """Test that both event streams refuse connections without a valid token."""
+    from starlette.websockets import WebSocketDisconnect
+    assert client.get("/api/sweets/events").status_code == status.HTTP_401_UNAUTHORIZED
+    assert client.get(
+        "/api/sweets/events", params={"access_token": "not-a-token"}
+    ).status_code == status.HTTP_401_UNAUTHORIZED
+
+    with pytest.raises(WebSocketDisconnect) as excinfo:
+        with client.websocket_connect("/api/sweets/events"):
+            pass
+    assert excinfo.value.code == status.WS_1008_POLICY_VIOLATION
+
+async def test_broadcaster_drops_slow_subscribers():
+    """Test that a subscriber whose queue fills up is dropped without holding up others."""
+    from app import schemas
+    from app.events import Broadcaster, MemoryBackplane
+    broadcaster = Broadcaster(MemoryBackplane(), queue_size=2)
+    fast = await broadcaster.subscribe()
+    slow = await broadcaster.subscribe()
+
+    for quantity in range(3):
+        await broadcaster.publish(schemas.InventoryEvent(id=1, quantity=quantity))
+        assert await fast.next_event() == f'{{"id":1,"quantity":{quantity}}}'
+
+    assert await slow.next_event() is None
+    assert broadcaster.stats() == {"subscribers": 1, "delivered": 5, "dropped": 1}
+    await broadcaster.stop()
+    assert await fast.next_event() is None
+
+async def test_broadcasters_share_events_through_backplane():
+    """Test that a write on one worker reaches subscribers on another."""
+    from app import schemas
+    from app.events import Broadcaster, MemoryBackplane, sse_stream
+    backplane = MemoryBackplane()
+    worker_a = Broadcaster(backplane, queue_size=10)
+    worker_b = Broadcaster(backplane, queue_size=10)
+    subscription = await worker_b.subscribe()
+    stream = sse_stream(subscription, keepalive_seconds=0.01)
+
+    assert await stream.__anext__() == ": keepalive\n\n"
+    await worker_a.publish(schemas.InventoryEvent(id=7, deleted=True))
+    assert await stream.__anext__() == 'event: inventory\ndata: {"id":7,"deleted":true}\n\n'
+
+    await worker_b.stop()
+    assert await stream.__anext__() == "event: overflow\ndata: {}\n\n"
+    await worker_a.stop()
+
+class FakePubSubClient:
+    """In-process stand-in for a Redis client's publish and pubsub."""
+
+    def __init__(self):
+        self.subscribers = []
+        self.closed = False
+
+    async def publish(self, channel, message):
+        assert not self.closed
+        for pubsub in self.subscribers:
+            pubsub.messages.put_nowait({"type": "message", "data": message.encode()})
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        assert not self.closed
+        return FakePubSub(self)
+
+    async def aclose(self):
+        self.closed = True
+
+class FakePubSub:
+    def __init__(self, client):
+        self.client = client
+        self.messages = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.client.subscribers.append(self)
+
+    async def listen(self):
+        while True:
+            yield await self.messages.get()
+
+    async def aclose(self):
+        self.client.subscribers.remove(self)
+
+async def test_redis_backplane_survives_a_restart():
+    """Test that stopping the broadcaster ends its subscription but keeps the client for a restart."""
+    from app import schemas
+    from app.events import Broadcaster, RedisBackplane
+    client = FakePubSubClient()
+    broadcaster = Broadcaster(RedisBackplane(client), queue_size=10)
+    for quantity in range(2):
+        subscription = await broadcaster.subscribe()
+        await broadcaster.publish(schemas.InventoryEvent(id=1, quantity=quantity))
+        assert await subscription.next_event() == f'{{"id":1,"quantity":{quantity}}}'
+        await broadcaster.stop()
+        assert client.subscribers == []
+    assert not client.closed
+
+@pytest.fixture
+def stock_sweets(db):
+    """Insert sweets in two categories, two of them low on stock."""
+    from app import models
+    sweets = [
+        models.Sweet(name="Fudge", category="Toffee", price=2.0, quantity=50),
+        models.Sweet(name="Brittle", category="Toffee", price=1.5, quantity=4),
+        models.Sweet(name="Truffle", category="Chocolate", price=3.0, quantity=0),
+    ]
+    db.add_all(sweets)
+    db.commit()
+    return sweets
+
+def test_inventory_stats_summarize_the_catalog(client, admin_token, stock_sweets):
+    """Test per-category counts, units, stock value and the low-stock list."""
+    response = client.get("/api/sweets/stats", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "items": 3,
+        "units": 54,
+        "value": 106.0,
+        "categories": [
+            {"category": "Chocolate", "items": 1, "units": 0, "value": 0.0},
+            {"category": "Toffee", "items": 2, "units": 54, "value": 106.0},
+        ],
+        "low_stock_threshold": 10,
+        "low_stock": [
+            {"id": stock_sweets[2].id, "name": "Truffle", "category": "Chocolate", "quantity": 0},
+            {"id": stock_sweets[1].id, "name": "Brittle", "category": "Toffee", "quantity": 4},
+        ],
+    }
+
+def test_inventory_stats_follow_writes_without_rescanning(client, admin_token, auth_token, stock_sweets):
+    """Test that writes update the stats incrementally and agree with a full reload."""
+    from app.stats import inventory_stats
+    from tests.conftest import TestingSessionLocal
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    fudge, brittle, truffle = (sweet.id for sweet in stock_sweets)
+    client.get("/api/sweets/stats", headers=admin)
+
+    client.post(f"/api/sweets/{fudge}/purchase", json={"quantity": 45}, headers={"Authorization": f"Bearer {auth_token}"})
+    client.post(f"/api/sweets/{truffle}/restock", json={"quantity": 20}, headers=admin)
+    client.put(f"/api/sweets/{brittle}", json={"category": "Chocolate", "price": 2.5}, headers=admin)
+    client.delete(f"/api/sweets/{truffle}", headers=admin)
+    client.post("/api/sweets", json={"name": "Nougat", "category": "Candy", "price": 1.0, "quantity": 7}, headers=admin)
+
+    stats = client.get("/api/sweets/stats", headers=admin).json()
+    assert stats["categories"] == [
+        {"category": "Candy", "items": 1, "units": 7, "value": 7.0},
+        {"category": "Chocolate", "items": 1, "units": 4, "value": 10.0},
+        {"category": "Toffee", "items": 1, "units": 5, "value": 10.0},
+    ]
+    assert [sweet["name"] for sweet in stats["low_stock"]] == ["Brittle", "Fudge", "Nougat"]
+    assert asyncio.run(inventory_stats.reconcile(TestingSessionLocal)) == 0
+
+def test_inventory_stats_reconcile_corrects_drift(client, admin_token, db, stock_sweets):
+    """Test that the periodic reload picks up writes that published no events."""
+    from app import models
+    from app.stats import inventory_stats
+    from tests.conftest import TestingSessionLocal
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    assert client.get("/api/sweets/stats", headers=admin).json()["items"] == 3
+
+    db.add(models.Sweet(name="Toffee Apple", category="Toffee", price=1.0, quantity=1))
+    db.commit()
+    assert client.get("/api/sweets/stats", headers=admin).json()["items"] == 3
+    assert asyncio.run(inventory_stats.reconcile(TestingSessionLocal)) == 1
+    assert client.get("/api/sweets/stats", headers=admin).json()["items"] == 4
+
+def test_inventory_stats_admin_only(client, auth_token):
+    """Test that stats require an admin."""
+    response = client.get("/api/sweets/stats", headers={"Authorization": f"Bearer {auth_token}"})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+def test_categories_are_normalized_and_filter_exactly(client, admin_token, auth_token, test_sweet):
+    """Test that categories are shared by slug and filter by id or slug."""
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    for name, category in [("Milk Bar", "chocolate "), ("Humbug", "Hard Candy"), ("Choc Drops", "Chocolate Chips")]:
+        client.post("/api/sweets", json={"name": name, "category": category, "price": 1.0}, headers=admin)
+
+    categories = client.get("/api/sweets/categories", headers=headers).json()
+    assert [(category["name"], category["slug"]) for category in categories] == [
+        ("Chocolate", "chocolate"), ("Chocolate Chips", "chocolate-chips"), ("Hard Candy", "hard-candy")
+    ]
+    ids = {category["slug"]: category["id"] for category in categories}
+
+    def search(**params):
+        response = client.get("/api/sweets/search", params=params, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        return sorted(sweet["name"] for sweet in response.json())
+
+    assert search(category_slug="chocolate") == ["Chocolate Bar", "Milk Bar"]
+    assert search(category_slug="Chocolate") == ["Chocolate Bar", "Milk Bar"]
+    assert search(category_id=ids["hard-candy"]) == ["Humbug"]
+    # The substring match is unchanged
+    assert search(category="chocolate") == ["Choc Drops", "Chocolate Bar", "Milk Bar"]
+
+    client.put(f"/api/sweets/{test_sweet['id']}", json={"category": "hard candy"}, headers=admin)
+    assert search(category_slug="hard-candy") == ["Chocolate Bar", "Humbug"]
+
+    for params in [{"category_slug": "toffee"}, {"category_id": 999}, {"category_id": ids["chocolate"], "category_slug": "hard-candy"}]:
+        response = client.get("/api/sweets/search", params=params, headers=headers)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_category_lookup_reloads_categories_added_elsewhere(client, admin_token, auth_token):
+    """Test that imports assign categories and a stale lookup reloads on a miss."""
+    from app.categories import category_lookup
+    client.post(
+        "/api/sweets/import",
+        params={"format": "csv"},
+        content="name,category,price\nLiquorice,Liquorice Allsorts,1.0\n",
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    # As if another worker had added the category after this one loaded
+    category_lookup.replace([])
+    response = client.get(
+        "/api/sweets/search",
+        params={"category_slug": "liquorice-allsorts"},
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert [sweet["name"] for sweet in response.json()] == ["Liquorice"]
+
+def test_unknown_categories_reload_the_lookup_at_most_once_per_interval(client, auth_token, test_sweet, monkeypatch):
+    """Test that a stream of unknown category filters cannot force a reload per request."""
+    from app import crud
+    from app.config import settings
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    reloads = []
+    load_categories = crud.load_categories
+    monkeypatch.setattr(crud, "load_categories", lambda db: reloads.append(1) or load_categories(db))
+
+    for params in [{"category_slug": "chocolate"}, {"category_slug": "toffee"}, {"category_id": 999}]:
+        client.get("/api/sweets/search", params=params, headers=headers)
+    assert len(reloads) == 1
+    response = client.get("/api/sweets/search", params={"category_slug": "toffee"}, headers=headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    # With no interval every miss reloads, as before
+    monkeypatch.setattr(settings, "category_reload_seconds", 0)
+    client.get("/api/sweets/search", params={"category_id": 999}, headers=headers)
+    assert len(reloads) == 2
+
+def test_rolled_back_categories_stay_out_of_the_lookup(db):
+    """Test that categories reach the in-memory lookup only once committed."""
+    from app import models
+    from app.categories import category_lookup
+    db.add(models.Sweet(name="Ghost Pop", category="Ghostly", price=1.0, quantity=1))
+    db.flush()
+    db.rollback()
+    assert "ghostly" not in category_lookup.by_slug
+
+    db.add(models.Sweet(name="Ghost Pop", category="Ghostly", price=1.0, quantity=1))
+    db.commit()
+    assert category_lookup.by_slug["ghostly"].name == "Ghostly"
+
+def test_category_ids_resolve_while_the_lookup_is_reloaded(db):
+    """Test that a reload swapping the lookup part way through does not upset resolving category ids."""
+    from sqlalchemy import event
+    from app import crud, models
+    from app.categories import category_lookup
+    db.add(models.Sweet(name="Fudge", category="Toffee", price=1.0, quantity=1))
+    db.commit()
+    toffee_id = category_lookup.by_slug["toffee"].id
+
+    def reload(*args):
+        # As if another request reloaded the lookup while this one queries
+        category_lookup.replace([])
+
+    event.listen(db.get_bind(), "before_cursor_execute", reload)
+    try:
+        ids = crud.ensure_categories(db, ["Toffee", "Nougat"])
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", reload)
+    assert ids["Toffee"] == toffee_id and ids["Nougat"] != toffee_id
+    db.rollback()
+
+def test_category_id_filter_uses_an_index(db):
+    """Test that exact category filters are index lookups."""
+    from sqlalchemy import text
+    if db.get_bind().dialect.name != "sqlite":
+        pytest.skip("checks SQLite's query plan")
+    plan = db.execute(text("EXPLAIN QUERY PLAN SELECT id FROM sweets WHERE category_id = 1 ORDER BY id")).all()
+    assert any("ix_sweets_category_id_id" in row[-1] for row in plan)
+
+def test_reservations_hold_stock_until_confirmed_or_released(client, admin_token, auth_token, test_user, test_sweet):
+    """Test that a hold takes stock at once, and confirming buys it while releasing returns it."""
+    from sqlalchemy import select
+    from app import models
+    from tests.conftest import TestingSessionLocal
+    url = f"/api/sweets/{test_sweet['id']}"
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = client.post(f"{url}/reservations", json={"quantity": 30}, headers=headers)
+    assert response.status_code == status.HTTP_201_CREATED
+    held = response.json()
+    assert held["sweet_id"] == test_sweet["id"] and held["quantity"] == 30
+    assert held["expires_at"].endswith("Z")
+    assert client.get(url, headers=headers).json()["quantity"] == 70
+    other = client.post(f"{url}/reservations", json={"quantity": 20}, headers=headers).json()
+
+    # Holds count against everyone's stock
+    response = client.post(f"{url}/purchase", json={"quantity": 51}, headers=headers)
+    assert response.json()["detail"] == "Insufficient quantity. Available: 50, Requested: 51"
+    response = client.post(f"{url}/reservations", json={"quantity": 51}, headers=headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    # Only the user who made a hold can act on it, and only once
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    confirm_url = f"/api/sweets/reservations/{held['id']}/confirm"
+    assert client.post(confirm_url, headers=admin_headers).status_code == status.HTTP_404_NOT_FOUND
+    response = client.post(confirm_url, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["quantity"] == 50
+    assert client.post(confirm_url, headers=headers).status_code == status.HTTP_404_NOT_FOUND
+    with TestingSessionLocal() as session:
+        assert session.execute(select(models.Order.user_id, models.Order.quantity)).all() == [(test_user[0].id, 30)]
+
+    response = client.delete(f"/api/sweets/reservations/{other['id']}", headers=headers)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert client.get(url, headers=headers).json()["quantity"] == 70
+    assert client.delete(f"/api/sweets/reservations/{other['id']}", headers=headers).status_code == status.HTTP_404_NOT_FOUND
+
+def test_reservations_validate_the_request(client, auth_token, test_sweet):
+    """Test reservations of unknown sweets and non-positive quantities."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = client.post("/api/sweets/9999/reservations", json={"quantity": 1}, headers=headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    response = client.post(f"/api/sweets/{test_sweet['id']}/reservations", json={"quantity": 0}, headers=headers)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert client.post("/api/sweets/reservations/1/confirm").status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_expired_reservations_are_reclaimed_in_batches(db, test_user):
+    """Test that the sweep returns expired holds' stock in batches and leaves live holds alone."""
+    from app import crud, models
+    user_id = test_user[0].id
+    sweets = [models.Sweet(name=f"Drop {index}", category="Candy", price=1.0, quantity=10) for index in range(2)]
+    db.add_all(sweets)
+    db.commit()
+    ids = [sweet.id for sweet in sweets]
+    expired = [crud.reserve(db, user_id, ids[index % 2], 2, ttl_seconds=-60)[0] for index in range(5)]
+    live = crud.reserve(db, user_id, ids[0], 1, ttl_seconds=60)[0]
+    assert crud.available_stock(db, ids) == {ids[0]: 3, ids[1]: 6}
+
+    # An expired hold can no longer be bought
+    assert crud.confirm_reservation(db, user_id, expired[0].id) is None
+
+    count, returned = crud.expire_reservations(db, batch_size=3)
+    assert count == 3
+    assert {sweet.id: sweet.quantity for sweet in returned} == {ids[0]: 7, ids[1]: 8}
+    assert crud.expire_reservations(db, batch_size=3)[0] == 2
+    assert crud.expire_reservations(db, batch_size=3) == (0, [])
+    assert crud.available_stock(db, ids) == {ids[0]: 9, ids[1]: 10}
+    assert crud.confirm_reservation(db, user_id, live.id).id == ids[0]
+
+def test_concurrent_reservations_never_oversell(db, test_user):
+    """Test that holds, confirmations, releases and sweeps racing from many threads conserve stock."""
+    from concurrent.futures import ThreadPoolExecutor
+    from sqlalchemy import func, select
+    from app import crud, models
+    from tests.conftest import TestingSessionLocal
+    user_id = test_user[0].id
+    sweet = models.Sweet(name="Gobstopper", category="Candy", price=1.0, quantity=50)
+    db.add(sweet)
+    db.commit()
+    sweet_id = sweet.id
+
+    def attempt(i):
+        with TestingSessionLocal() as session:
+            if i % 7 == 0:
+                return crud.expire_reservations(session, batch_size=10)
+            # A third of the holds are already expired when made
+            reserved = crud.reserve(session, user_id, sweet_id, 1, ttl_seconds=-1 if i % 3 == 0 else 60)
+            if reserved is None:
+                return None
+            if i % 3 == 1:
+                return crud.confirm_reservation(session, user_id, reserved[0].id)
+            if i % 3 == 2:
+                return crud.release_reservation(session, user_id, reserved[0].id)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(attempt, range(300)))
+
+    sold = db.scalar(select(func.coalesce(func.sum(models.Order.quantity), 0)))
+    held = db.scalar(select(func.coalesce(func.sum(models.Reservation.quantity), 0)))
+    stock = crud.available_stock(db, [sweet_id])[sweet_id]
+    assert stock >= 0 and sold + held + stock == 50
+    while crud.expire_reservations(db, batch_size=10)[0]:
+        pass
+    assert crud.available_stock(db, [sweet_id])[sweet_id] + sold == 50